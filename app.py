@@ -1,23 +1,37 @@
 import os
 import json
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, url_for, redirect, send_file, Response, stream_with_context
 from markupsafe import Markup
-import time
 # Ensure scraper_utils.py is in the same directory or Python path
 try:
     # Updated import to the new main parallel function
-    from scraper_utils import get_user_info_and_id, run_all_analyses_parallel, prepare_cookies, prepare_headers
+    from scraper_utils import get_user_info_and_id, run_analyses, prepare_cookies, prepare_headers, graph_store, ANALYSIS_MODES, DEFAULT_ANALYSIS_MODE
 except ImportError as e:
     print(f"Error: Could not import from scraper_utils.py: {e}")
     print("Ensure scraper_utils.py exists and contains the required functions.")
     # Optionally exit if the import fails, as the app won't work
     import sys
     sys.exit(1)
+from batch_analysis import run_batch, parse_usernames, BATCH_OUTPUT_DIR
+from job_queue import JobQueue, QueueFullError, STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED
+from stage_metrics import registry as metrics_registry, timed
+from graph_store import user_node_id, GRAPH_STORE_DISABLED
+from graph_layout import GraphLayout, apply_layout, cached_layout, GRAPH_VIEW_MAX_NODES, GRAPH_MAX_DEPTH, GRAPH_PAGE_MAX_LIMIT
+from result_store import ResultStore, RESULT_STORE_DISABLED
+from page_cache import PageCache, CachedPage
+from instagram_scraper import store_new_posts
 
 
 app = Flask(__name__)
 
+# Bounded background pool for analyses so long LLM calls don't hold HTTP workers
+job_queue = JobQueue()
+# Finished analyses by result ID (permalinks), and their rendered, precompressed pages
+result_store = ResultStore()
+page_cache = PageCache()
+
 # Function to safely extract graph data for vis.js
+@timed("prepare_graph_json")
 def prepare_graph_json(json_data):
     graph_data = json_data.get("network_connections_explicit")
     if not graph_data or not isinstance(graph_data.get("nodes"), list) or not isinstance(graph_data.get("edges"), list):
@@ -32,20 +46,21 @@ def prepare_graph_json(json_data):
             username = json_data.get("profile_context", {}).get("username", "Unknown")
             nodes.insert(0, {"id": "profile_owner", "label": username, "type": "ProfileOwner"})
 
-        for node in nodes:
+        for index, node in enumerate(nodes):
             if 'label' not in node and 'id' in node:
                 node['label'] = node['id'] # Use ID as label if missing
             if not node.get('id'): # Add default ID if missing somehow
-                 node['id'] = f"missing_id_{time.time()}" # Avoid vis.js errors
+                 node['id'] = f"missing_id_{index}" # Avoid vis.js errors; stable across renders
 
         # Ensure edges reference valid nodes
         valid_node_ids = {node['id'] for node in nodes if node.get('id')}
         valid_edges = []
         for edge in graph_data.get('edges', []):
              if edge.get('from') in valid_node_ids and edge.get('to') in valid_node_ids:
-                 # Add unique ID to edges if missing (vis.js might need it)
+                 # Add unique ID to edges if missing (vis.js might need it); the position keeps
+                 # parallel edges apart and the same response always gets the same IDs
                  if 'id' not in edge:
-                     edge['id'] = f"edge_{edge.get('from')}_{edge.get('to')}_{time.time()}"
+                     edge['id'] = f"edge_{edge.get('from')}_{edge.get('to')}_{len(valid_edges)}"
                  valid_edges.append(edge)
              else:
                   print(f"Warning: Filtering out invalid edge: {edge}")
@@ -53,6 +68,7 @@ def prepare_graph_json(json_data):
         # Reassign validated nodes and edges
         graph_data['nodes'] = nodes
         graph_data['edges'] = valid_edges
+        apply_layout(graph_data) # Fixed positions so the browser can skip physics stabilisation
 
         graph_json = json.dumps(graph_data)
         print("Explicit graph data successfully prepared for JS.")
@@ -64,23 +80,19 @@ def prepare_graph_json(json_data):
 @app.route('/')
 def index():
     """Renders the homepage with the username input form."""
-    return render_template('index.html')
-
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    """Handles username submission, runs scraping and parallel analysis, renders results."""
-    username = request.form.get('username')
-    if not username:
-        return render_template('index.html', error="Username cannot be empty.")
+    return render_template('index.html', analysis_modes=ANALYSIS_MODES, default_analysis_mode=DEFAULT_ANALYSIS_MODE)
 
+def run_analysis_pipeline(job, username, force_refresh=False, analysis_mode=None):
+    """Runs profile fetch and parallel LLM analyses, returning the results.html context."""
     # Prepare cookies and headers
     cookies = prepare_cookies()
     headers = prepare_headers(username, cookies)
 
     # Fetch profile info
     print(f"--- Starting analysis for: {username} ---")
+    job.set_progress("Fetching profile information")
     # Expect user_id, basic_info, post_edges, profile_error
-    user_id, basic_info, post_edges, profile_error = get_user_info_and_id(username, cookies, headers)
+    user_id, basic_info, post_edges, profile_error = get_user_info_and_id(username, cookies, headers, force_refresh=force_refresh)
 
     # Initialize result variables
     llm_report = "Analysis not performed."
@@ -88,11 +100,14 @@ def analyze():
     llm_json_data = None
     graph_data_json = 'null'
     llm_error = None # Consolidated error message
+    analysis_metrics = None # Token usage and wall-clock time for the LLM stage
+    incomplete_sections = [] # Sections that hit their deadline or were cancelled (partial output)
+    new_post_edges = [] # Posts from the profile lookup missing from the user's crawl index
 
     if profile_error:
         print(f"Profile fetch failed: {profile_error}")
         # Pass profile_error to template, skip LLM calls
-        return render_template('results.html', username=username, error=profile_error)
+        return {"username": username, "error": profile_error}
 
     # If profile fetch succeeded, run parallel LLM analyses
     if basic_info:
@@ -100,15 +115,47 @@ def analyze():
         if biography is None:
             biography = "" # Ensure it's a string for LLM calls
 
+        # Let streaming subscribers render the profile before any LLM output arrives
+        job.publish("profile", {"user_id": user_id, "profile_info": basic_info})
+
+        if post_edges:
+            # Dedupe the first page of posts against the crawl index and store the new ones; no extra Instagram requests
+            job.set_progress("Checking for new posts")
+            new_post_edges = store_new_posts(user_id, username, cookies, headers, post_edges)
+
+        def publish_delta(identifier, text):
+            job.publish("delta", {"section": identifier, "text": text})
+
+        prepared_graph = {} # Last json_data laid out and its graph JSON, so the layout runs once per analysis
+
+        def graph_json_for(json_data):
+            if prepared_graph.get("source") is not json_data:
+                prepared_graph["source"] = json_data
+                prepared_graph["graph_json"] = prepare_graph_json(json_data)
+            return prepared_graph["graph_json"]
+
+        def publish_section(identifier, result):
+            section = {"section": identifier, "content": result}
+            if identifier == "json_data" and isinstance(result, dict):
+                # Ship the vis.js-ready graph with the JSON so the page can draw it immediately
+                section["graph_data"] = json.loads(graph_json_for(result))
+            job.publish("section", section)
+
         print("Starting parallel LLM analyses...")
+        job.set_progress("Running LLM analyses")
         # Call the parallel function from scraper_utils, now including post_edges
-        analysis_results = run_all_analyses_parallel(username, biography, post_edges)
+        analysis_results = run_analyses(username, biography, post_edges, mode=analysis_mode,
+                                        on_delta=publish_delta, on_result=publish_section,
+                                        cancel=job.cancel_token)
 
         # Extract results from the returned dictionary
         llm_report = analysis_results.get("report", "Report generation failed or task did not complete.")
         llm_forensic_notes = analysis_results.get("forensic_notes", "Forensic note generation failed or task did not complete.")
         llm_json_data = analysis_results.get("json_data")
+        analysis_metrics = analysis_results.get("metrics")
+        incomplete_sections = analysis_results.get("incomplete") or []
 
+        job.set_progress("Preparing graph data")
         # Check for errors specifically in the JSON data generation
         if isinstance(llm_json_data, dict) and llm_json_data.get("error"):
             llm_error = f"LLM JSON Data Error: {llm_json_data.get('error')}"
@@ -118,11 +165,11 @@ def analyze():
             if raw_resp:
                  llm_error += f" (Raw Response Snippet: {raw_resp[:100]}...)"
             # Attempt to prepare graph json even if other parts failed
-            graph_data_json = prepare_graph_json(llm_json_data) # Use helper
+            graph_data_json = graph_json_for(llm_json_data) # Reuses the one built for the streamed section
 
         elif isinstance(llm_json_data, dict):
             # Success case for JSON data, prepare graph for vis.js
-            graph_data_json = prepare_graph_json(llm_json_data) # Use helper
+            graph_data_json = graph_json_for(llm_json_data) # Reuses the one built for the streamed section
         else:
             # Handle unexpected type for llm_json_data
             llm_error = f"LLM JSON Data Error: Unexpected data type received ({type(llm_json_data)})."
@@ -133,21 +180,308 @@ def analyze():
         # This case should now be caught by profile_error, but defensive coding
         profile_error = "Failed to retrieve basic profile information."
         print(profile_error)
-        return render_template('results.html', username=username, error=profile_error)
-
-    # Pass all results to the template
-    return render_template(
-        'results.html',
-        username=username,
-        profile_info=basic_info,
-        user_id=user_id,
-        llm_report=llm_report,
-        llm_forensic_notes=llm_forensic_notes,
-        llm_json_data=llm_json_data, # Pass the whole JSON dict
-        graph_data_json=Markup(graph_data_json), # Specific JSON for vis.js graph
-        llm_error=llm_error, # Consolidated error from JSON task
-        error=None # No profile fetch error if we reached here
-    )
+        return {"username": username, "error": profile_error}
+
+    # All results for the template; graph JSON is wrapped in Markup at render time
+    context = {
+        "username": username,
+        "profile_info": basic_info,
+        "user_id": user_id,
+        "llm_report": llm_report,
+        "llm_forensic_notes": llm_forensic_notes,
+        "llm_json_data": llm_json_data, # Pass the whole JSON dict
+        "graph_data_json": graph_data_json, # Specific JSON for vis.js graph
+        "llm_error": llm_error, # Consolidated error from JSON task
+        "analysis_metrics": analysis_metrics,
+        "incomplete_sections": incomplete_sections,
+        "new_post_count": len(new_post_edges),
+        "error": None # No profile fetch error if we reached here
+    }
+    # Keep the finished analysis under the job ID so its permalink outlives the job queue
+    if not RESULT_STORE_DISABLED and result_store.save(job.id, username, context):
+        context["result_id"] = job.id
+    return context
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    """Handles username submission by queueing a background analysis job."""
+    username = request.form.get('username')
+    # Checkbox/flag to bypass the cached profile response
+    force_refresh = request.form.get('force_refresh') in ('1', 'true', 'on')
+    # 'parallel' (three calls) or 'combined' (one structured call)
+    analysis_mode = request.form.get('analysis_mode') or DEFAULT_ANALYSIS_MODE
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    if not username:
+        if wants_json:
+            return jsonify({"error": "Username cannot be empty."}), 400
+        return render_template('index.html', error="Username cannot be empty.")
+
+    if analysis_mode not in ANALYSIS_MODES:
+        error = f"Unknown analysis mode '{analysis_mode}'."
+        if wants_json:
+            return jsonify({"error": error}), 400
+        return render_template('index.html', error=error)
+
+    try:
+        job = job_queue.submit(username, run_analysis_pipeline, username,
+                               force_refresh=force_refresh, analysis_mode=analysis_mode)
+    except QueueFullError as e:
+        print(f"Rejecting analysis for {username}: {e}")
+        if wants_json:
+            return jsonify({"error": str(e)}), 503
+        return render_template('index.html', error="The server is busy. Please try again shortly."), 503
+
+    if wants_json:
+        return jsonify({
+            "job_id": job.id,
+            "status_url": url_for('job_status', job_id=job.id),
+            "result_url": url_for('job_result', job_id=job.id)
+        }), 202
+    # Render the results page in its pending state; it polls the status endpoint
+    return render_template('results.html', username=username, job_id=job.id, pending=True), 202
+
+def _analysis_outcome(result):
+    """Errors and per-task outcomes of a finished analysis.
+
+    The job itself is 'done' even when LLM calls failed, timed out or needed a
+    hedge, so API clients (and the load test) read those from here.
+    """
+    metrics = result.get("analysis_metrics") or {}
+    tasks = {
+        name: {"outcome": usage.get("outcome"), "error": usage.get("error"),
+               "hedged": any(attempt.get("hedge") for attempt in usage.get("attempts") or [])}
+        for name, usage in (metrics.get("tasks") or {}).items()
+    }
+    return {"error": result.get("error"), "llm_error": result.get("llm_error"),
+            "incomplete_sections": result.get("incomplete_sections") or [], "tasks": tasks}
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    """Returns the current status and progress of an analysis job as JSON."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired."}), 404
+    status = job.to_dict()
+    if job.kind == "batch":
+        status["result_url"] = url_for('batch_results', job_id=job.id)
+        status["summary"] = job.result
+    elif job.status == STATUS_DONE and (job.result or {}).get("result_id"):
+        status["result_url"] = url_for('result_permalink', result_id=job.result["result_id"])
+    else:
+        status["result_url"] = url_for('job_result', job_id=job.id)
+    if job.kind != "batch" and job.status == STATUS_DONE and job.result:
+        status["analysis"] = _analysis_outcome(job.result)
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    """Cancels a running analysis; sections finished so far are kept and the rest show partial output."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired."}), 404
+    cancelled = job.cancel()
+    status = job.to_dict()
+    status["status_url"] = url_for('job_status', job_id=job.id)
+    return jsonify(status), 202 if cancelled else 409
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Streams a job's profile, LLM deltas and completed sections as Server-Sent Events."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired."}), 404
+    # EventSource resends the last seen id on reconnect; resume after it instead of replaying
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start_index = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    def generate():
+        for index, event_type, data in job.iter_events(start_index=start_index):
+            if event_type is None:
+                yield ": keep-alive\n\n" # Heartbeat; fails fast if the client has gone
+                continue
+            if event_type == "done":
+                data = dict(data, result_url=url_for('job_result', job_id=job.id))
+            yield f"id: {index}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>')
+def job_result(job_id):
+    """Renders the results page for a job, or the pending page if it is still running."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return render_template('index.html', error="Analysis job not found or expired."), 404
+    if job.kind == "batch":
+        return redirect(url_for('job_status', job_id=job.id))
+    if job.status in (STATUS_QUEUED, STATUS_RUNNING):
+        return render_template('results.html', username=job.username, job_id=job.id, pending=True), 202
+    if job.status == STATUS_FAILED:
+        return render_template('results.html', username=job.username, error=job.error)
+    if job.result.get("result_id"):
+        return redirect(url_for('result_permalink', result_id=job.result["result_id"]))
+
+    with timed("template_render", "results.html"):
+        return render_template('results.html', **_results_template_context(job.result))
+
+def _permalink(result_id):
+    """Link to a stored result, absolute only when SERVER_NAME is configured.
+
+    Never built from the request's Host header: the page it appears on is
+    cached in page_cache and served to every later visitor.
+    """
+    path = url_for('result_permalink', result_id=result_id)
+    server_name = app.config.get('SERVER_NAME')
+    if server_name:
+        return f"{app.config.get('PREFERRED_URL_SCHEME') or 'http'}://{server_name}{path}"
+    return path
+
+def _results_template_context(result):
+    """results.html context for a finished analysis; graph JSON is trusted output of prepare_graph_json."""
+    context = dict(result)
+    context['graph_store_enabled'] = not GRAPH_STORE_DISABLED
+    if context.get('result_id'):
+        context['permalink'] = _permalink(context['result_id'])
+    if 'graph_data_json' in context:
+        context['graph_data_json'] = Markup(context['graph_data_json'])
+    return context
+
+def _cached_page_response(page):
+    """Serves a CachedPage in the client's preferred encoding, answering If-None-Match with 304."""
+    encoding, body, etag = page.select(request.headers.get('Accept-Encoding'))
+    response = Response(body, mimetype=page.mimetype)
+    if encoding != "identity":
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Results never change, but they can be sensitive: let browsers keep a copy and revalidate it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@app.route('/results/<result_id>')
+def result_permalink(result_id):
+    """Permalink to a finished analysis, rendered once and then served from page_cache."""
+    page = page_cache.get(result_id)
+    if page is None:
+        stored = None if RESULT_STORE_DISABLED else result_store.get(result_id)
+        if stored is None:
+            return render_template('index.html', error="Analysis result not found."), 404
+        with timed("template_render", "results.html"):
+            html = render_template('results.html', **_results_template_context(dict(stored["context"], result_id=result_id)))
+        page = page_cache.put(result_id, CachedPage(html.encode('utf-8')))
+    return _cached_page_response(page)
+
+def _graph_request_node():
+    """The ?node= argument as a graph node ID; bare usernames map to their user node."""
+    node = (request.args.get('node') or '').strip()
+    return node if ':' in node else (user_node_id(node) if node else '')
+
+def _graph_request_error(node_id):
+    if GRAPH_STORE_DISABLED:
+        return jsonify({"error": "The cross-profile graph store is disabled."}), 404
+    if not node_id:
+        return jsonify({"error": "Missing 'node' parameter."}), 400
+    if graph_store.get_node(node_id) is None:
+        return jsonify({"error": f"Node '{node_id}' is not in the graph."}), 404
+    return None
+
+def _build_graph_layout(node_id, depth):
+    with timed("graph_layout", "view"):
+        subgraph = graph_store.neighbourhood(node_id, depth=depth, max_nodes=GRAPH_VIEW_MAX_NODES)
+        return GraphLayout(subgraph["nodes"], subgraph["edges"], focus=node_id, truncated=subgraph["truncated"])
+
+@app.route('/graph/view')
+def graph_view():
+    """Level-of-detail view of the cross-profile graph around ?node=, with precomputed positions.
+
+    Beyond GRAPH_LOD_MAX_NODES nodes, communities are collapsed into cluster
+    nodes; ?expanded=3,7 opens those clusters. Layouts are cached per graph
+    revision, so expanding a cluster only re-slices the cached layout.
+    """
+    node_id = _graph_request_node()
+    error = _graph_request_error(node_id)
+    if error:
+        return error
+    depth = min(max(request.args.get('depth', 2, type=int), 1), GRAPH_MAX_DEPTH)
+    expanded = [cluster for cluster in request.args.get('expanded', '').split(',') if cluster]
+    layout = cached_layout((node_id, depth, graph_store.revision()), lambda: _build_graph_layout(node_id, depth))
+    view = layout.view(expanded)
+    view["node"] = node_id
+    return jsonify(view)
+
+@app.route('/graph/neighbourhood')
+def graph_neighbourhood():
+    """Pages through the nodes around ?node= (nearest first) with the edges linking them to earlier pages."""
+    node_id = _graph_request_node()
+    error = _graph_request_error(node_id)
+    if error:
+        return error
+    depth = min(max(request.args.get('depth', 1, type=int), 1), GRAPH_MAX_DEPTH)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), GRAPH_PAGE_MAX_LIMIT)
+    page = graph_store.neighbourhood_page(node_id, depth=depth, offset=offset, limit=limit, max_nodes=GRAPH_VIEW_MAX_NODES)
+    page["node"] = node_id
+    page["next_url"] = (url_for('graph_neighbourhood', node=node_id, depth=depth, offset=page["next_offset"], limit=limit)
+                        if page["next_offset"] is not None else None)
+    return jsonify(page)
+
+@app.route('/metrics')
+def metrics():
+    """Exposes stage timers and counters in the Prometheus text format."""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+def _batch_output_path(job_id):
+    return os.path.join(BATCH_OUTPUT_DIR, f"{job_id}.jsonl")
+
+def run_batch_job(job, usernames, force_refresh=False, analysis_mode=None):
+    """Job wrapper around run_batch that reports per-username progress."""
+    def report_progress(done, total):
+        job.set_progress(f"{done}/{total} usernames completed")
+    job.set_progress(f"0/{len(usernames)} usernames completed")
+    return run_batch(usernames, _batch_output_path(job.id), force_refresh=force_refresh,
+                     analysis_mode=analysis_mode, progress_callback=report_progress)
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Queues a batch analysis from a JSON body ({"usernames": [...]}) or an uploaded usernames file."""
+    payload = request.get_json(silent=True) or {}
+    if 'usernames_file' in request.files:
+        raw_usernames = request.files['usernames_file'].read().decode('utf-8', errors='replace').splitlines()
+    else:
+        raw_usernames = payload.get('usernames') or []
+    if not isinstance(raw_usernames, list):
+        return jsonify({"error": "'usernames' must be a list."}), 400
+    usernames = parse_usernames(str(u) for u in raw_usernames)
+    if not usernames:
+        return jsonify({"error": "No usernames provided."}), 400
+    force_refresh = bool(payload.get('force_refresh')) or request.form.get('force_refresh') in ('1', 'true', 'on')
+    analysis_mode = payload.get('analysis_mode') or request.form.get('analysis_mode') or DEFAULT_ANALYSIS_MODE
+    if analysis_mode not in ANALYSIS_MODES:
+        return jsonify({"error": f"Unknown analysis mode '{analysis_mode}'."}), 400
+
+    try:
+        job = job_queue.submit(f"batch of {len(usernames)}", run_batch_job, usernames,
+                               force_refresh=force_refresh, analysis_mode=analysis_mode, job_kind="batch")
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "usernames": len(usernames),
+        "status_url": url_for('job_status', job_id=job.id),
+        "result_url": url_for('batch_results', job_id=job.id)
+    }), 202
+
+@app.route('/batch/<job_id>/results')
+def batch_results(job_id):
+    """Serves the JSON Lines results written so far for a batch job."""
+    job = job_queue.get(job_id)
+    if job is None or job.kind != "batch":
+        return jsonify({"error": "Batch job not found or expired."}), 404
+    output_path = _batch_output_path(job.id)
+    if not os.path.exists(output_path):
+        return jsonify({"error": "No results written yet.", "status": job.status}), 404
+    return send_file(os.path.abspath(output_path), mimetype='application/x-ndjson', max_age=0)
 
 if __name__ == '__main__':
     # API Key check is now handled within run_all_analyses_parallel
@@ -0,0 +1,208 @@
+import os
+import json
+import random
+import asyncio
+import urllib.parse
+import httpx
+from rate_limiter import instagram_rate_limiter, parse_retry_after
+from profile_decoder import decode_profile_response, loads as decode_json
+from stage_metrics import timed, PROFILE_LOOKUPS
+from scraper_utils import (
+    prepare_cookies, prepare_headers, profile_url, parse_profile_response, profile_http_error_message,
+    get_cached_profile, GRAPHQL_URL, MEDIA_QUERY_HASH, COMMENTS_QUERY_HASH, DEFAULT_POSTS_PER_PAGE,
+    INSTAGRAM_TIMEOUT_SECONDS, INSTAGRAM_MAX_RETRIES, INSTAGRAM_BACKOFF_FACTOR,
+)
+
+# --- Constants ---
+# Upper bound on in-flight Instagram requests across everything the engine is doing
+ASYNC_FETCH_CONCURRENCY = int(os.getenv("ASYNC_FETCH_CONCURRENCY", "10"))
+ASYNC_MAX_PAGES = int(os.getenv("ASYNC_MAX_PAGES", "10"))
+DEFAULT_COMMENTS_PER_POST = 50
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class AsyncFetchEngine:
+    """Concurrent Instagram fetcher for profiles, post pages and comments.
+
+    One httpx.AsyncClient (keep-alive pool) is shared by all requests and an
+    asyncio.Semaphore caps how many are in flight. GraphQL requests (post pages
+    and comments) are also paced by the shared instagram_rate_limiter, like the
+    threaded crawls. Use as an async context manager:
+
+        async with AsyncFetchEngine() as engine:
+            profiles = await engine.fetch_profiles(["zuck", "instagram"])
+    """
+
+    def __init__(self, cookies=None, concurrency=ASYNC_FETCH_CONCURRENCY, max_retries=INSTAGRAM_MAX_RETRIES,
+                 timeout=INSTAGRAM_TIMEOUT_SECONDS):
+        self.cookies = cookies or prepare_cookies()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._client = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self._client = httpx.AsyncClient(cookies=self.cookies, timeout=self.timeout, limits=limits)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+
+    async def _get_json(self, url, username, decode=decode_json, limiter=None):
+        """GETs url with retries on 429/5xx (honouring Retry-After) and returns decode(response body).
+
+        With a limiter (an AdaptiveRateLimiter), every attempt waits for a token
+        and throttling backs off the limiter, so the pause applies to all callers.
+        """
+        headers = prepare_headers(username, self.cookies)
+        for attempt in range(self.max_retries + 1):
+            if limiter is not None:
+                await limiter.acquire_async()
+            async with self._semaphore:
+                response = await self._client.get(url, headers=headers)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if limiter is not None:
+                    delay = limiter.on_throttle(retry_after) # Waited out by the next acquire_async()
+                elif retry_after is not None:
+                    delay = retry_after
+                else:
+                    delay = INSTAGRAM_BACKOFF_FACTOR * (2 ** attempt) * (1 + random.random())
+                if attempt < self.max_retries:
+                    print(f"  HTTP {response.status_code} for {username}; retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                    if limiter is None:
+                        await asyncio.sleep(delay) # Outside the semaphore so other requests keep flowing
+                    continue
+            response.raise_for_status()
+            if limiter is not None:
+                limiter.on_success()
+            return decode(response.content)
+
+    # --- Profiles ---
+
+    async def fetch_profile(self, username, force_refresh=False):
+        """Async equivalent of scraper_utils.get_user_info_and_id (same return tuple)."""
+        if not force_refresh:
+            cached = get_cached_profile(username)
+            if cached is not None:
+                return cached
+        print(f"Fetching user info for {username} (async)...")
+        PROFILE_LOOKUPS.inc(source="network")
+        try:
+            with timed("profile_fetch"):
+                data = await self._get_json(profile_url(username), username, decode=decode_profile_response)
+            return parse_profile_response(username, data)
+        except httpx.HTTPStatusError as http_err:
+            print(f"HTTP error fetching initial profile info for {username}: {http_err}")
+            return None, None, None, profile_http_error_message(http_err.response.status_code)
+        except httpx.RequestError as e:
+            print(f"Network error fetching initial profile info for {username}: {e}")
+            return None, None, None, f"Network Error: {e.__class__.__name__}"
+        except json.JSONDecodeError:
+            print(f"Failed to decode JSON response for initial profile info for {username}.")
+            return None, None, None, "Invalid JSON Response Received"
+        except Exception as e:
+            # A malformed profile must not escape gather() and abort the other lookups
+            print(f"An unexpected error occurred fetching profile info for {username}: {e}")
+            return None, None, None, f"Unexpected Error: {e.__class__.__name__}"
+
+    async def fetch_profiles(self, usernames, force_refresh=False):
+        """Fetches many profiles concurrently. Returns {username: (user_id, basic_info, post_edges, error)}."""
+        results = await asyncio.gather(*(self.fetch_profile(u, force_refresh) for u in usernames))
+        return dict(zip(usernames, results))
+
+    # --- Posts ---
+
+    async def fetch_posts_page(self, user_id, username, end_cursor=None):
+        """Fetches one GraphQL page of posts. Returns the edge_owner_to_timeline_media dict."""
+        variables = {'id': user_id, 'first': DEFAULT_POSTS_PER_PAGE}
+        if end_cursor:
+            variables['after'] = end_cursor
+        params = {'query_hash': MEDIA_QUERY_HASH, 'variables': json.dumps(variables)}
+        with timed("pagination_page"):
+            data = await self._get_json(f"{GRAPHQL_URL}?{urllib.parse.urlencode(params)}", username,
+                                        limiter=instagram_rate_limiter)
+        # Private, deleted and throttled profiles come back with "data" or "user" set to null
+        user = ((data or {}).get('data') or {}).get('user') or {}
+        return user.get('edge_owner_to_timeline_media') or {}
+
+    async def fetch_all_posts(self, user_id, username, max_pages=ASYNC_MAX_PAGES, start_cursor=None):
+        """Follows end_cursor for one user. Pages are sequential; different users run concurrently."""
+        all_posts = []
+        end_cursor = start_cursor
+        for page in range(max_pages):
+            try:
+                media_data = await self.fetch_posts_page(user_id, username, end_cursor)
+            except (httpx.HTTPError, json.JSONDecodeError) as e:
+                print(f"  Failed to fetch page {page + 1} for {username}: {e}. Resume from cursor: {end_cursor}")
+                break
+            if not media_data:
+                print(f"  Error: Could not find media data in GraphQL response for {username}.")
+                break
+            all_posts.extend(media_data.get('edges') or [])
+            page_info = media_data.get('page_info') or {}
+            end_cursor = page_info.get('end_cursor')
+            if not page_info.get('has_next_page'):
+                break
+        print(f"Fetched {len(all_posts)} posts for {username} (async).")
+        return all_posts
+
+    # --- Comments ---
+
+    async def fetch_comments(self, shortcode, username, first=DEFAULT_COMMENTS_PER_POST):
+        """Fetches the first page of top-level comments for a post. Returns comment nodes."""
+        variables = {'shortcode': shortcode, 'first': first}
+        params = {'query_hash': COMMENTS_QUERY_HASH, 'variables': json.dumps(variables)}
+        try:
+            data = await self._get_json(f"{GRAPHQL_URL}?{urllib.parse.urlencode(params)}", username,
+                                        limiter=instagram_rate_limiter)
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            print(f"  Failed to fetch comments for {shortcode}: {e}")
+            return []
+        media = ((data or {}).get('data') or {}).get('shortcode_media') or {}
+        edges = (media.get('edge_media_to_parent_comment') or {}).get('edges') or []
+        return [edge['node'] for edge in edges if isinstance(edge, dict) and edge.get('node')]
+
+    # --- Whole crawls ---
+
+    async def crawl_profile(self, username, max_pages=ASYNC_MAX_PAGES, with_comments=False, force_refresh=False):
+        """Profile lookup, then post pagination, then (optionally) comments for every post concurrently."""
+        user_id, basic_info, post_edges, error = await self.fetch_profile(username, force_refresh)
+        result = {"username": username, "user_id": user_id, "basic_info": basic_info,
+                  "post_edges": post_edges or [], "comments": {}, "error": error}
+        if error or not user_id:
+            return result
+        if max_pages > 0:
+            result["post_edges"] = await self.fetch_all_posts(user_id, username, max_pages)
+        if with_comments:
+            shortcodes = [(e.get('node') or {}).get('shortcode') for e in result["post_edges"]]
+            shortcodes = [code for code in shortcodes if code]
+            comments = await asyncio.gather(*(self.fetch_comments(code, username) for code in shortcodes))
+            result["comments"] = dict(zip(shortcodes, comments))
+        return result
+
+    async def crawl_profiles(self, usernames, max_pages=ASYNC_MAX_PAGES, with_comments=False, force_refresh=False):
+        """Crawls many profiles concurrently, all sharing the engine's request limit."""
+        return await asyncio.gather(*(self.crawl_profile(u, max_pages, with_comments, force_refresh) for u in usernames))
+
+
+# --- Sync Wrappers (for Flask views, batch jobs and scripts) ---
+
+def fetch_profiles_sync(usernames, cookies=None, concurrency=ASYNC_FETCH_CONCURRENCY, force_refresh=False):
+    """Blocking wrapper around AsyncFetchEngine.fetch_profiles."""
+    async def _run():
+        async with AsyncFetchEngine(cookies=cookies, concurrency=concurrency) as engine:
+            return await engine.fetch_profiles(usernames, force_refresh=force_refresh)
+    return asyncio.run(_run())
+
+
+def crawl_profiles_sync(usernames, cookies=None, concurrency=ASYNC_FETCH_CONCURRENCY, max_pages=ASYNC_MAX_PAGES,
+                        with_comments=False, force_refresh=False):
+    """Blocking wrapper around AsyncFetchEngine.crawl_profiles."""
+    async def _run():
+        async with AsyncFetchEngine(cookies=cookies, concurrency=concurrency) as engine:
+            return await engine.crawl_profiles(usernames, max_pages, with_comments, force_refresh)
+    return asyncio.run(_run())
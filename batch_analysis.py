@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scraper_utils import get_user_info_and_id, run_analyses, prepare_cookies, prepare_headers, ANALYSIS_MODES
+from async_fetch import fetch_profiles_sync
+from instagram_scraper import store_new_posts
+
+# --- Constants ---
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+# Process-wide limits shared by every batch, so parallel batches can't exceed them together
+BATCH_PROFILE_CONCURRENCY = int(os.getenv("BATCH_PROFILE_CONCURRENCY", "4"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR", "batch_results")
+
+profile_semaphore = threading.BoundedSemaphore(BATCH_PROFILE_CONCURRENCY)
+llm_semaphore = threading.BoundedSemaphore(BATCH_LLM_CONCURRENCY)
+
+
+def read_usernames(path):
+    """Reads one username per line, skipping blanks, '#' comments and duplicates."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_usernames(f.read().splitlines())
+
+
+def parse_usernames(lines):
+    """Normalises a list of raw usernames (strips '@', whitespace and duplicates)."""
+    usernames = []
+    seen = set()
+    for line in lines:
+        username = line.split('#', 1)[0].strip().lstrip('@')
+        if username and username.lower() not in seen:
+            seen.add(username.lower())
+            usernames.append(username)
+    return usernames
+
+
+def analyze_one(username, force_refresh=False, analysis_mode=None, profile=None):
+    """Runs profile fetch, post storage and LLM analyses for one username, returning a JSON-serialisable record.
+
+    profile may be a prefetched (user_id, basic_info, post_edges, error) tuple.
+    """
+    start_time = time.time()
+    record = {"username": username, "status": "error", "error": None}
+    try:
+        cookies = prepare_cookies()
+        headers = prepare_headers(username, cookies)
+        if profile is None:
+            with profile_semaphore:
+                profile = get_user_info_and_id(username, cookies, headers, force_refresh=force_refresh)
+        user_id, basic_info, post_edges, profile_error = profile
+
+        if profile_error or not basic_info:
+            record["error"] = profile_error or "Failed to retrieve basic profile information."
+        else:
+            # Same post store/graph merge as the web app, so batch-analyzed profiles are queryable too
+            new_post_edges = store_new_posts(user_id, username, cookies, headers, post_edges)
+            with llm_semaphore:
+                analysis_results = run_analyses(username, basic_info.get('biography') or "", post_edges, mode=analysis_mode)
+            record.update({
+                "status": "ok",
+                "user_id": user_id,
+                "profile_info": basic_info,
+                "report": analysis_results.get("report"),
+                "forensic_notes": analysis_results.get("forensic_notes"),
+                "json_data": analysis_results.get("json_data"),
+                "metrics": analysis_results.get("metrics"),
+                "new_post_count": len(new_post_edges),
+            })
+    except Exception as e:
+        print(f"Batch analysis for {username} failed: {e}")
+        record["error"] = f"Unexpected Error: {e.__class__.__name__}: {e}"
+
+    record["latency_seconds"] = round(time.time() - start_time, 3)
+    record["completed_at"] = time.time()
+    return record
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(records, wall_seconds):
+    """Builds throughput/latency statistics for a finished batch."""
+    latencies = sorted(r["latency_seconds"] for r in records)
+    succeeded = sum(1 for r in records if r["status"] == "ok")
+    return {
+        "total": len(records),
+        "succeeded": succeeded,
+        "failed": len(records) - succeeded,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_minute": round(len(records) / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+        "latency_p50_seconds": _percentile(latencies, 50),
+        "latency_p95_seconds": _percentile(latencies, 95),
+        "latency_max_seconds": latencies[-1] if latencies else 0.0,
+    }
+
+
+def run_batch(usernames, output_path, max_workers=BATCH_WORKERS, force_refresh=False, analysis_mode=None,
+              progress_callback=None, prefetch_profiles=True):
+    """Analyzes every username, appending each record to output_path (JSON Lines) as it completes.
+
+    With prefetch_profiles, all profiles are first fetched concurrently by the
+    async fetch engine, so only the LLM stage runs on the worker pool.
+    Returns the summary dict from summarize().
+    """
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    print(f"--- Starting batch analysis of {len(usernames)} usernames -> {output_path} ---")
+    start_time = time.time()
+    profiles = {}
+    if prefetch_profiles:
+        print(f"Prefetching {len(usernames)} profiles concurrently (limit {BATCH_PROFILE_CONCURRENCY})...")
+        profiles = fetch_profiles_sync(usernames, concurrency=BATCH_PROFILE_CONCURRENCY, force_refresh=force_refresh)
+        print(f"Prefetched profiles in {time.time() - start_time:.2f}s.")
+    records = []
+    with open(output_path, 'a', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(analyze_one, username, force_refresh, analysis_mode, profiles.get(username)): username for username in usernames}
+        for future in as_completed(futures):
+            record = future.result() # analyze_one never raises
+            records.append(record)
+            # Stream each result to disk immediately so partial batches aren't lost
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"  [{len(records)}/{len(usernames)}] {record['username']}: {record['status']} ({record['latency_seconds']:.2f}s)")
+            if progress_callback:
+                progress_callback(len(records), len(usernames))
+
+    summary = summarize(records, time.time() - start_time)
+    print(f"--- Batch finished: {summary['succeeded']}/{summary['total']} succeeded in {summary['wall_seconds']:.2f}s "
+          f"({summary['throughput_per_minute']:.2f} profiles/min, p50 {summary['latency_p50_seconds']:.2f}s, "
+          f"p95 {summary['latency_p95_seconds']:.2f}s) ---")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run profile fetch and LLM analyses for a file of usernames.")
+    parser.add_argument("usernames_file", help="Text file with one username per line")
+    parser.add_argument("-o", "--output", default=None, help="JSON Lines output file (default: batch_results/batch_<timestamp>.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS, help="Usernames processed concurrently")
+    parser.add_argument("--force-refresh", action="store_true", help="Bypass the cached profile responses")
+    parser.add_argument("--no-prefetch", action="store_true", help="Fetch each profile inside its worker instead of concurrently up front")
+    parser.add_argument("--mode", choices=ANALYSIS_MODES, default=None, help="LLM analysis mode (default: ANALYSIS_MODE or 'parallel')")
+    args = parser.parse_args()
+
+    try:
+        usernames = read_usernames(args.usernames_file)
+    except IOError as e:
+        print(f"Error reading usernames file: {e}")
+        sys.exit(1)
+    if not usernames:
+        print("No usernames found in input file.")
+        sys.exit(1)
+
+    output_path = args.output or os.path.join(BATCH_OUTPUT_DIR, f"batch_{int(time.time())}.jsonl")
+    summary = run_batch(usernames, output_path, max_workers=args.workers, force_refresh=args.force_refresh,
+                        analysis_mode=args.mode, prefetch_profiles=not args.no_prefetch)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Measures per-call overhead of building a new OpenAI client versus the pooled one.
+
+Runs against a local mock chat-completions endpoint, so no API key or network
+access is needed:
+
+    python benchmarks/bench_llm_client.py --calls 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+from llm_client import get_llm_client, close_llm_clients
+
+MOCK_COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "mock/model",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    """Answers every POST with a fixed chat completion, keeping connections alive."""
+    protocol_version = "HTTP/1.1"
+    connections_opened = 0
+
+    def setup(self):
+        super().setup()
+        MockChatHandler.connections_opened += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = json.dumps(MOCK_COMPLETION).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output clean
+
+
+def start_mock_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def _complete(client):
+    client.chat.completions.create(
+        model="mock/model",
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=1,
+    )
+
+
+def bench(label, calls, make_client):
+    MockChatHandler.connections_opened = 0
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        _complete(make_client())
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<22} mean {statistics.mean(latencies):7.3f} ms | "
+          f"median {statistics.median(latencies):7.3f} ms | "
+          f"connections opened: {MockChatHandler.connections_opened}")
+    return statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200, help="Number of sequential calls per mode")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server()
+    try:
+        # Warm up imports and the server before timing
+        _complete(OpenAI(base_url=base_url, api_key="bench"))
+
+        per_call = bench("new client per call", args.calls,
+                         lambda: OpenAI(base_url=base_url, api_key="bench"))
+        pooled = bench("pooled client", args.calls,
+                       lambda: get_llm_client("bench", base_url=base_url))
+        print(f"Per-call overhead saved: {per_call - pooled:.3f} ms ({per_call / pooled:.1f}x)")
+        print("Note: the mock endpoint is plain HTTP, so real TLS handshake savings are larger.")
+    finally:
+        close_llm_clients()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Measures memory held by parsed posts: the old 12-key dicts versus PostRecord.
+
+Builds synthetic posts offline and reports tracemalloc's retained size for each form:
+
+    python benchmarks/bench_post_record.py --posts 100000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from post_record import PostRecord
+
+USERNAMES = [f"user_{i}" for i in range(500)]
+
+
+def make_fields(count, seed=42):
+    """Parser-shaped field values; usernames are fresh strings per post, as json.loads produces them."""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            'id': str(3000000000000000000 + i),
+            'shortcode': f"C{i:010d}",
+            'timestamp': 1700000000 - i * 3600,
+            'media_type': "".join("GraphImage"),
+            'display_url': f"https://scontent.cdninstagram.com/v/t51/{i}.jpg",
+            'likes_count': rng.randint(0, 100000),
+            'comments_count': rng.randint(0, 500),
+            'caption': f"Post {i} with @{rng.choice(USERNAMES)} #tag{i % 50}",
+            'caption_sentiment_compound': round(rng.uniform(-1, 1), 4),
+            'comment_previews': [f"comment {j} on {i}" for j in range(rng.randint(0, 2))],
+            'tagged_users_in_caption': ["".join(rng.choice(USERNAMES)) for _ in range(rng.randint(0, 2))],
+            'tagged_users_in_media': ["".join(rng.choice(USERNAMES)) for _ in range(rng.randint(0, 3))],
+        }
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    posts = build(make_fields(count))
+    elapsed = time.perf_counter() - start
+    # Drop the generator's transient allocations; what remains is what the posts retain
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del posts
+    return retained, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100000, help="Number of synthetic posts")
+    args = parser.parse_args()
+
+    results = {
+        "dict": measure(lambda fields: [dict(f) for f in fields], args.posts),
+        "PostRecord": measure(lambda fields: [PostRecord(**f) for f in fields], args.posts),
+    }
+    baseline = results["dict"][0]
+    print(f"{args.posts} posts")
+    for name, (retained, peak, elapsed) in results.items():
+        print(f"  {name:<11} retained {retained / 1e6:8.1f} MB  ({retained / args.posts:6.0f} B/post, "
+              f"{retained / baseline:5.0%} of dict)  peak {peak / 1e6:8.1f} MB  build {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
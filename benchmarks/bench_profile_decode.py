@@ -0,0 +1,85 @@
+"""Compares full web_profile_info decoding with the selective profile_decoder path.
+
+Builds a realistic payload from zuck_profile_info.json padded with 12 full post
+edges and decodes it repeatedly, as a batch run would:
+
+    python benchmarks/bench_profile_decode.py --profiles 500
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import profile_decoder
+from profile_decoder import slim_profile_payload
+
+
+def make_edge(i):
+    """A post edge with the extra fields Instagram sends but we never read."""
+    return {"node": {
+        "__typename": "GraphSidecar", "id": str(3300000000000000000 + i), "shortcode": f"C{i:010d}",
+        "dimensions": {"height": 1350, "width": 1080},
+        "display_url": f"https://scontent.cdninstagram.com/v/t51.29350-15/{i}_n.jpg?stp=dst-jpg_e35&_nc_ht=scontent",
+        "edge_media_to_tagged_user": {"edges": [{"node": {"user": {"full_name": "Someone", "id": str(j),
+            "is_verified": False, "profile_pic_url": "https://scontent.cdninstagram.com/p.jpg", "username": f"tagged_{j}"},
+            "x": 0.5, "y": 0.5}} for j in range(3)]},
+        "fact_check_overall_rating": None, "fact_check_information": None, "gating_info": None,
+        "sharing_friction_info": {"should_have_sharing_friction": False, "bloks_app_url": None},
+        "media_overlay_info": None, "media_preview": "ACoq" + "x" * 300, "owner": {"id": "314216", "username": "zuck"},
+        "is_video": False, "has_upcoming_event": False, "accessibility_caption": "Photo by Mark Zuckerberg " * 4,
+        "edge_media_to_caption": {"edges": [{"node": {"text": f"Caption for post {i} with @friend and #tag " * 3}}]},
+        "edge_media_to_comment": {"count": 1200, "page_info": {"has_next_page": True, "end_cursor": "x" * 40}},
+        "comments_disabled": False, "taken_at_timestamp": 1700000000 - i * 3600,
+        "edge_liked_by": {"count": 250000}, "edge_media_preview_like": {"count": 250000},
+        "location": {"id": "1", "has_public_page": True, "name": "Palo Alto", "slug": "palo-alto"},
+        "thumbnail_src": f"https://scontent.cdninstagram.com/v/{i}_thumb.jpg",
+        "thumbnail_resources": [{"src": f"https://scontent.cdninstagram.com/v/{i}_{w}.jpg", "config_width": w,
+                                 "config_height": w} for w in (150, 240, 320, 480, 640)],
+        "coauthor_producers": [], "pinned_for_users": [], "viewer_can_reshare": True,
+        "edge_sidecar_to_children": {"edges": [{"node": {"__typename": "GraphImage", "id": str(k),
+            "display_url": f"https://scontent.cdninstagram.com/v/{i}_{k}.jpg", "dimensions": {"height": 1350, "width": 1080},
+            "accessibility_caption": "Image may contain: person", "is_video": False}} for k in range(4)]},
+    }}
+
+
+def make_payload():
+    with open(os.path.join(ROOT, "zuck_profile_info.json"), 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    payload = copy.deepcopy(payload)
+    payload["data"]["user"]["edge_owner_to_timeline_media"]["edges"] = [make_edge(i) for i in range(12)]
+    return json.dumps(payload).encode('utf-8')
+
+
+def bench(name, decode, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = decode(content)
+    elapsed = time.perf_counter() - start
+    edges = data["data"]["user"]["edge_owner_to_timeline_media"]["edges"]
+    cached_bytes = len(json.dumps(edges))
+    print(f"  {name:<28} {elapsed * 1000 / repeat:7.3f} ms/profile  cached post_edges {cached_bytes / 1024:6.1f} KB")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=500, help="Profiles decoded per variant")
+    args = parser.parse_args()
+
+    content = make_payload()
+    print(f"Payload {len(content) / 1024:.1f} KB x {args.profiles} profiles (orjson: {profile_decoder.JSON_BACKEND == 'orjson'})")
+    baseline = bench("json.loads (full payload)", lambda c: json.loads(c.decode('utf-8')), content, args.profiles)
+    stdlib = bench("json.loads + slim", lambda c: slim_profile_payload(json.loads(c.decode('utf-8'))), content, args.profiles)
+    print(f"    {baseline / stdlib:.2f}x vs full")
+    if profile_decoder.orjson is not None:
+        fast = bench("orjson + slim", profile_decoder.decode_profile_response, content, args.profiles)
+        print(f"    {baseline / fast:.2f}x vs full")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compares per-call VADER construction with the shared, batched sentiment engine.
+
+Scores synthetic captions offline (the VADER lexicon must be installed):
+
+    python benchmarks/bench_sentiment.py --captions 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from sentiment_engine import get_analyzer, score_batch
+
+WORDS = ("great amazing love happy launch team build future sad terrible awful proud "
+         "excited new product today thanks community world hard work win lose fun").split()
+
+
+def make_captions(count, seed=42):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))) + " #tag @user" for _ in range(count)]
+
+
+def bench_per_call(captions):
+    """The old analyze_sentiment(): a new analyzer (and lexicon load) for every caption."""
+    start = time.perf_counter()
+    for caption in captions:
+        SentimentIntensityAnalyzer().polarity_scores(caption)
+    return time.perf_counter() - start
+
+
+def bench_singleton(captions):
+    analyzer = get_analyzer()
+    start = time.perf_counter()
+    for caption in captions:
+        analyzer.polarity_scores(caption)
+    return time.perf_counter() - start
+
+
+def bench_batch(captions, workers):
+    start = time.perf_counter()
+    score_batch(enumerate(captions), workers=workers, process_threshold=0)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captions", type=int, default=10000, help="Number of synthetic captions")
+    parser.add_argument("--baseline-sample", type=int, default=500,
+                        help="Captions scored with the per-call baseline (extrapolated to --captions)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Process pool size for the batch run")
+    args = parser.parse_args()
+
+    captions = make_captions(args.captions)
+    sample = captions[:min(args.baseline_sample, len(captions))]
+
+    per_call = bench_per_call(sample) * len(captions) / len(sample)
+    singleton = bench_singleton(captions)
+    batch = bench_batch(captions, args.workers)
+
+    print(f"{len(captions)} captions")
+    print(f"  per-call analyzer (extrapolated from {len(sample)}): {per_call:8.2f} s")
+    print(f"  shared analyzer, in-process:                 {singleton:8.2f} s  ({per_call / singleton:6.1f}x)")
+    print(f"  batched, {args.workers} worker process(es):              {batch:8.2f} s  ({per_call / batch:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Offline micro-benchmarks for post parsing, prompt building, LLM JSON post-processing and graph preparation.
+
+Each case runs against synthetic fixtures (see fixtures.py) at several sizes and
+reports the median/min wall time and tracemalloc peak memory. Save a run with
+--json and compare later runs against it with --baseline to catch regressions:
+
+    python benchmarks/bench_suite.py --sizes 10,1000,100000 --json baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("LOCAL_STORE_DISABLED", "1") # Never write benchmark data into the real stores
+os.environ.setdefault("GRAPH_STORE_DISABLED", "1")
+
+from fixtures import make_post_edges, make_profile_payload, make_forensic_json, make_llm_json_response
+from instagram_scraper import parse_profile_data
+from scraper_utils import _prepare_post_data_for_llm, _parse_forensic_json, POST_SUMMARY_TOKEN_BUDGET
+from app import prepare_graph_json
+from entity_extractor import extract_entities
+
+DEFAULT_SIZES = (10, 1000, 100000)
+TIMESTAMP = "2025-01-01T00:00:00Z"
+USERNAME = "zuck"
+
+
+# --- Cases ---
+# Each case maps a size to a setup() returning fresh call arguments, so input
+# mutation (prepare_graph_json edits nodes in place) never leaks between runs.
+
+def case_parse_profile_data(size):
+    edges = make_profile_payload(size)["data"]["user"]["edge_owner_to_timeline_media"]["edges"]
+    return parse_profile_data, lambda: (edges,)
+
+
+def case_prepare_post_data_for_llm(size):
+    edges = make_post_edges(size)
+    return _prepare_post_data_for_llm, lambda: (edges,)
+
+
+def case_budgeted_post_summary(size):
+    edges = make_post_edges(size)
+    return _prepare_post_data_for_llm, lambda: (edges, 5, 200, POST_SUMMARY_TOKEN_BUDGET)
+
+
+def case_extract_entities(size):
+    edges = make_post_edges(size)
+    return extract_entities, lambda: ("Founder @meta. Contact: press@example.com", edges)
+
+
+def case_parse_forensic_json(size):
+    response = make_llm_json_response(USERNAME, size)
+    return _parse_forensic_json, lambda: (response, USERNAME, TIMESTAMP)
+
+
+def case_prepare_graph_json(size):
+    json_data = make_forensic_json(USERNAME, size)
+    return prepare_graph_json, lambda: (copy.deepcopy(json_data),)
+
+
+CASES = {
+    "parse_profile_data": case_parse_profile_data,
+    "_prepare_post_data_for_llm": case_prepare_post_data_for_llm,
+    "_prepare_post_data_for_llm[token_budget]": case_budgeted_post_summary,
+    "extract_entities": case_extract_entities,
+    "extract_json_data_llm.post_processing": case_parse_forensic_json,
+    "prepare_graph_json": case_prepare_graph_json,
+}
+
+
+def run_case(func, setup, repeat):
+    """Returns (median_seconds, min_seconds, peak_bytes); the functions' logging is silenced."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            args = setup()
+            start = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - start)
+
+        # Separate pass for memory: tracemalloc slows the code down, so it isn't timed
+        args = setup()
+        tracemalloc.start()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return statistics.median(timings), min(timings), peak
+
+
+def compare(results, baseline, tolerance):
+    """Prints cases slower than baseline by more than tolerance; returns True if any regressed."""
+    regressed = False
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        ratio = result["median_seconds"] / previous["median_seconds"] if previous["median_seconds"] else 1.0
+        if ratio > 1 + tolerance:
+            regressed = True
+            print(f"REGRESSION {key}: {previous['median_seconds'] * 1000:.3f} ms -> {result['median_seconds'] * 1000:.3f} ms ({ratio:.2f}x)")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated post counts")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case and size")
+    parser.add_argument("--only", action="append", choices=sorted(CASES), help="Run only these cases (repeatable)")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a JSON file written by --json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = {}
+    print(f"{'case':<40} {'posts':>7} {'median ms':>11} {'min ms':>11} {'peak MB':>9}")
+    for name in args.only or CASES:
+        for size in sizes:
+            func, setup = CASES[name](size)
+            median, fastest, peak = run_case(func, setup, args.repeat)
+            results[f"{name}[{size}]"] = {"case": name, "size": size, "median_seconds": median,
+                                          "min_seconds": fastest, "peak_bytes": peak}
+            print(f"{name:<40} {size:>7} {median * 1000:>11.3f} {fastest * 1000:>11.3f} {peak / 1e6:>9.2f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.json_path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Synthetic, offline fixtures shaped like zuck_profile_info.json for the benchmarks."""
+import copy
+import json
+import os
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_TEMPLATE_PATH = os.path.join(ROOT, "zuck_profile_info.json")
+
+WORDS = ("great amazing love happy launch team build future sad terrible proud excited new product "
+         "today thanks community world hard work win fun travel food family friends").split()
+
+
+def load_profile_template():
+    with open(PROFILE_TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_post_edge(i, rng):
+    """One timeline edge with every field the parsers and prompt builders read."""
+    caption = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40)))
+    caption += f" @friend_{rng.randint(0, 499)} #tag{rng.randint(0, 49)}"
+    return {"node": {
+        "__typename": rng.choice(("GraphImage", "GraphVideo", "GraphSidecar")),
+        "id": str(3300000000000000000 + i),
+        "shortcode": f"C{i:010d}",
+        "display_url": f"https://scontent.cdninstagram.com/v/t51.29350-15/{i}_n.jpg",
+        "taken_at_timestamp": 1700000000 - i * 3600,
+        "video_view_count": rng.randint(0, 10 ** 6) if i % 3 == 1 else None,
+        "edge_liked_by": {"count": rng.randint(0, 10 ** 6)},
+        "edge_media_to_caption": {"edges": [{"node": {"text": caption}}]},
+        "edge_media_to_comment": {"count": rng.randint(0, 5000), "edges": [
+            {"node": {"text": f"comment {j} on post {i}"}} for j in range(rng.randint(0, 2))]},
+        "edge_media_to_tagged_user": {"edges": [
+            {"node": {"user": {"username": f"tagged_{rng.randint(0, 499)}"}}} for _ in range(rng.randint(0, 3))]},
+    }}
+
+
+def make_post_edges(count, seed=42):
+    rng = random.Random(seed)
+    return [make_post_edge(i, rng) for i in range(count)]
+
+
+def make_profile_payload(post_count, seed=42):
+    """A web_profile_info payload with post_count synthetic timeline edges."""
+    payload = copy.deepcopy(load_profile_template())
+    media = payload["data"]["user"]["edge_owner_to_timeline_media"]
+    media["count"] = post_count
+    media["edges"] = make_post_edges(post_count, seed)
+    return payload
+
+
+def make_forensic_json(username, node_count, seed=42):
+    """A forensic analysis object as extract_json_data_llm expects it, with a node_count-sized graph."""
+    rng = random.Random(seed)
+    nodes = [{"id": "profile_owner", "label": username, "type": "ProfileOwner"}]
+    nodes += [{"id": f"user_{i}", "label": f"@user_{i}", "type": "MentionedUser"} for i in range(node_count)]
+    edges = [{"from": "profile_owner", "to": f"user_{i}", "label": rng.choice(("mentions", "tags", "follows"))}
+             for i in range(node_count)]
+    return {
+        "analysis_metadata": {"model": "benchmark", "timestamp_utc": None},
+        "profile_context": {"username": username, "biography": "I build stuff"},
+        "initial_posts_summary": {"post_count_analyzed": node_count, "themes": ["tech", "family"]},
+        "linguistic_analysis": {"tone": "positive", "language": "en"},
+        "entity_extraction": {"mentions": [f"@user_{i}" for i in range(node_count)], "hashtags": ["#tag"]},
+        "network_connections_explicit": {"nodes": nodes, "edges": edges},
+        "inferred_analysis": {"interests": ["technology"]},
+        "threat_indicators_potential": [],
+        "cross_platform_links_potential": [],
+        "suggestions_for_investigation": ["Review tagged accounts"],
+    }
+
+
+def make_llm_json_response(username, node_count, seed=42):
+    """The raw LLM text for make_forensic_json: fenced JSON with chatter around it."""
+    body = json.dumps(make_forensic_json(username, node_count, seed), indent=2)
+    return f"Here is the analysis you asked for.\n```json\n{body}\n```\nLet me know if you need more."
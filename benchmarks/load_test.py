@@ -0,0 +1,190 @@
+"""Drives the Flask app's /analyze endpoint at a target concurrency and reports latency percentiles.
+
+Start benchmarks/mock_services.py and the app pointed at it first (see that
+file's docstring), then:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --requests 200 --concurrency 20
+
+Each request submits a job, then polls its status until it finishes. Usernames
+are unique per request by default so the profile and LLM caches don't hide the
+real cost. A finished job counts as "failed" when its profile lookup or any LLM
+section errored, timed out or was cancelled, and as "degraded" when a section
+only succeeded through a hedged request; only "ok" jobs feed the latency
+percentiles. Pass --mock-url to report the mock's injected 429s and 500s too.
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+TERMINAL_STATUSES = ("done", "failed")
+FAILED_TASK_OUTCOMES = ("failed", "timeout", "cancelled")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _request_json(url, data=None, timeout=30):
+    request = urllib.request.Request(url, data=data, headers={"Accept": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"{}")
+        except ValueError:
+            return e.code, {}
+
+
+def classify(job):
+    """Returns (outcome, detail) for a finished job's status: 'ok', 'degraded' or 'failed'."""
+    if job.get("status") != "done":
+        return "failed", job.get("error")
+    analysis = job.get("analysis") or {}
+    if analysis.get("error"):
+        return "failed", analysis["error"]
+    tasks = analysis.get("tasks") or {}
+    problems = [f"{name}: {task.get('outcome')}" + (f" ({task['error']})" if task.get("error") else "")
+                for name, task in tasks.items() if task.get("outcome") in FAILED_TASK_OUTCOMES or task.get("error")]
+    if analysis.get("llm_error"):
+        problems.insert(0, analysis["llm_error"])
+    if problems:
+        return "failed", "; ".join(problems)
+    hedged = [name for name, task in tasks.items() if task.get("hedged")]
+    if hedged:
+        return "degraded", f"hedged: {', '.join(hedged)}"
+    return "ok", None
+
+
+def fetch_mock_stats(mock_url):
+    """The mock services' request/429/500 counters, or None if they can't be read."""
+    try:
+        status, stats = _request_json(f"{mock_url}/__stats")
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Warning: Could not read mock service stats: {e}")
+        return None
+    return stats if status == 200 else None
+
+
+def stats_delta(before, after):
+    if before is None or after is None:
+        return None
+    return {service: {key: value - before.get(service, {}).get(key, 0) for key, value in counts.items()}
+            for service, counts in after.items()}
+
+
+def run_one(base_url, username, analysis_mode, force_refresh, poll_interval, job_timeout):
+    """Submits one analysis and waits for it. Returns a result dict."""
+    form = {"username": username, "analysis_mode": analysis_mode}
+    if force_refresh:
+        form["force_refresh"] = "1"
+    start = time.perf_counter()
+    result = {"username": username, "outcome": "error", "submit_seconds": None, "total_seconds": None, "detail": None}
+    try:
+        status, body = _request_json(f"{base_url}/analyze", urllib.parse.urlencode(form).encode("utf-8"))
+    except (urllib.error.URLError, OSError) as e:
+        result["detail"] = f"{e.__class__.__name__}: {e}"
+        return result
+    result["submit_seconds"] = time.perf_counter() - start
+    if status == 503:
+        result["outcome"] = "rejected"
+        return result
+    if status != 202:
+        result["detail"] = f"HTTP {status} from /analyze: {body.get('error')}"
+        return result
+
+    status_url = urllib.parse.urljoin(base_url, body["status_url"])
+    deadline = start + job_timeout
+    while time.perf_counter() < deadline:
+        time.sleep(poll_interval)
+        try:
+            status, job = _request_json(status_url)
+        except (urllib.error.URLError, OSError) as e:
+            result["detail"] = f"{e.__class__.__name__} while polling: {e}"
+            return result
+        if status != 200:
+            result["detail"] = f"HTTP {status} from status endpoint"
+            return result
+        if job.get("status") in TERMINAL_STATUSES:
+            result["total_seconds"] = time.perf_counter() - start
+            result["outcome"], result["detail"] = classify(job)
+            return result
+    result["outcome"] = "timeout"
+    return result
+
+
+def summarize(results, wall_seconds, mock_stats=None):
+    outcomes = {}
+    for result in results:
+        outcomes[result["outcome"]] = outcomes.get(result["outcome"], 0) + 1
+    submit = [r["submit_seconds"] for r in results if r["submit_seconds"] is not None]
+    total = [r["total_seconds"] for r in results if r["outcome"] == "ok"]
+    count = len(results)
+    return {
+        "requests": count,
+        "outcomes": outcomes,
+        "error_rate": round(1 - outcomes.get("ok", 0) / count, 4) if count else 0.0,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_minute": round(outcomes.get("ok", 0) / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+        "submit_latency_seconds": {f"p{p}": round(percentile(submit, p), 4) for p in (50, 95, 99)},
+        "end_to_end_latency_seconds": {f"p{p}": round(percentile(total, p), 4) for p in (50, 95, 99)},
+        "mock_services": mock_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Base URL of the running Flask app")
+    parser.add_argument("--requests", type=int, default=100, help="Total analyses to submit")
+    parser.add_argument("--concurrency", type=int, default=10, help="Analyses in flight at once")
+    parser.add_argument("--mode", default="parallel", help="analysis_mode sent with every request")
+    parser.add_argument("--username-prefix", default="loadtest", help="Usernames are <prefix>_<n>")
+    parser.add_argument("--reuse-usernames", type=int, default=0,
+                        help="Cycle through this many usernames instead of unique ones (exercises the caches)")
+    parser.add_argument("--force-refresh", action="store_true", help="Bypass the profile cache")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="Seconds between status polls")
+    parser.add_argument("--job-timeout", type=float, default=300, help="Give up on a job after this many seconds")
+    parser.add_argument("--mock-url", help="Base URL of benchmarks/mock_services.py, to report its injected 429s/500s")
+    parser.add_argument("--json", dest="json_path", help="Also write the summary and per-request results here")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    run_id = int(time.time())
+    def username(i):
+        n = i % args.reuse_usernames if args.reuse_usernames else i
+        return f"{args.username_prefix}_{run_id if not args.reuse_usernames else 'shared'}_{n}"
+
+    mock_url = args.mock_url.rstrip("/") if args.mock_url else None
+    mock_before = fetch_mock_stats(mock_url) if mock_url else None
+
+    print(f"Submitting {args.requests} analyses to {base_url} at concurrency {args.concurrency}...")
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(run_one, base_url, username(i), args.mode, args.force_refresh,
+                                   args.poll_interval, args.job_timeout) for i in range(args.requests)]
+        for future in futures:
+            result = future.result() # run_one never raises
+            results.append(result)
+            if result["outcome"] != "ok":
+                print(f"  {result['username']}: {result['outcome']} {result['detail'] or ''}")
+
+    wall_seconds = time.perf_counter() - start
+    mock_stats = stats_delta(mock_before, fetch_mock_stats(mock_url)) if mock_url else None
+    summary = summarize(results, wall_seconds, mock_stats)
+    print(json.dumps(summary, indent=2))
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"summary": summary, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Local stand-ins for Instagram (web_profile_info, GraphQL media) and the OpenRouter chat API.
+
+Every response can be delayed and made to fail at configurable rates, so the
+Flask app can be load-tested without touching real services. GET /__stats
+returns how many requests each service answered and how many of those were
+injected 429s and 500s:
+
+    python benchmarks/mock_services.py --port 8900 --ig-latency-ms 150 --llm-latency-ms 1500 \\
+        --error-rate 0.01 --throttle-rate 0.05
+
+then start the app against it:
+
+    INSTAGRAM_BASE_URL=http://127.0.0.1:8900 OPENROUTER_BASE_URL=http://127.0.0.1:8900/v1 \\
+        OPENROUTER_API_KEY=mock LLM_CACHE_DISABLED=1 python app.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import make_profile_payload, make_post_edges, make_forensic_json, make_llm_json_response
+
+MOCK_REPORT = ("Initial Profile Reconnaissance\n\nProfile Overview\nA mock profile used for load testing.\n\n"
+               "Observed Interests\nTechnology, family, travel.\n")
+MOCK_FORENSIC_NOTES = "Forensic Notes\n\nNo identifiers beyond public mentions were observed in this mock profile.\n"
+
+
+class ServiceFaults:
+    """Latency and failure injection for one mocked service."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def delay(self):
+        seconds = (self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def pick_failure(self):
+        """Returns 429, 500 or None for this request."""
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+
+class MockServiceHandler(BaseHTTPRequestHandler):
+    """Routes Instagram and chat-completions requests; configured through class attributes."""
+    protocol_version = "HTTP/1.1"
+    instagram_faults = ServiceFaults()
+    llm_faults = ServiceFaults()
+    posts_per_profile = 12
+    total_posts = 60
+    stats = {service: {"requests": 0, "throttled": 0, "errors": 0} for service in ("instagram", "llm")}
+    _stats_lock = threading.Lock()
+
+    # --- Plumbing ---
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._stats_lock:
+            cls.stats = {service: {"requests": 0, "throttled": 0, "errors": 0} for service in ("instagram", "llm")}
+
+    @classmethod
+    def snapshot_stats(cls):
+        with cls._stats_lock:
+            return {service: dict(counts) for service, counts in cls.stats.items()}
+
+    def _count(self, service, key):
+        with self._stats_lock:
+            self.stats[service][key] += 1
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fail_if_injected(self, faults, service):
+        """Applies latency, then sends an injected 429/500 if one is rolled. Returns True if it did."""
+        self._count(service, "requests")
+        faults.delay()
+        status = faults.pick_failure()
+        if status == 429:
+            self._count(service, "throttled")
+            self._send(429, {"message": "Please wait a few minutes before you try again."},
+                       headers={"Retry-After": str(faults.retry_after)})
+            return True
+        if status == 500:
+            self._count(service, "errors")
+            self._send(500, {"message": "Injected server error"})
+            return True
+        return False
+
+    def log_message(self, format, *args):
+        pass # Keep load-test output clean
+
+    # --- Instagram ---
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        if parsed.path.rstrip("/") == "/__stats":
+            self._send(200, self.snapshot_stats())
+        elif parsed.path.rstrip("/") == "/api/v1/users/web_profile_info":
+            if not self._fail_if_injected(self.instagram_faults, "instagram"):
+                self._send(200, self._profile_payload(query.get("username", ["mock_user"])[0]))
+        elif parsed.path.rstrip("/") == "/graphql/query":
+            if not self._fail_if_injected(self.instagram_faults, "instagram"):
+                variables = json.loads(query.get("variables", ["{}"])[0])
+                self._send(200, self._media_page(variables))
+        else:
+            self._send(404, {"message": f"No mock for GET {parsed.path}"})
+
+    def _profile_payload(self, username):
+        payload = make_profile_payload(self.posts_per_profile, seed=len(username))
+        user = payload["data"]["user"]
+        user["username"] = username
+        user["id"] = str(int(hashlib.sha256(username.encode("utf-8")).hexdigest()[:12], 16))
+        user["edge_owner_to_timeline_media"]["count"] = self.total_posts
+        return payload
+
+    def _media_page(self, variables):
+        first = int(variables.get("first", 12))
+        offset = int(variables.get("after") or 0)
+        edges = make_post_edges(self.total_posts)[offset:offset + first]
+        next_offset = offset + len(edges)
+        return {"data": {"user": {"edge_owner_to_timeline_media": {
+            "count": self.total_posts,
+            "page_info": {"has_next_page": next_offset < self.total_posts, "end_cursor": str(next_offset)},
+            "edges": edges,
+        }}}, "status": "ok"}
+
+    # --- OpenRouter chat completions ---
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"No mock for POST {self.path}"}})
+            return
+        if self._fail_if_injected(self.llm_faults, "llm"):
+            return
+        request = json.loads(body or b"{}")
+        prompt = (request.get("messages") or [{}])[-1].get("content", "")
+        content = self._completion_text(prompt)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = request.get("model", "mock/model")
+        if request.get("stream"):
+            self._send(200, self._sse_body(model, content, usage), content_type="text/event-stream")
+        else:
+            self._send(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+    @staticmethod
+    def _completion_text(prompt):
+        # Answer in whatever shape the calling task parses
+        if '"forensic_notes": "string' in prompt:
+            return json.dumps({"report": MOCK_REPORT, "forensic_notes": MOCK_FORENSIC_NOTES,
+                               "analysis": make_forensic_json("mock_user", 10)})
+        if "network_connections_explicit" in prompt:
+            return make_llm_json_response("mock_user", 10)
+        if "forensic" in prompt.lower():
+            return MOCK_FORENSIC_NOTES
+        return MOCK_REPORT
+
+    @staticmethod
+    def _sse_body(model, content, usage, chunk_chars=64):
+        events = []
+        for start in range(0, len(content), chunk_chars):
+            events.append({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                           "choices": [{"index": 0, "delta": {"content": content[start:start + chunk_chars]},
+                                        "finish_reason": None}]})
+        # Final chunk: no choices, just usage (stream_options.include_usage)
+        events.append({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                       "choices": [], "usage": usage})
+        lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+        return "".join(lines).encode("utf-8")
+
+
+def start_mock_services(host="127.0.0.1", port=0, instagram_faults=None, llm_faults=None,
+                        posts_per_profile=12, total_posts=60):
+    """Starts the mock server on a background thread. Returns (server, base_url)."""
+    MockServiceHandler.instagram_faults = instagram_faults or ServiceFaults()
+    MockServiceHandler.llm_faults = llm_faults or ServiceFaults()
+    MockServiceHandler.posts_per_profile = posts_per_profile
+    MockServiceHandler.total_posts = total_posts
+    MockServiceHandler.reset_stats()
+    server = ThreadingHTTPServer((host, port), MockServiceHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ig-latency-ms", type=float, default=150, help="Mean Instagram response latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=1500, help="Mean chat-completion latency")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="Uniform +/- jitter applied to both latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--posts-per-profile", type=int, default=12, help="Post edges embedded in web_profile_info")
+    parser.add_argument("--total-posts", type=int, default=60, help="Posts served through GraphQL pagination")
+    args = parser.parse_args()
+
+    def faults(latency_ms):
+        return ServiceFaults(latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, args.retry_after)
+
+    server, base_url = start_mock_services(args.host, args.port, faults(args.ig_latency_ms), faults(args.llm_latency_ms),
+                                           args.posts_per_profile, args.total_posts)
+    print(f"Mock services listening on {base_url}")
+    print(f"  export INSTAGRAM_BASE_URL={base_url}")
+    print(f"  export OPENROUTER_BASE_URL={base_url}/v1")
+    print("  export OPENROUTER_API_KEY=mock LLM_CACHE_DISABLED=1")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"  {MockServiceHandler.snapshot_stats()}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
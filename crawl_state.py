@@ -0,0 +1,145 @@
+import os
+import json
+import re
+import threading
+import time
+
+# --- Constants ---
+CRAWL_STATE_DIR = os.getenv("CRAWL_STATE_DIR", os.path.join(".cache", "crawl_state"))
+
+
+class CrawlState:
+    """Per-user incremental crawl state.
+
+    seen_shortcodes indexes every post already fetched, newest_timestamp is the
+    newest taken_at_timestamp seen, and end_cursor/has_more record where the last
+    backfill stopped (so an interrupted crawl can resume instead of restarting).
+    uncrawled_shortcodes are seen posts that arrived without pagination (the
+    profile lookup's first page): they are deduplicated like any other, but
+    there may be unfetched posts below them, so they don't count as the crawl
+    watermark until a paginated crawl passes them.
+    """
+
+    def __init__(self, username, user_id=None, seen_shortcodes=None, newest_timestamp=None,
+                 end_cursor=None, has_more=False, updated_at=None, uncrawled_shortcodes=None):
+        self.username = username
+        self.user_id = user_id
+        self.seen_shortcodes = set(seen_shortcodes or ())
+        self.uncrawled_shortcodes = set(uncrawled_shortcodes or ()) & self.seen_shortcodes
+        # Crawled posts known before this run; the stop condition ignores ones marked during it
+        self.previously_seen = frozenset(self.seen_shortcodes - self.uncrawled_shortcodes)
+        self.newest_timestamp = newest_timestamp
+        self.previous_newest_timestamp = newest_timestamp
+        self.end_cursor = end_cursor
+        self.has_more = has_more
+        self.updated_at = updated_at
+
+    def is_seen(self, edge):
+        return _shortcode(edge) in self.seen_shortcodes
+
+    def new_edges(self, edges):
+        """Returns the edges whose shortcodes are not in the index yet."""
+        return [edge for edge in edges if _shortcode(edge) and not self.is_seen(edge)]
+
+    def reached_known(self, edges):
+        """True once a page ends on a known (or older) post: everything below was fetched before.
+
+        Checks the last edge rather than the first so pinned (old, known) posts
+        at the top of the feed don't stop the crawl early.
+        """
+        if not edges:
+            return False
+        last = edges[-1]
+        if _shortcode(last) in self.previously_seen:
+            return True
+        taken_at = last.get('node', {}).get('taken_at_timestamp')
+        return bool(taken_at and self.previous_newest_timestamp and taken_at <= self.previous_newest_timestamp)
+
+    def mark_seen(self, edges, crawled=True):
+        """Adds edges to the index; crawled=False for edges not reached by pagination (see uncrawled_shortcodes)."""
+        for edge in edges:
+            shortcode = _shortcode(edge)
+            if not shortcode:
+                continue
+            if not crawled:
+                if shortcode not in self.seen_shortcodes:
+                    self.seen_shortcodes.add(shortcode)
+                    self.uncrawled_shortcodes.add(shortcode)
+                continue
+            self.seen_shortcodes.add(shortcode)
+            self.uncrawled_shortcodes.discard(shortcode)
+            taken_at = edge.get('node', {}).get('taken_at_timestamp')
+            if taken_at and (self.newest_timestamp is None or taken_at > self.newest_timestamp):
+                self.newest_timestamp = taken_at
+
+    def to_dict(self):
+        return {
+            "username": self.username,
+            "user_id": self.user_id,
+            "seen_shortcodes": sorted(self.seen_shortcodes),
+            "uncrawled_shortcodes": sorted(self.uncrawled_shortcodes),
+            "newest_timestamp": self.newest_timestamp,
+            "end_cursor": self.end_cursor,
+            "has_more": self.has_more,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["username"],
+            user_id=data.get("user_id"),
+            seen_shortcodes=data.get("seen_shortcodes"),
+            newest_timestamp=data.get("newest_timestamp"),
+            end_cursor=data.get("end_cursor"),
+            has_more=data.get("has_more", False),
+            updated_at=data.get("updated_at"),
+            uncrawled_shortcodes=data.get("uncrawled_shortcodes"),
+        )
+
+
+def _shortcode(edge):
+    return edge.get('node', {}).get('shortcode')
+
+
+class CrawlStateStore:
+    """Persists one CrawlState per username as a JSON file under state_dir."""
+
+    def __init__(self, state_dir=CRAWL_STATE_DIR):
+        self.state_dir = state_dir
+        self._lock = threading.Lock()
+
+    def _path(self, username):
+        safe_key = re.sub(r'[^a-z0-9._-]', '_', username.strip().lower())
+        return os.path.join(self.state_dir, f"{safe_key}.json")
+
+    def load(self, username):
+        """Returns the saved state for username, or a fresh empty one."""
+        try:
+            with open(self._path(username), 'r', encoding='utf-8') as f:
+                return CrawlState.from_dict(json.load(f))
+        except FileNotFoundError:
+            return CrawlState(username)
+        except (IOError, ValueError, KeyError) as e:
+            print(f"Warning: Ignoring unreadable crawl state for '{username}': {e}")
+            return CrawlState(username)
+
+    def save(self, state):
+        state.updated_at = time.time()
+        path = self._path(state.username)
+        try:
+            with self._lock:
+                os.makedirs(self.state_dir, exist_ok=True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state.to_dict(), f)
+                os.replace(tmp_path, path)
+        except (IOError, TypeError, ValueError) as e:
+            print(f"Warning: Could not write crawl state for '{state.username}': {e}")
+
+    def reset(self, username):
+        """Forgets everything known about username, so the next crawl starts from scratch."""
+        try:
+            os.remove(self._path(username))
+        except OSError:
+            pass
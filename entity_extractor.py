@@ -0,0 +1,121 @@
+import os
+import re
+
+# Fields of the forensic JSON's entity_extraction section filled in locally rather than by the LLM
+LOCAL_ENTITY_FIELDS = ('mentions', 'hashtags', 'urls', 'emails', 'phone_numbers')
+
+LOCAL_ENTITY_EXTRACTION_DISABLED = os.getenv("LOCAL_ENTITY_EXTRACTION_DISABLED", "").lower() in ("1", "true", "yes")
+
+# Instagram usernames: letters, digits, '_' and '.', up to 30 chars, not ending in '.'.
+# The lookbehind keeps the local part of an email address from matching.
+_MENTION = re.compile(r'(?<![\w.@])@([A-Za-z0-9_](?:[A-Za-z0-9_.]{0,28}[A-Za-z0-9_])?)')
+_HASHTAG = re.compile(r'(?<![\w#&])#(\w+)')
+_EMAIL = re.compile(r'(?<![\w.+-])[\w.+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,24}\b')
+# Explicit scheme or www. prefix, or a bare domain on a TLD common in bios (linktr.ee/..., name.dev)
+_URL = re.compile(
+    r'\b(?:https?://|www\.)[^\s<>"\'()]+'
+    r'|(?<![\w@.-])(?:[A-Za-z0-9-]+\.)+(?:com|net|org|io|co|me|ee|ly|gg|app|dev|ai|tv|link|bio|page|xyz)\b(?:/[^\s<>"\'()]*)?',
+    re.IGNORECASE)
+# 7-15 digits with optional +country code and space/dot/dash/bracket separators
+_PHONE = re.compile(r'(?<![\w+])(?:\+\d{1,3}[\s.-]?)?(?:\(\d{1,4}\)[\s.-]?)?\d{2,4}(?:[\s.-]?\d{2,4}){1,4}(?!\w)')
+# A candidate only counts as a phone number with a +country code, a (bracketed) area code or
+# 3-3-4 grouping; dates, IPv4 addresses and runs of years are rejected outright
+_PAREN_AREA_CODE = re.compile(r'\(\d{1,4}\)')
+_THREE_THREE_FOUR = re.compile(r'\d{3}[\s.-]\d{3}[\s.-]\d{4}')
+_DATE = re.compile(r'\d{4}[\s./-]\d{1,2}[\s./-]\d{1,2}|\d{1,2}[\s./-]\d{1,2}[\s./-]\d{4}')
+_IPV4 = re.compile(r'\d{1,3}(?:\.\d{1,3}){3}')
+_YEAR = re.compile(r'(?:19|20)\d{2}')
+_DIGIT_GROUP = re.compile(r'\d+')
+_TRAILING_PUNCTUATION = '.,;:!?'
+
+
+def find_mentions(text):
+    """Every @mention in text, without the '@', in order (duplicates kept)."""
+    return _MENTION.findall(text) if text else []
+
+
+def _add(found, seen, value):
+    key = value.lower()
+    if key not in seen:
+        seen.add(key)
+        found.append(value)
+
+
+def _looks_like_phone(number):
+    if _DATE.fullmatch(number) or _IPV4.fullmatch(number):
+        return False
+    if all(_YEAR.fullmatch(group) for group in _DIGIT_GROUP.findall(number)):
+        return False
+    return bool(number.startswith('+') or _PAREN_AREA_CODE.search(number) or _THREE_THREE_FOUR.fullmatch(number))
+
+
+def _phone_numbers(text):
+    for match in _PHONE.finditer(text):
+        number = match.group(0).strip()
+        digits = sum(ch.isdigit() for ch in number)
+        # Bare digit runs and loosely grouped ones are dates, counts or IDs far more often than phone numbers
+        if 7 <= digits <= 15 and _looks_like_phone(number):
+            yield number
+
+
+def extract_entities_from_texts(texts):
+    """Deterministic entity_extraction fields from an iterable of texts.
+
+    Values are de-duplicated case-insensitively and listed in order of first
+    appearance; mentions and hashtags keep their '@'/'#' prefix.
+    """
+    entities = {field: [] for field in LOCAL_ENTITY_FIELDS}
+    seen = {field: set() for field in LOCAL_ENTITY_FIELDS}
+    for text in texts:
+        if not text:
+            continue
+        # Each pattern needs a marker character; skipping texts without one avoids most regex scans
+        scrubbed = text
+        if '@' in text:
+            emails = _EMAIL.findall(text)
+            for email in emails:
+                _add(entities['emails'], seen['emails'], email)
+            # Blank out emails so their domains aren't reported again as URLs
+            scrubbed = _EMAIL.sub(' ', text) if emails else text
+            for name in _MENTION.findall(scrubbed):
+                _add(entities['mentions'], seen['mentions'], '@' + name)
+        if '#' in scrubbed:
+            for tag in _HASHTAG.findall(scrubbed):
+                if not tag.isdigit():
+                    _add(entities['hashtags'], seen['hashtags'], '#' + tag)
+        if '.' in scrubbed:
+            urls = _URL.findall(scrubbed)
+            for url in urls:
+                _add(entities['urls'], seen['urls'], url.rstrip(_TRAILING_PUNCTUATION))
+            if urls:
+                scrubbed = _URL.sub(' ', scrubbed)
+        if sum(map(str.isdigit, scrubbed)) >= 7:
+            for number in _phone_numbers(scrubbed):
+                _add(entities['phone_numbers'], seen['phone_numbers'], number)
+    return entities
+
+
+def _captions(post_edges):
+    for edge in post_edges or []:
+        node = edge.get('node') or {}
+        caption_edges = node.get('edge_media_to_caption', {}).get('edges', [])
+        if caption_edges:
+            yield caption_edges[0].get('node', {}).get('text')
+
+
+def extract_entities(biography_text, post_edges):
+    """entity_extraction fields found in the bio and every post caption (not just those in the prompt)."""
+    return extract_entities_from_texts([biography_text, *_captions(post_edges)])
+
+
+def merge_entities(analysis_data, entities):
+    """Writes locally extracted entities into a parsed forensic JSON's entity_extraction section.
+
+    Local values replace whatever the LLM returned for those fields; the
+    LLM-inferred fields (locations, organizations, ...) are left as they are.
+    """
+    section = analysis_data.get('entity_extraction')
+    if not isinstance(section, dict):
+        section = analysis_data['entity_extraction'] = {}
+    section.update(entities)
+    return analysis_data
@@ -0,0 +1,323 @@
+import os
+import math
+import random
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+# --- Constants ---
+# Graphs with more nodes than this are served with their communities collapsed into cluster nodes
+LOD_MAX_NODES = int(os.getenv("GRAPH_LOD_MAX_NODES", "150"))
+# Communities bigger than this are split (by node type, then by degree) so one expansion stays renderable
+MAX_CLUSTER_SIZE = int(os.getenv("GRAPH_MAX_CLUSTER_SIZE", "100"))
+FORCE_LAYOUT_MAX_NODES = 200 # Pairwise repulsion is O(n^2) per iteration; the rest go on an outer spiral
+LAYOUT_ITERATIONS = 60
+EDGE_LENGTH = 120.0 # Pixels between linked nodes in force layouts
+NODE_SPACING = 40.0 # Pixels between neighbouring members of a cluster
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+LAYOUT_CACHE_SIZE = 32
+# Bounds for the /graph endpoints
+GRAPH_VIEW_MAX_NODES = int(os.getenv("GRAPH_VIEW_MAX_NODES", "5000"))
+GRAPH_MAX_DEPTH = 3
+GRAPH_PAGE_MAX_LIMIT = 500
+
+
+def detect_communities(node_ids, weighted_edges, max_iterations=20):
+    """Weighted label propagation. Returns node ID -> community index (0 = largest).
+
+    Nodes are visited in the given order and ties go to the lowest label, so
+    the same graph always yields the same communities.
+    """
+    neighbours = defaultdict(lambda: defaultdict(float))
+    for a, b, weight in weighted_edges:
+        if a != b:
+            neighbours[a][b] += weight
+            neighbours[b][a] += weight
+    labels = {node_id: index for index, node_id in enumerate(node_ids)}
+    for _ in range(max_iterations):
+        changed = False
+        for node_id in node_ids:
+            votes = defaultdict(float)
+            for other, weight in neighbours[node_id].items():
+                votes[labels[other]] += weight
+            if not votes:
+                continue
+            best = max(votes.items(), key=lambda vote: (vote[1], -vote[0]))[0]
+            if best != labels[node_id]:
+                labels[node_id] = best
+                changed = True
+        if not changed:
+            break
+    sizes = Counter(labels.values())
+    rank = {label: index for index, (label, _) in enumerate(sorted(sizes.items(), key=lambda item: (-item[1], item[0])))}
+    return {node_id: rank[labels[node_id]] for node_id in node_ids}
+
+
+def force_layout(node_ids, weighted_edges, iterations=LAYOUT_ITERATIONS, seed=0):
+    """Fruchterman-Reingold positions, scaled so linked nodes sit about EDGE_LENGTH apart.
+
+    Seeded, so the same graph always gets the same layout. Returns node ID -> (x, y).
+    """
+    count = len(node_ids)
+    if count == 0:
+        return {}
+    if count == 1:
+        return {node_ids[0]: (0.0, 0.0)}
+    rng = random.Random(seed)
+    pos = [[rng.uniform(-1, 1), rng.uniform(-1, 1)] for _ in node_ids]
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    links = [(index[a], index[b], 1 + math.log(max(weight, 1))) for a, b, weight in weighted_edges
+             if a in index and b in index and a != b]
+    k = math.sqrt(4.0 / count) # Ideal distance in the 2x2 starting box
+    temperature = 0.2
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        disp = [[0.0, 0.0] for _ in range(count)]
+        for i in range(count):
+            xi, yi = pos[i]
+            di = disp[i]
+            for j in range(i + 1, count):
+                dx = xi - pos[j][0]
+                dy = yi - pos[j][1]
+                force = k * k / (dx * dx + dy * dy or 1e-9) # Repulsion k^2/d along the unit vector
+                di[0] += dx * force
+                di[1] += dy * force
+                disp[j][0] -= dx * force
+                disp[j][1] -= dy * force
+        for a, b, strength in links:
+            dx = pos[a][0] - pos[b][0]
+            dy = pos[a][1] - pos[b][1]
+            force = math.sqrt(dx * dx + dy * dy) * strength / k # Attraction d^2/k along the unit vector
+            disp[a][0] -= dx * force
+            disp[a][1] -= dy * force
+            disp[b][0] += dx * force
+            disp[b][1] += dy * force
+        for i in range(count):
+            dx, dy = disp[i]
+            length = math.sqrt(dx * dx + dy * dy)
+            if length > 0:
+                step = min(length, temperature) / length
+                pos[i][0] += dx * step
+                pos[i][1] += dy * step
+        temperature -= cooling
+    scale = EDGE_LENGTH / k
+    return {node_id: (pos[i][0] * scale, pos[i][1] * scale) for i, node_id in enumerate(node_ids)}
+
+
+def _spiral(count, spacing):
+    # Phyllotaxis offsets: evenly spread points filling a disc, the first at the centre
+    return [(spacing * math.sqrt(i) * math.cos(i * GOLDEN_ANGLE), spacing * math.sqrt(i) * math.sin(i * GOLDEN_ANGLE))
+            for i in range(count)]
+
+
+def _separate(centres, radii, passes=20, gap=NODE_SPACING):
+    # Pushes overlapping discs apart along the line between their centres
+    keys = list(centres)
+    for _ in range(passes):
+        moved = False
+        for i, a in enumerate(keys):
+            for b in keys[i + 1:]:
+                (ax, ay), (bx, by) = centres[a], centres[b]
+                dx, dy = bx - ax, by - ay
+                distance = math.sqrt(dx * dx + dy * dy) or 1e-6
+                overlap = radii[a] + radii[b] + gap - distance
+                if overlap > 0:
+                    shift = overlap / 2 / distance
+                    centres[a] = (ax - dx * shift, ay - dy * shift)
+                    centres[b] = (bx + dx * shift, by + dy * shift)
+                    moved = True
+        if not moved:
+            break
+    return centres
+
+
+class GraphLayout:
+    """Communities and precomputed positions for one graph, with level-of-detail views of it.
+
+    Built once per graph (see cached_layout) so browsers get fixed x/y positions
+    and can render with physics off. Small graphs get a force layout over all
+    nodes; larger ones lay out communities first and spiral members around their
+    community's centre, so expanding a cluster doesn't move anything else.
+    """
+
+    def __init__(self, nodes, edges, focus=None, truncated=False):
+        self.truncated = truncated # The graph is a capped neighbourhood of a larger one
+        self.nodes = OrderedDict((node["id"], node) for node in nodes if node.get("id"))
+        self.edges = [edge for edge in edges if edge.get("from") in self.nodes and edge.get("to") in self.nodes]
+        self.focus = focus if focus in self.nodes else None
+        node_ids = list(self.nodes)
+        weighted = [(edge["from"], edge["to"], edge.get("weight") or 1) for edge in self.edges]
+        self.degree = Counter()
+        for a, b, _ in weighted:
+            self.degree[a] += 1
+            self.degree[b] += 1
+
+        self.community = self._split_large(detect_communities(node_ids, weighted))
+        self.members = defaultdict(list)
+        for node_id in sorted(node_ids, key=lambda n: -self.degree[n]):
+            self.members[self.community[node_id]].append(node_id)
+
+        if len(node_ids) <= LOD_MAX_NODES:
+            self.positions = force_layout(node_ids, weighted)
+        else:
+            self.positions = self._clustered_positions(weighted)
+
+    def _split_large(self, community):
+        # A hub with thousands of mentions is one community; split it by node type, then into
+        # MAX_CLUSTER_SIZE chunks by degree, so no single expansion floods the browser
+        groups = defaultdict(list)
+        for node_id, label in community.items():
+            groups[label].append(node_id)
+        split = {}
+        next_label = 0
+        for label in sorted(groups):
+            members = groups[label]
+            if len(members) <= MAX_CLUSTER_SIZE:
+                parts = [members]
+            else:
+                by_type = defaultdict(list)
+                for node_id in sorted(members, key=lambda n: -self.degree[n]):
+                    by_type[self.nodes[node_id].get("type") or ""].append(node_id)
+                parts = [group[start:start + MAX_CLUSTER_SIZE]
+                         for group in by_type.values() for start in range(0, len(group), MAX_CLUSTER_SIZE)]
+            for part in parts:
+                for node_id in part:
+                    split[node_id] = next_label
+                next_label += 1
+        return split
+
+    def _clustered_positions(self, weighted):
+        cluster_weights = Counter()
+        for a, b, weight in weighted:
+            ca, cb = self.community[a], self.community[b]
+            if ca != cb:
+                cluster_weights[(min(ca, cb), max(ca, cb))] += weight
+        clusters = sorted(self.members, key=lambda c: -len(self.members[c]))
+        radii = {c: NODE_SPACING * math.sqrt(len(self.members[c])) for c in clusters}
+
+        laid_out = clusters[:FORCE_LAYOUT_MAX_NODES]
+        centres = force_layout(laid_out, [(a, b, w) for (a, b), w in cluster_weights.items()])
+        # Spread the force layout out to the clusters' size before removing overlaps
+        mean_radius = sum(radii[c] for c in laid_out) / len(laid_out)
+        centres = {c: (x * mean_radius * 2 / EDGE_LENGTH, y * mean_radius * 2 / EDGE_LENGTH) for c, (x, y) in centres.items()}
+        centres = _separate(centres, radii)
+        rest = clusters[FORCE_LAYOUT_MAX_NODES:]
+        if rest:
+            # Leftover (small) clusters ring the laid-out ones on a wide spiral
+            outer = max(math.hypot(x, y) + radii[c] for c, (x, y) in centres.items())
+            spacing = 2 * max(radii[c] for c in rest) + NODE_SPACING
+            for i, c in enumerate(rest):
+                distance = outer + spacing * (1 + math.sqrt(i))
+                centres[c] = (distance * math.cos(i * GOLDEN_ANGLE), distance * math.sin(i * GOLDEN_ANGLE))
+
+        positions = {}
+        for c in clusters:
+            cx, cy = centres[c]
+            for node_id, (dx, dy) in zip(self.members[c], _spiral(len(self.members[c]), NODE_SPACING)):
+                positions[node_id] = (cx + dx, cy + dy)
+        return positions
+
+    def _cluster_centre(self, cluster):
+        members = self.members[cluster]
+        return (sum(self.positions[n][0] for n in members) / len(members),
+                sum(self.positions[n][1] for n in members) / len(members))
+
+    def _node(self, node_id):
+        node = dict(self.nodes[node_id])
+        node["x"], node["y"] = (round(value, 1) for value in self.positions[node_id])
+        node["group"] = self.community[node_id]
+        return node
+
+    def view(self, expanded=()):
+        """vis.js payload with fixed positions: expanded communities as their member nodes, the rest collapsed.
+
+        Graphs of up to LOD_MAX_NODES nodes are always fully expanded, as is the
+        focus node's community. Edges into collapsed clusters are merged into
+        one weighted, undirected edge per pair of shown nodes.
+        """
+        if len(self.nodes) <= LOD_MAX_NODES:
+            open_clusters = set(self.members)
+        else:
+            open_clusters = {int(c) for c in expanded if str(c).lstrip('-').isdigit()}
+            if self.focus is not None:
+                open_clusters.add(self.community[self.focus])
+
+        def shown_as(node_id):
+            cluster = self.community[node_id]
+            if cluster in open_clusters or len(self.members[cluster]) == 1:
+                return node_id
+            return f"cluster:{cluster}"
+
+        nodes = []
+        for cluster, members in self.members.items():
+            if cluster in open_clusters or len(members) == 1:
+                nodes.extend(self._node(node_id) for node_id in members)
+                continue
+            x, y = self._cluster_centre(cluster)
+            hub = self.nodes[members[0]]
+            nodes.append({
+                "id": f"cluster:{cluster}", "label": f"{hub.get('label') or hub['id']} +{len(members) - 1}",
+                "type": "Cluster", "cluster": cluster, "size": min(60, 16 + 4 * math.sqrt(len(members))),
+                "shape": "hexagon", "group": cluster, "x": round(x, 1), "y": round(y, 1),
+                "title": f"{len(members)} nodes - double-click to expand",
+            })
+
+        edges = []
+        merged = {}
+        for edge in self.edges:
+            a, b = shown_as(edge["from"]), shown_as(edge["to"])
+            if a == b:
+                continue # Inside a collapsed cluster
+            if a == edge["from"] and b == edge["to"]:
+                edges.append(edge)
+                continue
+            key = (a, b) if a < b else (b, a) # One undirected summary edge per pair
+            if key not in merged:
+                merged[key] = {"id": f"merged:{key[0]}|{key[1]}", "from": key[0], "to": key[1], "weight": 0, "links": 0}
+            merged[key]["weight"] += edge.get("weight") or 1
+            merged[key]["links"] += 1
+        for edge in merged.values():
+            edge["title"] = f"{edge['links']} links"
+            edge["width"] = round(1 + math.log(edge["weight"]), 2)
+            edge["arrows"] = {"to": {"enabled": False}}
+            edges.append(edge)
+
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "total_nodes": len(self.nodes),
+            "total_edges": len(self.edges),
+            "communities": len(self.members),
+            "collapsed": sum(1 for node in nodes if node.get("type") == "Cluster"),
+            "truncated": self.truncated,
+        }
+
+
+def apply_layout(graph_data):
+    """Adds precomputed x/y positions and community groups to a {nodes, edges} graph in place."""
+    layout = GraphLayout(graph_data.get("nodes") or [], graph_data.get("edges") or [])
+    for node in graph_data.get("nodes") or []:
+        if node.get("id") in layout.positions:
+            node["x"], node["y"] = (round(value, 1) for value in layout.positions[node["id"]])
+            node["group"] = layout.community[node["id"]]
+    return graph_data
+
+
+_layout_cache = OrderedDict()
+_layout_cache_lock = threading.Lock()
+
+
+def cached_layout(key, build):
+    """Returns the GraphLayout cached under key, calling build() on a miss (LRU of LAYOUT_CACHE_SIZE).
+
+    Include anything the graph depends on (e.g. the graph store revision) in key.
+    """
+    with _layout_cache_lock:
+        if key in _layout_cache:
+            _layout_cache.move_to_end(key)
+            return _layout_cache[key]
+    layout = build() # Outside the lock: layouts of large graphs take a while
+    with _layout_cache_lock:
+        _layout_cache[key] = layout
+        while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return layout
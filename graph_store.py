@@ -0,0 +1,399 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+import time
+
+# --- Constants ---
+GRAPH_STORE_PATH = os.getenv("GRAPH_STORE_PATH", os.path.join(".cache", "graph_store.sqlite3"))
+# Set GRAPH_STORE_DISABLED=1 to skip merging analyses and posts into the cross-profile graph
+GRAPH_STORE_DISABLED = os.getenv("GRAPH_STORE_DISABLED", "").lower() in ("1", "true", "yes")
+
+PROFILE_OWNER_TYPE = "ProfileOwner"
+CHUNK_SIZE = 500 # Stays well under SQLite's bound-parameter limit for IN (...) lists
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    label TEXT,
+    type TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes (type);
+
+CREATE TABLE IF NOT EXISTS edges (
+    id TEXT PRIMARY KEY,
+    src TEXT NOT NULL,
+    dst TEXT NOT NULL,
+    label TEXT,
+    weight INTEGER NOT NULL DEFAULT 0,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_edges_src ON edges (src);
+CREATE INDEX IF NOT EXISTS idx_edges_dst ON edges (dst);
+
+-- What asserted each edge: 'analysis:<username>' for an LLM graph, 'post:<post id>' for a post.
+-- An edge's weight is its number of distinct sources, so re-merging a source never double counts.
+CREATE TABLE IF NOT EXISTS edge_sources (
+    edge_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (edge_id, source)
+);
+CREATE INDEX IF NOT EXISTS idx_edge_sources_source ON edge_sources (source);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+"""
+
+_NON_WORD = re.compile(r'[^\w.@#-]+')
+
+
+def _slug(value):
+    return _NON_WORD.sub('_', str(value).strip().lower()).strip('_')
+
+
+def user_node_id(username):
+    """Stable node ID for an Instagram account, shared by every analysis that mentions it."""
+    return f"user:{_slug(username).lstrip('@')}"
+
+
+def hashtag_node_id(tag):
+    return f"hashtag:{_slug(tag).lstrip('#')}"
+
+
+def edge_id(src, label, dst):
+    """Stable edge ID, so the same relationship asserted twice merges into one edge."""
+    return f"{src}|{label}|{dst}"
+
+
+def _llm_node_id(node, username):
+    # The LLM's per-response IDs ('profile_owner', 'n3', ...) mean nothing across analyses;
+    # key nodes on what they denote instead
+    if node.get('id') == 'profile_owner':
+        return user_node_id(username)
+    label = str(node.get('label') or node.get('id') or '').strip()
+    if label.startswith('@'):
+        return user_node_id(label)
+    if label.startswith('#'):
+        return hashtag_node_id(label)
+    return f"{_slug(node.get('type') or 'entity')}:{_slug(label)}"
+
+
+def analysis_graph(username, json_data):
+    """Maps an LLM network_connections_explicit graph onto stable node and edge IDs.
+
+    Returns (nodes, edges): nodes maps node ID -> (label, type) and edges is a
+    list of (edge ID, src, dst, label). Edges to unknown nodes are dropped, as
+    app.prepare_graph_json does.
+    """
+    graph_data = (json_data or {}).get("network_connections_explicit") or {}
+    nodes = {user_node_id(username): (username, PROFILE_OWNER_TYPE)}
+    id_map = {'profile_owner': user_node_id(username)}
+    for node in graph_data.get('nodes') or []:
+        if not isinstance(node, dict) or not node.get('id'):
+            continue
+        node_id = _llm_node_id(node, username)
+        id_map[node['id']] = node_id
+        nodes.setdefault(node_id, (node.get('label') or node['id'], node.get('type')))
+
+    edges = []
+    for edge in graph_data.get('edges') or []:
+        if not isinstance(edge, dict):
+            continue
+        src, dst = id_map.get(edge.get('from')), id_map.get(edge.get('to'))
+        if src and dst and src != dst:
+            label = _slug(edge.get('label') or 'related_to')
+            edges.append((edge_id(src, label, dst), src, dst, label))
+    return nodes, edges
+
+
+def post_graph(username, posts):
+    """Tagged-user and @mention edges from parsed posts (PostRecords or their dict form).
+
+    Returns (nodes, edges_by_source), where edges_by_source maps 'post:<id>' to
+    that post's (edge ID, src, dst, label) tuples.
+    """
+    owner = user_node_id(username)
+    nodes = {owner: (username, PROFILE_OWNER_TYPE)}
+    edges_by_source = {}
+    for post in posts:
+        post_id = post.get('id')
+        if not post_id:
+            continue
+        post_edges = []
+        for label, names in (('tagged', post.get('tagged_users_in_media')), ('mentions', post.get('tagged_users_in_caption'))):
+            for name in names or ():
+                if not name:
+                    continue # Tags whose user had no username
+                target = user_node_id(name)
+                if target == owner:
+                    continue
+                nodes.setdefault(target, (name, "User"))
+                post_edges.append((edge_id(owner, label, target), owner, target, label))
+        edges_by_source[f"post:{post_id}"] = post_edges
+    return nodes, edges_by_source
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class GraphStore:
+    """Persistent network graph across every analyzed account, in SQLite.
+
+    Nodes merge on stable IDs (user:<name>, hashtag:<tag>, <type>:<label>), so an
+    account mentioned by one profile and analyzed later is a single node. Edges
+    are indexed on both endpoints for neighbourhood queries. Each merge replaces
+    only the edges asserted by its own sources (one analysis, or a batch of posts)
+    so graphs are updated incrementally rather than rebuilt.
+    """
+
+    def __init__(self, path=GRAPH_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # Caller must hold self._lock; the connection is opened lazily on first use
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    # --- Writes ---
+
+    def _merge(self, conn, nodes, edges_by_source, now):
+        # Caller holds the lock and the transaction. Replaces each source's edges with the given ones.
+        conn.executemany(
+            "INSERT INTO nodes (id, label, type, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET last_seen = excluded.last_seen, "
+            "type = CASE WHEN excluded.type = 'ProfileOwner' OR nodes.type IS NULL THEN excluded.type ELSE nodes.type END, "
+            "label = CASE WHEN excluded.type = 'ProfileOwner' OR nodes.label IS NULL THEN excluded.label ELSE nodes.label END",
+            [(node_id, label, node_type, now, now) for node_id, (label, node_type) in nodes.items()])
+
+        sources = list(edges_by_source)
+        touched = set()
+        for chunk in _chunks(sources):
+            placeholders = ", ".join("?" * len(chunk))
+            touched.update(row[0] for row in conn.execute(
+                f"SELECT edge_id FROM edge_sources WHERE source IN ({placeholders})", chunk))
+            conn.execute(f"DELETE FROM edge_sources WHERE source IN ({placeholders})", chunk)
+
+        edge_rows, source_rows = {}, []
+        for source, edges in edges_by_source.items():
+            for row_id, src, dst, label in edges:
+                edge_rows[row_id] = (row_id, src, dst, label, now, now)
+                source_rows.append((row_id, source))
+        touched.update(edge_rows)
+        conn.executemany(
+            "INSERT INTO edges (id, src, dst, label, weight, first_seen, last_seen) VALUES (?, ?, ?, ?, 0, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET last_seen = excluded.last_seen", list(edge_rows.values()))
+        conn.executemany("INSERT OR IGNORE INTO edge_sources (edge_id, source) VALUES (?, ?)", source_rows)
+
+        # Re-weight only the edges this merge could have changed; drop those no source asserts any more
+        orphan_candidates = set()
+        for chunk in _chunks(touched):
+            placeholders = ", ".join("?" * len(chunk))
+            conn.execute(
+                f"UPDATE edges SET weight = (SELECT COUNT(*) FROM edge_sources WHERE edge_id = edges.id) "
+                f"WHERE id IN ({placeholders})", chunk)
+            for row in conn.execute(f"SELECT src, dst FROM edges WHERE weight = 0 AND id IN ({placeholders})", chunk):
+                orphan_candidates.update(row)
+            conn.execute(f"DELETE FROM edges WHERE weight = 0 AND id IN ({placeholders})", chunk)
+        conn.executemany(
+            "DELETE FROM nodes WHERE id = ? AND type IS NOT 'ProfileOwner' "
+            "AND NOT EXISTS (SELECT 1 FROM edges WHERE src = nodes.id OR dst = nodes.id)",
+            [(node_id,) for node_id in orphan_candidates])
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+        return len(edge_rows)
+
+    def merge_analysis(self, username, json_data):
+        """Merges one analysis's LLM graph, replacing what the previous analysis of username asserted.
+
+        Returns the number of edges in the merged graph.
+        """
+        nodes, edges = analysis_graph(username, json_data)
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    return self._merge(conn, nodes, {f"analysis:{_slug(username)}": edges}, time.time())
+        except sqlite3.Error as e:
+            print(f"Warning: Graph store analysis merge failed for {username}: {e}")
+            return 0
+
+    def add_posts(self, username, posts):
+        """Merges tagged-user and @mention edges from a batch of parsed posts.
+
+        Only these posts' edges are rewritten, so pages can be added as they are
+        parsed. Returns the number of edges merged.
+        """
+        nodes, edges_by_source = post_graph(username, posts)
+        if not edges_by_source:
+            return 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    return self._merge(conn, nodes, edges_by_source, time.time())
+        except sqlite3.Error as e:
+            print(f"Warning: Graph store post merge failed for {username}: {e}")
+            return 0
+
+    # --- Queries ---
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def get_node(self, node_id):
+        rows = self._query("SELECT * FROM nodes WHERE id = ?", (node_id,))
+        return rows[0] if rows else None
+
+    def _incident_edges(self, node_ids):
+        edges = []
+        for chunk in _chunks(node_ids):
+            placeholders = ", ".join("?" * len(chunk))
+            edges.extend(self._query(
+                f"SELECT * FROM edges WHERE src IN ({placeholders}) "
+                f"UNION SELECT * FROM edges WHERE dst IN ({placeholders})", (*chunk, *chunk)))
+        return edges
+
+    def _nodes(self, node_ids):
+        nodes = []
+        for chunk in _chunks(node_ids):
+            placeholders = ", ".join("?" * len(chunk))
+            nodes.extend(self._query(f"SELECT * FROM nodes WHERE id IN ({placeholders})", chunk))
+        return nodes
+
+    def _bfs(self, node_id, depth, max_nodes):
+        # Node IDs in discovery order (by hop, heavier edges first), the edges among them, and
+        # whether max_nodes cut the expansion short
+        order = [node_id]
+        seen = {node_id}
+        frontier = [node_id]
+        edges = {}
+        truncated = False
+        for _ in range(depth):
+            next_frontier = []
+            for edge in sorted(self._incident_edges(frontier), key=lambda e: -e["weight"]):
+                for endpoint in (edge["src"], edge["dst"]):
+                    if endpoint not in seen:
+                        if len(seen) >= max_nodes:
+                            truncated = True
+                            continue
+                        seen.add(endpoint)
+                        order.append(endpoint)
+                        next_frontier.append(endpoint)
+                if edge["src"] in seen and edge["dst"] in seen:
+                    edges[edge["id"]] = edge
+            frontier = next_frontier
+            if not frontier:
+                break
+        # Edges between nodes of the outermost hop weren't fetched by the loop
+        for edge in self._incident_edges(frontier):
+            if edge["src"] in seen and edge["dst"] in seen:
+                edges[edge["id"]] = edge
+        return order, edges, truncated
+
+    def _vis_nodes(self, node_ids):
+        # Nodes in the order of node_ids, in the vis.js shape
+        position = {node_id: index for index, node_id in enumerate(node_ids)}
+        rows = sorted(self._nodes(node_ids), key=lambda node: position[node["id"]])
+        return [{"id": node["id"], "label": node["label"] or node["id"], "type": node["type"]} for node in rows]
+
+    @staticmethod
+    def _vis_edge(edge):
+        return {"id": edge["id"], "from": edge["src"], "to": edge["dst"], "label": edge["label"], "weight": edge["weight"]}
+
+    def neighbourhood(self, node_id, depth=1, max_nodes=200):
+        """Nodes within depth hops of node_id (in either direction) and the edges between them.
+
+        Each hop is one indexed lookup on the frontier; heavier edges are followed
+        first and expansion stops at max_nodes. Returns a vis.js-ready
+        {"nodes", "edges", "truncated"} dict, nodes nearest first.
+        """
+        order, edges, truncated = self._bfs(node_id, depth, max_nodes)
+        return {
+            "nodes": self._vis_nodes(order),
+            "edges": [self._vis_edge(edge) for edge in edges.values()],
+            "truncated": truncated,
+        }
+
+    def neighbourhood_page(self, node_id, depth=1, offset=0, limit=50, max_nodes=5000):
+        """One page of neighbourhood() for incremental loading.
+
+        Returns the page's nodes (nearest and most strongly connected first) and
+        the edges joining them to each other or to nodes on earlier pages, so a
+        client can append pages without re-fetching. next_offset is None on the
+        last page.
+        """
+        order, edges, truncated = self._bfs(node_id, depth, max_nodes)
+        page = order[offset:offset + limit]
+        page_ids = set(page)
+        loaded = set(order[:offset + limit])
+        page_edges = [self._vis_edge(edge) for edge in edges.values()
+                      if edge["src"] in loaded and edge["dst"] in loaded and (edge["src"] in page_ids or edge["dst"] in page_ids)]
+        return {
+            "nodes": self._vis_nodes(page),
+            "edges": page_edges,
+            "offset": offset,
+            "limit": limit,
+            "total": len(order),
+            "next_offset": offset + limit if offset + limit < len(order) else None,
+            "truncated": truncated,
+        }
+
+    def revision(self):
+        """Counter bumped by every merge, for invalidating views computed from the graph."""
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return row[0] if row else 0
+
+    def get_stats(self):
+        counts = {}
+        with self._lock:
+            conn = self._connect()
+            for table in ("nodes", "edges", "edge_sources"):
+                counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the cross-profile network graph.")
+    parser.add_argument("node", nargs="?", help="Node ID (e.g. user:zuck) or a username; omit for store size")
+    parser.add_argument("--depth", type=int, default=1, help="Hops to expand from the node")
+    parser.add_argument("--max-nodes", type=int, default=200, help="Stop expanding after this many nodes")
+    parser.add_argument("--db", default=GRAPH_STORE_PATH, help="SQLite database path")
+    args = parser.parse_args()
+
+    store = GraphStore(args.db)
+    if not args.node:
+        print(json.dumps(store.get_stats(), indent=2))
+        return
+    node_id = args.node if ':' in args.node else user_node_id(args.node)
+    if store.get_node(node_id) is None:
+        print(f"Node {node_id} is not in the graph.")
+        sys.exit(1)
+    print(json.dumps(store.neighbourhood(node_id, depth=args.depth, max_nodes=args.max_nodes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
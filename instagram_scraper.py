@@ -1,34 +1,51 @@
 import requests
-import time
 import json
 import os
-import re
+import sys
+import itertools
 import urllib.parse
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from openai import OpenAI
+from sentiment_engine import score_text, score_posts
+from llm_client import get_llm_client
+from scraper_utils import instagram_get, profile_url, GRAPHQL_URL, MEDIA_QUERY_HASH, DEFAULT_POSTS_PER_PAGE
+from local_store import LOCAL_STORE_DISABLED
+from graph_store import GRAPH_STORE_DISABLED
+from rate_limiter import instagram_rate_limiter, parse_retry_after
+from stream_pipeline import buffered, JsonFileSink, StoreSink, GraphSink, LlmSummarySink
+from post_record import PostRecord
+from entity_extractor import find_mentions
+from profile_decoder import decode_profile_response, loads as decode_json
+from stage_metrics import timed
+from crawl_state import CrawlStateStore
 import html
 
 # --- Constants ---
-MEDIA_QUERY_HASH = "f2405b236d85e8296cf30347c9f08c2a"
-GRAPHQL_URL = "https://www.instagram.com/graphql/query/"
-DEFAULT_POSTS_PER_PAGE = 12
 MAX_PAGES = 10
-REQUEST_DELAY_SECONDS = 2
+MAX_PAGE_RETRIES = int(os.getenv("MAX_PAGE_RETRIES", "5")) # Consecutive failures before giving up on a crawl
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
 OUTPUT_FILENAME_TEMPLATE = "{username}_paginated_posts.json"
+PIPELINE_BUFFER_PAGES = int(os.getenv("PIPELINE_BUFFER_PAGES", "2")) # Pages fetched ahead of parsing
+
+# Per-user cursors and seen-shortcode index for incremental re-crawls
+crawl_state_store = CrawlStateStore()
 
 
 def analyze_sentiment(text):
     """Analyzes the sentiment of a text using VADER."""
-    if not text: # Handle cases with no text
-        return None
-    try:
-        # Lazy load analyzer if needed, or keep instance global/passed if script grows
-        analyzer = SentimentIntensityAnalyzer()
-        vs = analyzer.polarity_scores(text)
-        return vs['compound'] # Return the compound score (-1 to +1)
-    except Exception as e:
-        print(f"Error during sentiment analysis: {e}")
-        return None
+    scores = score_text(text) # Shared analyzer; the lexicon is loaded once per process
+    return scores['compound'] if scores else None # Return the compound score (-1 to +1)
+
+
+def _add_sentiment(posts):
+    """Fills the caption and comment sentiment fields of parsed posts with one batched scoring pass."""
+    for post, scores in zip(posts, score_posts(posts)):
+        caption = scores["caption"] or {}
+        post.caption_sentiment_compound = caption.get('compound')
+        post.caption_sentiment_pos = caption.get('pos')
+        post.caption_sentiment_neg = caption.get('neg')
+        post.caption_sentiment_neu = caption.get('neu')
+        comments = [comment['compound'] for comment in scores["comments"] if comment]
+        post.comments_sentiment_compound = sum(comments) / len(comments) if comments else None
+    return posts
 
 
 def extract_graph_data_llm(biography_text):
@@ -44,10 +61,7 @@ def extract_graph_data_llm(biography_text):
 
         print(f"Extracting graph data from biography with OpenRouter (Claude 3.5 Sonnet): \"{biography_text[:50]}...\"")
 
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-        )
+        client = get_llm_client(api_key) # Shared, pooled client
 
         # Define the desired JSON structure in the prompt
         prompt = f"""Analyze the following Instagram biography. Identify key entities (People, Organizations, Locations, Hashtags, Topics/Concepts) and any implied relationships between them. 
@@ -102,20 +116,20 @@ JSON Output:"""
 
 
 def get_user_info_and_id(username, cookies, headers):
-    """Fetches basic profile info and the crucial user ID."""
-    url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
+    """Fetches basic profile info, the crucial user ID and the first page of post edges."""
+    url = profile_url(username)
     try:
-        response = requests.get(url, headers=headers, cookies=cookies, timeout=15)
+        response = instagram_get(url, headers=headers, cookies=cookies, timeout=15)
         response.raise_for_status()
-        data = response.json()
+        data = decode_profile_response(response.content)
         user_data = data.get('data', {}).get('user', {})
         if not user_data:
             print(f"Error: Could not find 'user' object in profile info for {username}")
-            return None, None
+            return None, None, None
         user_id = user_data.get('id')
         if not user_id:
             print(f"Error: Could not extract user ID for {username}")
-            return None, None
+            return None, None, None
 
         basic_info = {
             'full_name': user_data.get('full_name'),
@@ -125,7 +139,8 @@ def get_user_info_and_id(username, cookies, headers):
             'is_private': user_data.get('is_private'),
             'is_verified': user_data.get('is_verified'),
         }
-        return user_id, basic_info
+        post_edges = user_data.get('edge_owner_to_timeline_media', {}).get('edges', [])
+        return user_id, basic_info, post_edges
 
     except requests.exceptions.RequestException as e:
         print(f"Failed to fetch initial profile info: {e}")
@@ -136,23 +151,30 @@ def get_user_info_and_id(username, cookies, headers):
                  print(f"Response text: {e.response.text[:500]}...")
              else:
                  print(f"Response content type: {content_type}")
-        return None, None
+        return None, None, None
     except json.JSONDecodeError:
         print("Failed to decode JSON response for initial profile info.")
-        return None, None
+        return None, None, None
 
 
-def fetch_posts_paginated(user_id, username, cookies, headers):
-    """Fetches all posts using pagination via the GraphQL endpoint."""
-    all_posts = []
-    end_cursor = None
+def iter_post_pages(user_id, username, cookies, headers, start_cursor=None, on_page=None):
+    """Yields each page of post edges from the GraphQL endpoint as soon as it arrives.
+
+    Requests are paced by the shared instagram_rate_limiter. On 429/5xx or network
+    errors the crawl backs off (honouring Retry-After) and retries the same
+    end_cursor, giving up only after MAX_PAGE_RETRIES consecutive failures.
+    Pass start_cursor to resume a previously interrupted crawl. on_page, if given,
+    is called with each page's page_info before its edges are yielded.
+    """
+    total_posts = 0
+    end_cursor = start_cursor
     has_next_page = True
     pages_fetched = 0
+    consecutive_failures = 0
 
     print(f"Starting paginated post fetch for {username} (ID: {user_id})...")
 
     while has_next_page and pages_fetched < MAX_PAGES:
-        pages_fetched += 1
         variables = {
             'id': user_id,
             'first': DEFAULT_POSTS_PER_PAGE,
@@ -166,12 +188,26 @@ def fetch_posts_paginated(user_id, username, cookies, headers):
         }
         paginated_url = f"{GRAPHQL_URL}?{urllib.parse.urlencode(params)}"
 
-        print(f"  Fetching page {pages_fetched} (Cursor: {end_cursor})...")
+        waited = instagram_rate_limiter.acquire()
+        print(f"  Fetching page {pages_fetched + 1} (Cursor: {end_cursor}, waited {waited:.1f}s)...")
 
         try:
-            response = requests.get(paginated_url, headers=headers, cookies=cookies, timeout=20)
+            with timed("pagination_page"):
+                # Paced: this loop owns retries, so the adapter mustn't retry 5xx on its own
+                response = instagram_get(paginated_url, headers=headers, cookies=cookies, timeout=20, paced=True)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                consecutive_failures += 1
+                if consecutive_failures > MAX_PAGE_RETRIES:
+                    print(f"  Giving up after {MAX_PAGE_RETRIES} retries (HTTP {response.status_code}). Resume from cursor: {end_cursor}")
+                    break
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                backoff = instagram_rate_limiter.on_throttle(retry_after)
+                print(f"  HTTP {response.status_code} on page {pages_fetched + 1}; backing off {backoff:.1f}s "
+                      f"(retry {consecutive_failures}/{MAX_PAGE_RETRIES}, Retry-After: {retry_after}).")
+                continue # Retry the same cursor
+
             response.raise_for_status()
-            data = response.json()
+            data = decode_json(response.content)
 
             media_data = data.get('data', {}).get('user', {}).get('edge_owner_to_timeline_media', {})
             if not media_data:
@@ -179,26 +215,39 @@ def fetch_posts_paginated(user_id, username, cookies, headers):
                 print(f"  Response snippet: {str(data)[:500]}...")
                 break
 
-            posts = media_data.get('edges', [])
-            if posts:
-                all_posts.extend(posts)
-                print(f"    Added {len(posts)} posts. Total now: {len(all_posts)}")
-            else:
-                print("    No 'edges' found on this page.")
+            instagram_rate_limiter.on_success()
+            consecutive_failures = 0
+            pages_fetched += 1
 
             page_info = media_data.get('page_info', {})
             has_next_page = page_info.get('has_next_page', False)
             end_cursor = page_info.get('end_cursor')
+            if on_page:
+                on_page(page_info)
+
+            posts = media_data.get('edges', [])
+            if posts:
+                total_posts += len(posts)
+                print(f"    Received {len(posts)} posts. Total now: {total_posts}")
+                yield posts
+            else:
+                print("    No 'edges' found on this page.")
 
             if not has_next_page:
                 print("  No more pages found.")
                 break
 
-            print(f"  Waiting {REQUEST_DELAY_SECONDS}s before next request...")
-            time.sleep(REQUEST_DELAY_SECONDS)
-
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # Transient network failure: back off and retry the same cursor
+            consecutive_failures += 1
+            if consecutive_failures > MAX_PAGE_RETRIES:
+                print(f"  Giving up after {MAX_PAGE_RETRIES} retries ({e.__class__.__name__}). Resume from cursor: {end_cursor}")
+                break
+            backoff = instagram_rate_limiter.on_throttle()
+            print(f"  Network error on page {pages_fetched + 1}: {e}; backing off {backoff:.1f}s "
+                  f"(retry {consecutive_failures}/{MAX_PAGE_RETRIES}).")
         except requests.exceptions.RequestException as e:
-            print(f"  Failed to fetch page {pages_fetched}: {e}")
+            print(f"  Failed to fetch page {pages_fetched + 1}: {e}")
             if hasattr(e, 'response') and e.response is not None:
                  print(f"  Response status: {e.response.status_code}")
                  content_type = e.response.headers.get('Content-Type', '')
@@ -208,78 +257,275 @@ def fetch_posts_paginated(user_id, username, cookies, headers):
                      print(f"  Response content type: {content_type}")
             break
         except json.JSONDecodeError:
-            print(f"  Failed to decode JSON response for page {pages_fetched}.")
+            print(f"  Failed to decode JSON response for page {pages_fetched + 1}.")
             break
         except Exception as e:
             print(f"  An unexpected error occurred during pagination: {e}")
             break
 
     if pages_fetched >= MAX_PAGES and has_next_page:
-        print(f"Warning: Reached maximum page limit ({MAX_PAGES}). May not have fetched all posts.")
+        print(f"Warning: Reached maximum page limit ({MAX_PAGES}). May not have fetched all posts. Resume from cursor: {end_cursor}")
+
+    print(f"Finished pagination. Fetched a total of {total_posts} posts across {pages_fetched} pages.")
+
 
-    print(f"Finished pagination. Fetched a total of {len(all_posts)} posts across {pages_fetched} pages.")
+def fetch_posts_paginated(user_id, username, cookies, headers, start_cursor=None):
+    """Fetches all posts using pagination via the GraphQL endpoint (see iter_post_pages)."""
+    all_posts = []
+    for page in iter_post_pages(user_id, username, cookies, headers, start_cursor=start_cursor):
+        all_posts.extend(page)
     return all_posts
 
 
-def parse_profile_data(post_edges):
-    """Parses the list of post edges extracted from paginated fetches."""
+def iter_new_post_pages(pages, state):
+    """Filters pages down to posts not in state's seen index, stopping at the first known page.
+
+    Marks every post on the page as seen (and crawled). Posts arrive newest first,
+    so once a page ends on a post known before this run, everything older has
+    been fetched already.
+    """
+    for edges in pages:
+        new_edges = state.new_edges(edges)
+        state.mark_seen(edges)
+        if new_edges:
+            yield new_edges
+        if state.reached_known(edges):
+            print(f"  Reached previously crawled posts for {state.username}; stopping.")
+            return
+
+
+def _track_backfill_cursor(state):
+    # Remembers where a backfill stopped so the next run resumes there
+    def on_page(page_info):
+        state.end_cursor = page_info.get('end_cursor')
+        state.has_more = bool(page_info.get('has_next_page'))
+    return on_page
+
+
+def _dedupe_initial_edges(state, initial_edges):
+    """Returns (new_edges, delta_done) for the first page of posts from the profile lookup.
+
+    delta_done is True when that page already ends on a post known before this
+    run, so nothing newer is missing and no GraphQL request is needed. The
+    caller decides how to mark initial_edges as seen.
+    """
+    new_edges = state.new_edges(initial_edges)
+    delta_done = state.reached_known(initial_edges)
+    if delta_done:
+        print(f"No posts beyond the first {len(initial_edges)} are new for {state.username}; skipping delta pagination.")
+    return new_edges, delta_done
+
+
+def fetch_new_posts(user_id, username, cookies, headers, initial_edges=None, state_store=None, paginate=True):
+    """Incremental version of fetch_posts_paginated: returns only posts not crawled before.
+
+    initial_edges (the first page from get_user_info_and_id) are deduplicated
+    first; if they already end on a known post the delta needs no GraphQL request.
+    Otherwise the feed is paged from the newest post until known posts are hit,
+    then an unfinished earlier backfill is resumed from its saved end_cursor.
+    With paginate=False only initial_edges are checked. They are always added
+    to the index, so repeated calls don't report them again, but unless they
+    close the gap to the crawled posts they stay uncrawled and don't stop a
+    later paginated crawl, which still fetches everything below them.
+    The updated state is saved to state_store (default: crawl_state_store).
+    """
+    state_store = state_store or crawl_state_store
+    state = state_store.load(username)
+    state.user_id = user_id
+    first_crawl = not state.previously_seen
+    new_posts = []
+    delta_done = False
+
+    if initial_edges:
+        new_edges, delta_done = _dedupe_initial_edges(state, initial_edges)
+        state.mark_seen(initial_edges, crawled=paginate or delta_done)
+        new_posts.extend(new_edges)
+
+    if paginate and not delta_done:
+        # From the newest post down to the first known one (or the end, on a first crawl)
+        on_page = _track_backfill_cursor(state) if first_crawl else None
+        pages = iter_post_pages(user_id, username, cookies, headers, on_page=on_page)
+        try:
+            for edges in iter_new_post_pages(pages, state):
+                new_posts.extend(edges)
+        finally:
+            pages.close()
+
+    if paginate and not first_crawl and state.has_more and state.end_cursor:
+        print(f"Resuming earlier backfill for {username} from cursor {state.end_cursor}...")
+        pages = iter_post_pages(user_id, username, cookies, headers, start_cursor=state.end_cursor,
+                                on_page=_track_backfill_cursor(state))
+        for edges in pages:
+            new_edges = state.new_edges(edges)
+            state.mark_seen(edges)
+            new_posts.extend(new_edges)
+
+    state_store.save(state)
+    print(f"Incremental crawl for {username}: {len(new_posts)} new posts ({len(state.seen_shortcodes)} known in total).")
+    return new_posts
+
+
+def parse_post_edge(edge, with_sentiment=True):
+    """Parses a single post edge into a PostRecord, or None if the edge has no node.
+
+    Pass with_sentiment=False when scoring is done in a batch afterwards.
+    """
+    node = edge.get('node', {})
+    if not node:
+        print("Warning: Found an edge without a node.")
+        return None
+
+    caption_edges = node.get('edge_media_to_caption', {}).get('edges', [])
+    caption = caption_edges[0].get('node', {}).get('text') if caption_edges else None
+
+    comment_info = node.get('edge_media_to_comment', {})
+    comment_count = comment_info.get('count')
+    comment_texts = [
+        cmt_edge.get('node', {}).get('text')
+        for cmt_edge in comment_info.get('edges', [])
+        if cmt_edge.get('node')
+    ]
+
+    tagged_users_in_caption = find_mentions(caption)
+
+    tagged_users_in_media = [
+        tag_edge.get('node', {}).get('user', {}).get('username')
+        for tag_edge in node.get('edge_media_to_tagged_user', {}).get('edges', [])
+        if tag_edge.get('node', {}).get('user')
+    ]
+
+    post = PostRecord(
+        id=node.get('id'),
+        shortcode=node.get('shortcode'),
+        timestamp=node.get('taken_at_timestamp'),
+        media_type=node.get('__typename'),
+        display_url=node.get('display_url'),
+        likes_count=node.get('edge_liked_by', {}).get('count'),
+        comments_count=comment_count,
+        caption=caption,
+        comment_previews=comment_texts,
+        tagged_users_in_caption=tagged_users_in_caption,
+        tagged_users_in_media=tagged_users_in_media,
+    )
+    if with_sentiment:
+        _add_sentiment([post])
+    return post
+
+
+def post_store_sinks(username):
+    """Returns the sinks that persist parsed posts for username: local_store and graph_store, unless disabled."""
+    sinks = []
+    if not LOCAL_STORE_DISABLED:
+        sinks.append(StoreSink(username))
+    if not GRAPH_STORE_DISABLED:
+        # Tagged users and @mentions join the cross-profile graph alongside the LLM-extracted edges
+        sinks.append(GraphSink(username))
+    return sinks
+
+
+def parse_profile_data(post_edges, username=None):
+    """Parses the list of post edges extracted from paginated fetches into PostRecords.
+
+    When username is given, the parsed posts are also bulk-upserted into local_store
+    and their tagged-user and @mention edges merged into graph_store.
+    """
     if not post_edges:
         print("No post edges provided to parse.")
         return []
 
     print(f"Parsing details for {len(post_edges)} fetched posts...")
-    extracted_posts = []
-
-    for edge in post_edges:
-        node = edge.get('node', {})
-        if not node:
-            print("Warning: Found an edge without a node.")
-            continue
-
-        caption_edges = node.get('edge_media_to_caption', {}).get('edges', [])
-        caption = caption_edges[0].get('node', {}).get('text') if caption_edges else None
-        caption_sentiment = analyze_sentiment(caption)
-
-        comment_info = node.get('edge_media_to_comment', {})
-        comment_count = comment_info.get('count')
-        comment_texts = [
-            cmt_edge.get('node', {}).get('text')
-            for cmt_edge in comment_info.get('edges', [])
-            if cmt_edge.get('node')
-        ]
-
-        tagged_users_in_caption = []
-        if caption:
-            tagged_users_in_caption = re.findall(r'@(\w+)', caption)
-
-        tagged_users_in_media = [
-            tag_edge.get('node', {}).get('user', {}).get('username')
-            for tag_edge in node.get('edge_media_to_tagged_user', {}).get('edges', [])
-            if tag_edge.get('node', {}).get('user')
-        ]
-
-        post_info = {
-            'id': node.get('id'),
-            'shortcode': node.get('shortcode'),
-            'timestamp': node.get('taken_at_timestamp'),
-            'media_type': node.get('__typename'),
-            'display_url': node.get('display_url'),
-            'likes_count': node.get('edge_liked_by', {}).get('count'),
-            'comments_count': comment_count,
-            'caption': caption,
-            'caption_sentiment_compound': caption_sentiment,
-            'comment_previews': comment_texts,
-            'tagged_users_in_caption': tagged_users_in_caption,
-            'tagged_users_in_media': tagged_users_in_media
-        }
-        extracted_posts.append(post_info)
+    parsed = (parse_post_edge(edge, with_sentiment=False) for edge in post_edges)
+    extracted_posts = _add_sentiment([post for post in parsed if post is not None])
 
     print(f"Successfully parsed {len(extracted_posts)} posts.")
+    if username:
+        for sink in post_store_sinks(username):
+            sink.consume(post_edges, extracted_posts)
+            sink.close()
     return extracted_posts
 
 
+def store_new_posts(user_id, username, cookies, headers, post_edges, state_store=None):
+    """Stores the posts from a profile lookup that are missing from the user's crawl index.
+
+    post_edges (the first page from get_user_info_and_id) are deduplicated by
+    fetch_new_posts without any GraphQL request; the new ones are parsed,
+    upserted into local_store and merged into graph_store. Shared by the web
+    app and batch analyses. Returns the new post edges.
+    """
+    if not post_edges:
+        return []
+    new_edges = fetch_new_posts(user_id, username, cookies, headers, initial_edges=post_edges,
+                                state_store=state_store, paginate=False)
+    if new_edges:
+        parse_profile_data(new_edges, username=username)
+    return new_edges
+
+
+def iter_parsed_pages(pages):
+    """Parses and scores each page of edges as it arrives, yielding (edges, posts) pairs."""
+    for edges in pages:
+        parsed = (parse_post_edge(edge, with_sentiment=False) for edge in edges)
+        yield edges, _add_sentiment([post for post in parsed if post is not None])
+
+
+def run_post_pipeline(user_id, username, cookies, headers, sinks, start_cursor=None, buffer_pages=PIPELINE_BUFFER_PAGES,
+                      incremental=False, state_store=None, initial_edges=None):
+    """Streams pagination -> parsing/sentiment -> sinks, one page at a time.
+
+    Pages are fetched on a background thread into a bounded buffer of
+    buffer_pages, so network waits overlap with parsing and memory stays
+    proportional to the buffer rather than the account size. Each sink's
+    consume(edges, posts) is called per page and close() once at the end.
+    With incremental, only posts missing from the user's crawl state reach
+    the sinks and paging stops at the first known page (see fetch_new_posts);
+    initial_edges from the profile lookup are deduplicated first and, when they
+    already end on a known post, no page is fetched at all.
+    Returns the total number of posts parsed.
+    """
+    state = None
+    on_page = None
+    initial_pages = []
+    delta_done = False
+    if incremental:
+        state_store = state_store or crawl_state_store
+        state = state_store.load(username)
+        state.user_id = user_id
+        if not state.previously_seen:
+            on_page = _track_backfill_cursor(state)
+        if initial_edges and not start_cursor:
+            new_edges, delta_done = _dedupe_initial_edges(state, initial_edges)
+            state.mark_seen(initial_edges)
+            if new_edges:
+                initial_pages.append(new_edges)
+    pages = None
+    new_pages = ()
+    if not delta_done:
+        pages = buffered(iter_post_pages(user_id, username, cookies, headers, start_cursor=start_cursor, on_page=on_page),
+                         buffer_pages)
+        new_pages = iter_new_post_pages(pages, state) if state is not None else pages
+    total_posts = 0
+    try:
+        for edges, posts in iter_parsed_pages(itertools.chain(initial_pages, new_pages)):
+            total_posts += len(posts)
+            for sink in sinks:
+                sink.consume(edges, posts)
+    finally:
+        if pages is not None:
+            pages.close() # Stops the fetch thread early if a sink raised
+        for sink in sinks:
+            sink.close()
+        if state is not None:
+            state_store.save(state)
+    print(f"Pipeline finished for {username}: {total_posts} posts streamed to {len(sinks)} sink(s).")
+    return total_posts
+
+
 def main():
-    username = "zuck"
+    # Optional username argument; use batch_analysis.py for many usernames.
+    # Posts are crawled incrementally (new ones are appended to the JSON dump); pass --full to re-crawl and rewrite it.
+    username = sys.argv[1] if len(sys.argv) > 1 else "zuck"
+    full_crawl = "--full" in sys.argv[2:]
 
     session_id = os.getenv("INSTAGRAM_SESSIONID", "60078234834%3ArnOpb62xkuBKLX%3A12%3AAYdh5WMhR7y-1xVo9yDHZKbSLxGNni6cnQPsPYyIRiMR")
     ds_user_id_val = os.getenv("INSTAGRAM_DS_USER_ID", "60078234834")
@@ -314,7 +560,7 @@ def main():
     }
 
     print(f"Attempting to fetch user ID for '{username}'...")
-    user_id, basic_info = get_user_info_and_id(username, cookies, headers)
+    user_id, basic_info, initial_edges = get_user_info_and_id(username, cookies, headers)
 
     if user_id:
         print(f"Successfully found User ID: {user_id}")
@@ -338,6 +584,20 @@ def main():
         else:
              report_data['graph_data'] = {"error": "No biography available for analysis"}
 
+        # --- Stream posts: pagination -> parsing/sentiment -> JSON file, store, graph ---
+        posts_filename = OUTPUT_FILENAME_TEMPLATE.format(username=username)
+        summary_sink = LlmSummarySink()
+        sinks = [JsonFileSink(posts_filename, append=not full_crawl), summary_sink] + post_store_sinks(username)
+        posts_streamed = run_post_pipeline(user_id, username, cookies, headers, sinks, incremental=not full_crawl,
+                                           initial_edges=initial_edges)
+        average_sentiment = summary_sink.average_sentiment
+        if posts_streamed:
+            posts_note = (f"Streamed {posts_streamed} {'' if full_crawl else 'new '}posts to {posts_filename}"
+                          f" (average caption sentiment: {'N/A' if average_sentiment is None else f'{average_sentiment:.2f}'}).")
+        else:
+            posts_note = (f"No {'' if full_crawl else 'new '}posts were retrieved via pagination. This may be due to API changes, "
+                          "rate limiting, insufficient permissions or nothing having been posted since the last crawl.")
+
         # --- Generate HTML Report (Updated) --- 
         # Prepare graph data for HTML display (using <pre> for raw JSON)
         graph_html = "<p><i>No biography available for graph extraction.</i></p>"
@@ -417,7 +677,7 @@ def main():
         </div>
 
         <div class="note">
-            <strong>Note:</strong> Attempt to retrieve full post data via pagination failed. This may be due to API changes, rate limiting, or insufficient permissions. The report contains only reliably fetched profile metadata.
+            <strong>Note:</strong> {html.escape(posts_note)}
         </div>
     </div>
 </body>
@@ -433,8 +693,6 @@ def main():
         except IOError as e:
             print(f"\nError writing HTML report to file: {e}")
 
-        # --- Stop here, do not attempt pagination ---
-
     else:
         print(f"\nCould not retrieve User ID for '{username}'. Cannot proceed.")
 
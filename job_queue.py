@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from task_control import CancelToken
+
+# --- Constants ---
+# Pool size caps how many analyses run at once, independent of HTTP threads.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Jobs waiting beyond this many are rejected instead of queueing forever.
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+# Finished jobs are kept around this long so results can still be polled.
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+# A job whose last event-stream subscriber left this long ago (without reconnecting) is cancelled.
+# Jobs that never had a subscriber (JSON API clients polling status) are never cancelled this way.
+JOB_ABANDON_GRACE_SECONDS = float(os.getenv("JOB_ABANDON_GRACE_SECONDS", "30"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the pending queue is at capacity."""
+
+
+class Job:
+    """Tracks the state of a single background analysis."""
+
+    def __init__(self, job_id, username, kind="analysis"):
+        self.id = job_id
+        self.username = username
+        self.kind = kind
+        self.status = STATUS_QUEUED
+        self.progress = "Queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Ordered event log replayed to Server-Sent Events subscribers; an entry's index is its SSE id
+        self._events = []
+        self._delta_indices = defaultdict(list) # section -> indices of its not-yet-superseded deltas
+        self._events_cond = threading.Condition()
+        self._events_closed = False
+        self._subscribers = 0
+        # Set when the job is cancelled or abandoned; the work should stop and return what it has
+        self.cancel_token = CancelToken()
+
+    def cancel(self, reason="cancelled by client"):
+        """Asks the running work to stop; LLM calls made with cancel_token are abandoned."""
+        if self._events_closed or self.cancel_token.cancelled:
+            return False
+        print(f"Cancelling job {self.id} for {self.username}: {reason}.")
+        self.cancel_token.cancel(reason)
+        self.publish("progress", {"progress": f"Cancelling ({reason})"})
+        return True
+
+    def _unsubscribe(self):
+        with self._events_cond:
+            self._subscribers -= 1
+            abandoned = self._subscribers == 0 and not self._events_closed
+        if abandoned:
+            # EventSource reconnects on its own, so only a subscriber that stays away counts as gone
+            timer = threading.Timer(JOB_ABANDON_GRACE_SECONDS, self._cancel_if_abandoned)
+            timer.daemon = True
+            timer.start()
+
+    def _cancel_if_abandoned(self):
+        with self._events_cond:
+            abandoned = self._subscribers == 0 and not self._events_closed
+        if abandoned:
+            self.cancel("client disconnected")
+
+    def set_progress(self, message):
+        """Updates the human-readable progress message shown while polling."""
+        self.progress = message
+        self.publish("progress", {"progress": message})
+
+    def publish(self, event_type, data):
+        """Appends an event for streaming subscribers and wakes them up.
+
+        A 'section' event carries the section's final content, so the 'delta'
+        events streamed before it are dropped from the log: late subscribers
+        only need the final content, and finished jobs stay in memory for
+        JOB_RESULT_TTL_SECONDS.
+        """
+        with self._events_cond:
+            if self._events_closed:
+                return
+            if event_type == "delta":
+                self._delta_indices[data.get("section")].append(len(self._events))
+            elif event_type == "section":
+                # Tombstones keep later indices (and so Last-Event-ID resumes) valid
+                for index in self._delta_indices.pop(data.get("section"), ()):
+                    self._events[index] = None
+            self._events.append((event_type, data))
+            self._events_cond.notify_all()
+
+    def close_events(self):
+        """Publishes the final 'done' event; subscribers stop after receiving it."""
+        with self._events_cond:
+            self._events.append(("done", {"status": self.status, "error": self.error}))
+            self._events_closed = True
+            self._events_cond.notify_all()
+
+    def iter_events(self, start_index=0, heartbeat_seconds=15):
+        """Yields (index, event_type, data) from start_index onwards until the job finishes.
+
+        Blocks while waiting for new events and yields (None, None, None) every
+        heartbeat_seconds of silence so callers can detect disconnected clients.
+        Once the last subscriber is gone for JOB_ABANDON_GRACE_SECONDS, the job is cancelled.
+        """
+        index = start_index
+        with self._events_cond:
+            self._subscribers += 1
+        try:
+            while True:
+                with self._events_cond:
+                    if index >= len(self._events) and not self._events_closed:
+                        self._events_cond.wait(heartbeat_seconds)
+                    pending = self._events[index:]
+                    closed = self._events_closed
+                if not pending and not closed:
+                    yield None, None, None
+                for event in pending:
+                    if event is not None: # None marks a dropped delta
+                        yield (index,) + event
+                    index += 1
+                if closed and not pending:
+                    return
+        finally:
+            # Runs on normal completion and when the server closes the generator for a gone client
+            self._unsubscribe()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "username": self.username,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancelled": self.cancel_token.cancelled,
+        }
+
+
+class JobQueue:
+    """Runs submitted analyses on a bounded thread pool and tracks them by job ID."""
+
+    def __init__(self, max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, result_ttl=JOB_RESULT_TTL_SECONDS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._max_pending = max_pending
+        self._result_ttl = result_ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, username, func, *args, job_kind="analysis", **kwargs):
+        """Queues func(job, *args, **kwargs) and returns the new Job immediately."""
+        with self._lock:
+            self._prune_expired()
+            pending = sum(1 for job in self._jobs.values() if job.status in (STATUS_QUEUED, STATUS_RUNNING))
+            if pending >= self._max_pending:
+                raise QueueFullError(f"Job queue is full ({pending} pending jobs).")
+            job = Job(uuid.uuid4().hex, username, kind=job_kind)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, func, args, kwargs)
+        print(f"Queued job {job.id} for {username}.")
+        return job
+
+    def get(self, job_id):
+        """Returns the Job for job_id, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func, args, kwargs):
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        job.set_progress("Running")
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = STATUS_DONE
+            job.set_progress("Completed")
+        except Exception as e:
+            print(f"Job {job.id} for {job.username} failed: {e}")
+            job.error = f"Job execution failed: {e.__class__.__name__}: {e}"
+            job.status = STATUS_FAILED
+            job.set_progress("Failed")
+        finally:
+            job.finished_at = time.time()
+            job.close_events()
+            print(f"Job {job.id} finished with status '{job.status}' in {job.finished_at - job.started_at:.2f} seconds.")
+
+    def _prune_expired(self):
+        # Caller must hold self._lock
+        cutoff = time.time() - self._result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
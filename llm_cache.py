@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+
+# --- Constants ---
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+# Set LLM_CACHE_DISABLED=1 to send every prompt to the API
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+
+def make_cache_key(model, prompt, max_tokens, temperature):
+    """Returns a content hash of everything that determines an LLM response."""
+    payload = json.dumps([model, prompt, max_tokens, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Persistent SQLite cache of LLM responses keyed by make_cache_key().
+
+    Entries expire after their TTL. When the stored responses exceed max_bytes,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _connect(self):
+        # Caller must hold self._lock; the connection is opened lazily on first use
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        """Returns the cached response for key, or None if missing or expired."""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT response, expires_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.stats["misses"] += 1
+                    return None
+                response, expires_at = row
+                if expires_at < now:
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    conn.commit()
+                    self.stats["misses"] += 1
+                    return None
+                conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.stats["hits"] += 1
+                return response
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache read failed: {e}")
+            return None
+
+    def set(self, key, model, response, ttl=None):
+        """Stores response under key with an optional per-entry TTL override."""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        size_bytes = len(response.encode('utf-8'))
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, model, response, size_bytes, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size_bytes, now, now + ttl, now))
+                self._evict(conn, now)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache write failed: {e}")
+
+    def _evict(self, conn, now):
+        # Caller must hold self._lock
+        expired = conn.execute("DELETE FROM llm_responses WHERE expires_at < ?", (now,)).rowcount
+        self.stats["evictions"] += max(expired, 0)
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM llm_responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size_bytes in conn.execute("SELECT key, size_bytes FROM llm_responses ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            total -= size_bytes
+            self.stats["evictions"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
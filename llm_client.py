@@ -0,0 +1,54 @@
+import os
+import threading
+import httpx
+from openai import OpenAI
+
+# --- Constants ---
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+# Long generations (e.g. the 7000-token JSON task) need a generous read timeout
+LLM_READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "300"))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _build_http_client():
+    """Creates the pooled, keep-alive httpx client shared by an OpenAI client."""
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    timeout = httpx.Timeout(LLM_READ_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+    return httpx.Client(limits=limits, timeout=timeout)
+
+
+def get_llm_client(api_key, base_url=None):
+    """Returns the process-wide OpenAI client for (base_url, api_key), creating it once.
+
+    OpenAI clients are thread-safe, so every LLM caller shares one connection
+    pool per endpoint instead of paying for a new pool and TLS handshake per call.
+    """
+    base_url = base_url or OPENROUTER_BASE_URL
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(base_url=base_url, api_key=api_key, http_client=_build_http_client())
+            _clients[key] = client
+    return client
+
+
+def close_llm_clients():
+    """Closes every pooled client (e.g. on shutdown or in benchmarks)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
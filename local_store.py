@@ -0,0 +1,327 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+import time
+
+# --- Constants ---
+LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", os.path.join(".cache", "local_store.sqlite3"))
+# Set LOCAL_STORE_DISABLED=1 to skip persisting profiles, posts and analyses
+LOCAL_STORE_DISABLED = os.getenv("LOCAL_STORE_DISABLED", "").lower() in ("1", "true", "yes")
+
+HASHTAG_PATTERN = re.compile(r'#(\w+)')
+MENTION_PATTERN = re.compile(r'@(\w+)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    username TEXT PRIMARY KEY,
+    user_id TEXT,
+    full_name TEXT,
+    biography TEXT,
+    followers_count INTEGER,
+    following_count INTEGER,
+    is_private INTEGER,
+    is_verified INTEGER,
+    profile_pic_url TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_user_id ON profiles (user_id);
+
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    shortcode TEXT,
+    timestamp INTEGER,
+    media_type TEXT,
+    display_url TEXT,
+    likes_count INTEGER,
+    comments_count INTEGER,
+    caption TEXT,
+    caption_sentiment_compound REAL,
+    caption_sentiment_pos REAL,
+    caption_sentiment_neg REAL,
+    caption_sentiment_neu REAL,
+    comments_sentiment_compound REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_username_timestamp ON posts (username, timestamp);
+CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_posts_shortcode ON posts (shortcode);
+
+CREATE TABLE IF NOT EXISTS post_hashtags (
+    post_id TEXT NOT NULL,
+    hashtag TEXT NOT NULL,
+    PRIMARY KEY (post_id, hashtag)
+);
+CREATE INDEX IF NOT EXISTS idx_post_hashtags_hashtag ON post_hashtags (hashtag);
+
+-- Users @mentioned in captions (source 'caption') or tagged in the media (source 'media')
+CREATE TABLE IF NOT EXISTS post_mentions (
+    post_id TEXT NOT NULL,
+    mention TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (post_id, mention, source)
+);
+CREATE INDEX IF NOT EXISTS idx_post_mentions_mention ON post_mentions (mention);
+
+CREATE TABLE IF NOT EXISTS comments (
+    post_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT,
+    PRIMARY KEY (post_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    mode TEXT,
+    report TEXT,
+    forensic_notes TEXT,
+    json_data TEXT,
+    metrics TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_username_created_at ON analyses (username, created_at);
+"""
+
+POST_COLUMNS = ("id", "username", "shortcode", "timestamp", "media_type", "display_url", "likes_count",
+                "comments_count", "caption", "caption_sentiment_compound", "caption_sentiment_pos",
+                "caption_sentiment_neg", "caption_sentiment_neu", "comments_sentiment_compound")
+# Columns added to posts after its first release; databases created earlier get them on connect
+POST_MIGRATION_COLUMNS = {
+    "caption_sentiment_pos": "REAL",
+    "caption_sentiment_neg": "REAL",
+    "caption_sentiment_neu": "REAL",
+    "comments_sentiment_compound": "REAL",
+}
+
+
+def _normalise_username(username):
+    return username.strip().lower()
+
+
+class LocalStore:
+    """Embedded SQLite store for profiles, posts, hashtags, mentions, comments and LLM analyses.
+
+    Replaces the per-user JSON dumps with one indexed database so cross-account
+    queries (by username, time range, hashtag or mention) don't need to load every
+    file. Writes are bulk upserts in a single transaction.
+    """
+
+    def __init__(self, path=LOCAL_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # Caller must hold self._lock; the connection is opened lazily on first use
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(posts)")}
+            for column, column_type in POST_MIGRATION_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE posts ADD COLUMN {column} {column_type}")
+            self._conn.commit()
+        return self._conn
+
+    # --- Writes ---
+
+    def upsert_profile(self, username, user_id, basic_info):
+        """Inserts or updates one profile row from a basic_info dict."""
+        basic_info = basic_info or {}
+        row = (
+            _normalise_username(username), user_id, basic_info.get('full_name'), basic_info.get('biography'),
+            basic_info.get('followers_count'), basic_info.get('following_count'), basic_info.get('is_private'),
+            basic_info.get('is_verified'), basic_info.get('profile_pic_url'), time.time(),
+        )
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO profiles (username, user_id, full_name, biography, followers_count, "
+                        "following_count, is_private, is_verified, profile_pic_url, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+        except sqlite3.Error as e:
+            print(f"Warning: Local store profile write failed for {username}: {e}")
+
+    def upsert_posts(self, username, posts):
+        """Bulk upserts parsed posts (parse_post_edge dicts) with their hashtags, mentions and comments.
+
+        Returns the number of posts written.
+        """
+        username = _normalise_username(username)
+        now = time.time()
+        post_rows, hashtag_rows, mention_rows, comment_rows = [], [], [], []
+        for post in posts:
+            post_id = post.get('id')
+            if not post_id:
+                continue
+            post_rows.append(tuple(username if column == "username" else post.get(column) for column in POST_COLUMNS) + (now,))
+            caption = post.get('caption') or ""
+            hashtag_rows.extend((post_id, tag.lower()) for tag in set(HASHTAG_PATTERN.findall(caption)))
+            caption_mentions = post.get('tagged_users_in_caption') or MENTION_PATTERN.findall(caption)
+            mention_rows.extend((post_id, mention.lower(), 'caption') for mention in set(caption_mentions) if mention)
+            mention_rows.extend((post_id, mention.lower(), 'media') for mention in set(post.get('tagged_users_in_media') or []) if mention)
+            comment_rows.extend((post_id, position, text) for position, text in enumerate(post.get('comment_previews') or []))
+        if not post_rows:
+            return 0
+
+        post_ids = [(row[0],) for row in post_rows]
+        placeholders = ", ".join("?" * (len(POST_COLUMNS) + 1))
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO posts ({', '.join(POST_COLUMNS)}, updated_at) VALUES ({placeholders})",
+                        post_rows)
+                    # Child rows are replaced wholesale so edited captions don't leave stale tags behind
+                    for table in ("post_hashtags", "post_mentions", "comments"):
+                        conn.executemany(f"DELETE FROM {table} WHERE post_id = ?", post_ids)
+                    conn.executemany("INSERT OR IGNORE INTO post_hashtags (post_id, hashtag) VALUES (?, ?)", hashtag_rows)
+                    conn.executemany("INSERT OR IGNORE INTO post_mentions (post_id, mention, source) VALUES (?, ?, ?)", mention_rows)
+                    conn.executemany("INSERT OR REPLACE INTO comments (post_id, position, text) VALUES (?, ?, ?)", comment_rows)
+        except sqlite3.Error as e:
+            print(f"Warning: Local store post write failed for {username}: {e}")
+            return 0
+        return len(post_rows)
+
+    def save_analysis(self, username, results, mode=None):
+        """Appends one LLM analysis result dict (report, forensic_notes, json_data, metrics)."""
+        row = (
+            _normalise_username(username), mode or (results.get("metrics") or {}).get("mode"),
+            results.get("report"), results.get("forensic_notes"),
+            json.dumps(results.get("json_data"), ensure_ascii=False),
+            json.dumps(results.get("metrics"), ensure_ascii=False), time.time(),
+        )
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT INTO analyses (username, mode, report, forensic_notes, json_data, metrics, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Warning: Local store analysis write failed for {username}: {e}")
+
+    # --- Queries ---
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def get_profile(self, username):
+        rows = self._query("SELECT * FROM profiles WHERE username = ?", (_normalise_username(username),))
+        return rows[0] if rows else None
+
+    def get_posts(self, username=None, since=None, until=None, limit=100):
+        """Posts newest first, optionally filtered by owner and taken_at range (epoch seconds)."""
+        clauses, params = [], []
+        if username:
+            clauses.append("username = ?")
+            params.append(_normalise_username(username))
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(f"SELECT * FROM posts {where} ORDER BY timestamp DESC LIMIT ?", (*params, limit))
+
+    def posts_with_hashtag(self, hashtag, limit=100):
+        return self._query(
+            "SELECT p.* FROM post_hashtags h JOIN posts p ON p.id = h.post_id "
+            "WHERE h.hashtag = ? ORDER BY p.timestamp DESC LIMIT ?", (hashtag.lstrip('#').lower(), limit))
+
+    def posts_mentioning(self, username, limit=100):
+        """Posts that @mention or tag username, across every stored account."""
+        return self._query(
+            "SELECT DISTINCT p.* FROM post_mentions m JOIN posts p ON p.id = m.post_id "
+            "WHERE m.mention = ? ORDER BY p.timestamp DESC LIMIT ?", (_normalise_username(username).lstrip('@'), limit))
+
+    def get_comments(self, post_id):
+        return [row["text"] for row in self._query("SELECT text FROM comments WHERE post_id = ? ORDER BY position", (post_id,))]
+
+    def latest_analysis(self, username):
+        rows = self._query("SELECT * FROM analyses WHERE username = ? ORDER BY created_at DESC LIMIT 1",
+                           (_normalise_username(username),))
+        if not rows:
+            return None
+        analysis = rows[0]
+        analysis["json_data"] = json.loads(analysis["json_data"]) if analysis["json_data"] else None
+        analysis["metrics"] = json.loads(analysis["metrics"]) if analysis["metrics"] else None
+        return analysis
+
+    def get_stats(self):
+        counts = {}
+        with self._lock:
+            conn = self._connect()
+            for table in ("profiles", "posts", "post_hashtags", "post_mentions", "comments", "analyses"):
+                counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return counts
+
+
+def import_json_dump(store, path, username=None):
+    """Imports a legacy dump: a web_profile_info response or a parsed-posts JSON array.
+
+    Returns the number of posts imported.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, list):
+        if not username:
+            raise ValueError(f"{path} is a post list; pass the owner's username")
+        return store.upsert_posts(username, data)
+
+    # Imported lazily: instagram_scraper pulls in the scraping stack, which this module otherwise doesn't need
+    from instagram_scraper import parse_profile_data
+    user_data = data.get('data', {}).get('user') or {}
+    username = username or user_data.get('username')
+    if not username:
+        raise ValueError(f"{path} has no username; pass one explicitly")
+    store.upsert_profile(username, user_data.get('id'), {
+        'full_name': user_data.get('full_name'),
+        'biography': user_data.get('biography'),
+        'followers_count': user_data.get('edge_followed_by', {}).get('count'),
+        'following_count': user_data.get('edge_follow', {}).get('count'),
+        'is_private': user_data.get('is_private'),
+        'is_verified': user_data.get('is_verified'),
+        'profile_pic_url': user_data.get('profile_pic_url_hd') or user_data.get('profile_pic_url'),
+    })
+    post_edges = user_data.get('edge_owner_to_timeline_media', {}).get('edges', [])
+    return store.upsert_posts(username, parse_profile_data(post_edges))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import legacy JSON dumps into the local store, or show its size.")
+    parser.add_argument("files", nargs="*", help="web_profile_info responses or {username}_paginated_posts.json files")
+    parser.add_argument("-u", "--username", default=None, help="Owner username (required for post lists)")
+    parser.add_argument("--db", default=LOCAL_STORE_PATH, help="SQLite database path")
+    args = parser.parse_args()
+
+    store = LocalStore(args.db)
+    for path in args.files:
+        try:
+            count = import_json_dump(store, path, args.username)
+            print(f"Imported {count} posts from {path}")
+        except (IOError, ValueError) as e:
+            print(f"Error importing {path}: {e}")
+            sys.exit(1)
+    print(json.dumps(store.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+# brotli is optional: ~15-20% smaller than gzip on HTML; without it pages are served gzip-only
+try:
+    import brotli
+except ImportError: # pragma: no cover - depends on the environment
+    brotli = None
+
+# --- Constants ---
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "128")) # Rendered pages kept in memory
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5 # Pages are compressed once and served many times, but first views shouldn't wait
+MIN_COMPRESS_BYTES = 1024 # Smaller bodies aren't worth a Content-Encoding
+
+# Preferred first when the client rates encodings equally
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Picks the best of available for an Accept-Encoding header value, else 'identity'."""
+    qualities = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    best, best_quality = "identity", 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CachedPage:
+    """A rendered body plus its precompressed variants and a content-hash ETag per encoding."""
+
+    def __init__(self, body, mimetype="text/html"):
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def select(self, accept_encoding):
+        """Returns (encoding, body, etag) for the client's Accept-Encoding header."""
+        encoding = negotiate_encoding(accept_encoding, [e for e in SUPPORTED_ENCODINGS if e in self.variants])
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag = self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+        return encoding, self.variants[encoding], etag
+
+
+class PageCache:
+    """Thread-safe LRU of CachedPages keyed by anything hashable (e.g. a result ID)."""
+
+    def __init__(self, max_entries=PAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
@@ -0,0 +1,84 @@
+import sys
+
+POST_FIELDS = (
+    'id', 'shortcode', 'timestamp', 'media_type', 'display_url', 'likes_count', 'comments_count',
+    'caption', 'caption_sentiment_compound', 'caption_sentiment_pos', 'caption_sentiment_neg', 'caption_sentiment_neu',
+    'comments_sentiment_compound', 'comment_previews', 'tagged_users_in_caption', 'tagged_users_in_media',
+)
+_FIELD_SET = frozenset(POST_FIELDS)
+_EMPTY = ()
+
+
+def _intern_all(names):
+    # Usernames repeat across many posts; interning stores each distinct one once.
+    # Entries are kept as given (None and "" included) so records match the lists they replace.
+    return tuple(sys.intern(name) if name else name for name in names) if names else _EMPTY
+
+
+class PostRecord:
+    """Compact parsed post: __slots__ instead of a per-post dict, tuples instead of lists.
+
+    Tagged usernames and media types are interned, and empty sequences share one
+    tuple. Records also answer post['key'] / post.get('key') like the dicts they
+    replace; call to_dict() only when serialising.
+    """
+
+    __slots__ = POST_FIELDS
+
+    def __init__(self, id=None, shortcode=None, timestamp=None, media_type=None, display_url=None, likes_count=None,
+                 comments_count=None, caption=None, caption_sentiment_compound=None, caption_sentiment_pos=None,
+                 caption_sentiment_neg=None, caption_sentiment_neu=None, comments_sentiment_compound=None,
+                 comment_previews=None, tagged_users_in_caption=None, tagged_users_in_media=None):
+        self.id = id
+        self.shortcode = shortcode
+        self.timestamp = timestamp
+        self.media_type = sys.intern(media_type) if media_type else media_type
+        self.display_url = display_url
+        self.likes_count = likes_count
+        self.comments_count = comments_count
+        self.caption = caption
+        self.caption_sentiment_compound = caption_sentiment_compound
+        self.caption_sentiment_pos = caption_sentiment_pos
+        self.caption_sentiment_neg = caption_sentiment_neg
+        self.caption_sentiment_neu = caption_sentiment_neu
+        self.comments_sentiment_compound = comments_sentiment_compound # Mean over the scored comment previews
+        self.comment_previews = tuple(comment_previews) if comment_previews else _EMPTY
+        self.tagged_users_in_caption = _intern_all(tagged_users_in_caption)
+        self.tagged_users_in_media = _intern_all(tagged_users_in_media)
+
+    # --- Dict-style access for code written against the old dict form ---
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in _FIELD_SET else default
+
+    def keys(self):
+        return POST_FIELDS
+
+    def __eq__(self, other):
+        if not isinstance(other, PostRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in POST_FIELDS)
+
+    def __hash__(self):
+        # Identity fields only: equal records share them, and scores filled in later don't change the hash
+        return hash((self.id, self.shortcode))
+
+    def __repr__(self):
+        return f"PostRecord(id={self.id!r}, shortcode={self.shortcode!r}, timestamp={self.timestamp!r})"
+
+    def to_dict(self):
+        """The JSON-serialisable dict form (lists rather than tuples), as the parsers used to return."""
+        post = {field: getattr(self, field) for field in POST_FIELDS}
+        for field in ('comment_previews', 'tagged_users_in_caption', 'tagged_users_in_media'):
+            post[field] = list(post[field])
+        return post
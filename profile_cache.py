@@ -0,0 +1,139 @@
+import os
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# --- Constants ---
+PROFILE_CACHE_TTL_SECONDS = int(os.getenv("PROFILE_CACHE_TTL_SECONDS", "900"))
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "256"))
+PROFILE_CACHE_DIR = os.getenv("PROFILE_CACHE_DIR", os.path.join(".cache", "profiles"))
+
+
+class ProfileCache:
+    """Two-tier TTL cache for profile lookups: an in-memory LRU backed by JSON files on disk.
+
+    Keys are usernames (case-insensitive). Both tiers hold at most max_entries items;
+    the least recently used entry is evicted from memory and the oldest file from disk.
+    """
+
+    def __init__(self, ttl=PROFILE_CACHE_TTL_SECONDS, max_entries=PROFILE_CACHE_MAX_ENTRIES, cache_dir=PROFILE_CACHE_DIR):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._memory = OrderedDict() # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def _key(username):
+        return username.strip().lower()
+
+    def _path(self, key):
+        # Instagram usernames are [a-z0-9._], but never trust input with file paths
+        safe_key = re.sub(r'[^a-z0-9._-]', '_', key)
+        return os.path.join(self.cache_dir, f"{safe_key}.json")
+
+    def _is_fresh(self, stored_at):
+        return (time.time() - stored_at) < self.ttl
+
+    def get(self, username):
+        """Returns the cached value for username, or None on a miss or expired entry."""
+        key = self._key(username)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self._is_fresh(stored_at):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self.stats["expirations"] += 1
+
+            entry = self._read_disk(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self._is_fresh(stored_at):
+                    self._store_memory(key, stored_at, value)
+                    self.stats["disk_hits"] += 1
+                    return value
+                self._remove_disk(key)
+                self.stats["expirations"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, username, value):
+        """Stores a JSON-serialisable value for username in both tiers."""
+        key = self._key(username)
+        stored_at = time.time()
+        with self._lock:
+            self._store_memory(key, stored_at, value)
+            self._write_disk(key, stored_at, value)
+
+    def invalidate(self, username):
+        """Drops username from both tiers."""
+        key = self._key(username)
+        with self._lock:
+            self._memory.pop(key, None)
+            self._remove_disk(key)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        return stats
+
+    # --- Internal helpers (caller holds self._lock) ---
+
+    def _store_memory(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry["stored_at"], entry["value"]
+        except FileNotFoundError:
+            return None
+        except (IOError, ValueError, KeyError) as e:
+            print(f"Warning: Ignoring unreadable profile cache entry for '{key}': {e}")
+            return None
+
+    def _write_disk(self, key, stored_at, value):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"stored_at": stored_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except (IOError, TypeError, ValueError) as e:
+            print(f"Warning: Could not write profile cache entry for '{key}': {e}")
+
+    def _remove_disk(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        try:
+            paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        except OSError:
+            return
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+                self.stats["evictions"] += 1
+            except OSError:
+                pass
@@ -0,0 +1,63 @@
+import json
+
+# orjson is optional: several times faster than the stdlib decoder on large payloads
+try:
+    import orjson
+except ImportError: # pragma: no cover - depends on the environment
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+# The only web_profile_info user fields read by parse_profile_response
+PROFILE_USER_FIELDS = (
+    'id', 'username', 'full_name', 'biography', 'edge_followed_by', 'edge_follow',
+    'is_private', 'is_verified', 'profile_pic_url', 'profile_pic_url_hd',
+)
+# Post node fields read by parse_post_edge, _prepare_post_data_for_llm and the crawl state
+POST_NODE_FIELDS = (
+    'id', 'shortcode', 'taken_at_timestamp', '__typename', 'display_url', 'video_view_count',
+    'edge_liked_by', 'edge_media_to_comment', 'edge_media_to_caption', 'edge_media_to_tagged_user',
+)
+
+
+def loads(data):
+    """Decodes JSON bytes or str with orjson when installed, else the stdlib json module.
+
+    Both backends raise json.JSONDecodeError (orjson's error subclasses it).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def _slim_post_edge(edge):
+    node = edge.get('node') if isinstance(edge, dict) else None
+    if not node:
+        return {'node': {}}
+    return {'node': {field: node[field] for field in POST_NODE_FIELDS if field in node}}
+
+
+def slim_profile_payload(data):
+    """Reduces a decoded web_profile_info payload to the fields and post edges we use.
+
+    Keeps the {'data': {'user': ...}} shape so parse_profile_response works
+    unchanged; the slimmed result is also far cheaper to cache and re-serialise.
+    """
+    user_data = (data.get('data') or {}).get('user') if isinstance(data, dict) else None
+    if not user_data:
+        return {'data': {'user': {}}}
+    user = {field: user_data[field] for field in PROFILE_USER_FIELDS if field in user_data}
+    media = user_data.get('edge_owner_to_timeline_media') or {}
+    user['edge_owner_to_timeline_media'] = {
+        'count': media.get('count', 0),
+        'page_info': media.get('page_info', {}),
+        'edges': [_slim_post_edge(edge) for edge in media.get('edges', [])],
+    }
+    return {'data': {'user': user}}
+
+
+def decode_profile_response(content):
+    """Decodes raw web_profile_info response bytes into the slimmed payload."""
+    return slim_profile_payload(loads(content))
@@ -0,0 +1,118 @@
+import math
+import re
+from datetime import datetime, timezone
+
+# tiktoken is optional: exact counts for OpenAI-style tokenizers, else a chars/4 estimate
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception: # ImportError, or the encoding can't be downloaded offline
+    _ENCODING = None
+
+CHARS_PER_TOKEN = 4 # Rule of thumb for English text across common tokenizers
+MIN_CAPTION_LEN = 60 # Captions are never cut shorter than this to squeeze a post in
+
+_MENTION_OR_TAG = re.compile(r'[@#]\w+')
+_WORD = re.compile(r'\w+')
+
+
+def estimate_tokens(text):
+    """Estimated token count of text for the prompt budget."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _caption(node):
+    caption_edges = node.get('edge_media_to_caption', {}).get('edges', [{}])
+    return (caption_edges[0] if caption_edges else {}).get('node', {}).get('text', '') or ''
+
+
+def score_post(node, newest_timestamp=None):
+    """Heuristic informativeness of a post for the analyses.
+
+    Captions with more distinct words, @mentions and #hashtags carry the entities
+    the prompts ask for; engagement and recency break ties between similar posts.
+    """
+    caption = _caption(node)
+    distinct_words = len(set(word.lower() for word in _WORD.findall(caption)))
+    entities = len(_MENTION_OR_TAG.findall(caption))
+    tagged = len(node.get('edge_media_to_tagged_user', {}).get('edges', []))
+    engagement = (node.get('edge_liked_by', {}).get('count') or 0) + (node.get('edge_media_to_comment', {}).get('count') or 0)
+
+    score = min(distinct_words, 60) + 4 * entities + 3 * tagged + math.log10(1 + engagement)
+    timestamp = node.get('taken_at_timestamp')
+    if newest_timestamp and timestamp:
+        age_days = max(0, newest_timestamp - timestamp) / 86400
+        score += 5 / (1 + age_days / 30) # Up to +5, halving over the first month
+    return score
+
+
+def format_post_summary(index, node, max_caption_len):
+    """One post's block in the prompt (the format _prepare_post_data_for_llm has always used)."""
+    shortcode = node.get('shortcode', 'N/A')
+    typename = node.get('__typename', 'UnknownType')
+    timestamp = node.get('taken_at_timestamp')
+    dt_object = datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp else None
+    formatted_time = dt_object.strftime('%Y-%m-%d %H:%M:%S %Z') if dt_object else "No Timestamp"
+
+    caption_text = _caption(node)
+    truncated_caption = (caption_text[:max_caption_len] + '...') if len(caption_text) > max_caption_len else caption_text
+
+    likes = node.get('edge_liked_by', {}).get('count', 0)
+    comments = node.get('edge_media_to_comment', {}).get('count', 0)
+    views = node.get('video_view_count') # None if not a video or not present
+
+    summary = f"  Post {index} ({shortcode}, {typename}, {formatted_time}):\n"
+    summary += f"    Likes: {likes}, Comments: {comments}"
+    if views is not None:
+        summary += f", Views: {views}"
+    summary += f"\n    Caption: \"{truncated_caption}\"\n"
+    return summary
+
+
+def build_post_summary(post_edges, token_budget, max_caption_len=200):
+    """Fills token_budget with the most informative posts. Returns (summary_text, stats).
+
+    Posts are ranked by score_post() and added greedily; a post that doesn't fit
+    with its full caption is retried with the caption cut to what's left (down to
+    MIN_CAPTION_LEN). Selected posts are listed in their original feed order.
+    stats records how many posts were considered and included and the estimated
+    tokens used, so callers can log coverage against the budget.
+    """
+    nodes = [edge.get('node', {}) for edge in post_edges or [] if edge.get('node')]
+    stats = {"token_budget": token_budget, "posts_available": len(nodes), "posts_included": 0, "estimated_tokens": 0}
+    if not nodes:
+        return "No initial posts data provided.", stats
+
+    newest = max((node.get('taken_at_timestamp') or 0) for node in nodes) or None
+    ranked = sorted(range(len(nodes)), key=lambda i: score_post(nodes[i], newest), reverse=True)
+
+    header_reserve = estimate_tokens(f"Summary of {len(nodes)} posts selected from {len(nodes)} by informativeness (within a {token_budget}-token budget):\n")
+    remaining = token_budget - header_reserve
+    chosen = {} # original position -> caption length used
+    for position in ranked:
+        node = nodes[position]
+        cost = estimate_tokens(format_post_summary(position + 1, node, max_caption_len))
+        caption_len = max_caption_len
+        if cost > remaining:
+            # Retry with the caption cut down to whatever budget is left
+            overhead = cost - estimate_tokens(_caption(node)[:max_caption_len])
+            caption_len = min(max_caption_len, (remaining - overhead) * CHARS_PER_TOKEN)
+            if caption_len < MIN_CAPTION_LEN:
+                continue
+            cost = estimate_tokens(format_post_summary(position + 1, node, caption_len))
+            if cost > remaining:
+                continue
+        chosen[position] = caption_len
+        remaining -= cost
+
+    blocks = [format_post_summary(number, nodes[position], chosen[position])
+              for number, position in enumerate(sorted(chosen), start=1)]
+    header = (f"Summary of {len(chosen)} posts selected from {len(nodes)} by informativeness "
+              f"(within a {token_budget}-token budget):\n")
+    text = header + "\n".join(blocks)
+    stats.update(posts_included=len(chosen), estimated_tokens=estimate_tokens(text))
+    return text, stats
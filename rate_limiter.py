@@ -0,0 +1,123 @@
+import os
+import random
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# --- Constants ---
+REQUEST_DELAY_SECONDS = 2 # Initial delay between pages; the rate limiter adapts it from here
+MIN_REQUEST_DELAY_SECONDS = float(os.getenv("MIN_REQUEST_DELAY_SECONDS", "0.5"))
+MAX_REQUEST_DELAY_SECONDS = float(os.getenv("MAX_REQUEST_DELAY_SECONDS", "30"))
+
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (delta-seconds or HTTP-date) into seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket whose refill interval adapts to server health.
+
+    Each acquire() takes one token; tokens refill at one per `delay` seconds up to
+    `burst`. Healthy responses shrink the delay towards min_delay, while throttling
+    (429/5xx) grows it and blocks all callers for an exponential backoff with
+    jitter, or for the server's Retry-After if that is longer.
+    """
+
+    def __init__(self, initial_delay=2.0, min_delay=0.5, max_delay=30.0, burst=1,
+                 speedup=0.85, slowdown=2.0, backoff_base=2.0, backoff_cap=300.0, jitter=0.5):
+        self.delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.burst = burst
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.jitter = jitter
+        self._tokens = float(burst) # Start full so the first request goes out immediately
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_failures = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # Caller must hold self._lock
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed / self.delay)
+        self._last_refill = now
+
+    def _try_acquire(self):
+        """Takes a token and returns 0, or returns the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._blocked_until - now
+            if wait <= 0:
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return 0.0
+                wait = (1 - self._tokens) * self.delay
+            return wait
+
+    def acquire(self):
+        """Blocks until a request may be sent. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits without blocking the event loop."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        """Records a healthy response and shortens the delay between requests."""
+        with self._lock:
+            self._consecutive_failures = 0
+            self.delay = max(self.min_delay, self.delay * self.speedup)
+
+    def on_throttle(self, retry_after=None):
+        """Records a 429/5xx or network failure. Returns the backoff applied, in seconds."""
+        with self._lock:
+            self._consecutive_failures += 1
+            self.delay = min(self.max_delay, self.delay * self.slowdown)
+            backoff = min(self.backoff_cap, self.backoff_base * (2 ** (self._consecutive_failures - 1)))
+            backoff += random.uniform(0, backoff * self.jitter)
+            if retry_after is not None:
+                backoff = max(backoff, retry_after)
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + backoff)
+            self._tokens = 0.0
+            self._last_refill = now
+            return backoff
+
+
+# Shared across every crawl in this process (threaded and async) so concurrent crawls respect one budget
+instagram_rate_limiter = AdaptiveRateLimiter(
+    initial_delay=REQUEST_DELAY_SECONDS,
+    min_delay=MIN_REQUEST_DELAY_SECONDS,
+    max_delay=MAX_REQUEST_DELAY_SECONDS,
+)
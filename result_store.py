@@ -0,0 +1,70 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+# --- Constants ---
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(".cache", "results.sqlite3"))
+# Set RESULT_STORE_DISABLED=1 to stop keeping finished analyses for permalinks
+RESULT_STORE_DISABLED = os.getenv("RESULT_STORE_DISABLED", "").lower() in ("1", "true", "yes")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    context TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_username_created_at ON results (username, created_at);
+"""
+
+
+class ResultStore:
+    """Finished analyses (the results.html context) by result ID, so permalinks outlive the job queue.
+
+    Results are written once and never change, which is what lets rendered
+    pages be cached and validated by ETag indefinitely.
+    """
+
+    def __init__(self, path=RESULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # Caller must hold self._lock; the connection is opened lazily on first use
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def save(self, result_id, username, context):
+        """Stores a results.html context under result_id. Returns True if it was written."""
+        try:
+            row = (result_id, username, json.dumps(context, ensure_ascii=False, default=str), time.time())
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO results (id, username, context, created_at) VALUES (?, ?, ?, ?)", row)
+            return True
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Warning: Result store write failed for {username} ({result_id}): {e}")
+            return False
+
+    def get(self, result_id):
+        """Returns {"id", "username", "context", "created_at"} for result_id, or None."""
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM results WHERE id = ?", (result_id,)).fetchone()
+        if row is None:
+            return None
+        result = dict(row)
+        result["context"] = json.loads(result["context"])
+        return result
@@ -3,10 +3,21 @@ import requests
 import json
 import html
 import time # For timestamp
+import threading
 import pytz # For timezone aware timestamp
 from datetime import datetime
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed # For parallelism
+from llm_client import get_llm_client
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from profile_cache import ProfileCache
+from llm_cache import LLMCache, make_cache_key, LLM_CACHE_DISABLED
+from local_store import LocalStore, LOCAL_STORE_DISABLED
+from graph_store import GraphStore, GRAPH_STORE_DISABLED
+from profile_decoder import decode_profile_response
+from stage_metrics import timed, record_llm_usage, PROFILE_LOOKUPS
+from task_control import TaskSpec, run_tasks, OUTCOME_TIMEOUT, OUTCOME_CANCELLED
+from prompt_budget import build_post_summary, format_post_summary, estimate_tokens
+from entity_extractor import extract_entities, merge_entities, LOCAL_ENTITY_EXTRACTION_DISABLED
 
 # Note: Removed functions related to manual pagination (fetch_posts_paginated)
 # as they were unreliable and we are focusing on profile info + LLM analysis of bio.
@@ -17,60 +28,210 @@ from concurrent.futures import ThreadPoolExecutor, as_completed # For parallelis
 API_KEY = os.getenv("OPENROUTER_API_KEY", "")
 DEFAULT_MODEL = "google/gemini-2.5-pro-preview-03-25"
 
-def get_user_info_and_id(username, cookies, headers):
-    """Fetches basic profile info, user ID, and initial post edges if available."""
+# Analysis modes: three separate LLM calls in parallel, or one combined structured call
+ANALYSIS_MODE_PARALLEL = "parallel"
+ANALYSIS_MODE_COMBINED = "combined"
+ANALYSIS_MODES = (ANALYSIS_MODE_PARALLEL, ANALYSIS_MODE_COMBINED)
+DEFAULT_ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", ANALYSIS_MODE_PARALLEL)
+
+# Prompt budgets: estimated input tokens spent on post summaries (0 = first 5 posts, as before)
+# and maximum output tokens requested per task
+POST_SUMMARY_TOKEN_BUDGET = int(os.getenv("POST_SUMMARY_TOKEN_BUDGET", "600"))
+JSON_POST_SUMMARY_TOKEN_BUDGET = int(os.getenv("JSON_POST_SUMMARY_TOKEN_BUDGET", "400"))
+REPORT_MAX_TOKENS = int(os.getenv("REPORT_MAX_TOKENS", "1500"))
+FORENSIC_MAX_TOKENS = int(os.getenv("FORENSIC_MAX_TOKENS", "1500"))
+JSON_MAX_TOKENS = int(os.getenv("JSON_MAX_TOKENS", "7000"))
+# Locally extracted entities listed in the JSON prompt as graph context, per entity type
+ENTITY_PROMPT_LIMIT = int(os.getenv("ENTITY_PROMPT_LIMIT", "20"))
+# Per-task deadlines: past these a task is abandoned and whatever it produced so far is shown.
+# Slow tasks are hedged before their deadline (see task_control.HEDGE_MODEL)
+REPORT_DEADLINE_SECONDS = float(os.getenv("REPORT_DEADLINE_SECONDS", "120"))
+FORENSIC_DEADLINE_SECONDS = float(os.getenv("FORENSIC_DEADLINE_SECONDS", "120"))
+JSON_DEADLINE_SECONDS = float(os.getenv("JSON_DEADLINE_SECONDS", "240"))
+COMBINED_DEADLINE_SECONDS = float(os.getenv("COMBINED_DEADLINE_SECONDS", "300"))
+# Hedge delays used until a task has enough latency samples, near each task's typical duration
+# (the JSON task writes far more tokens, so a shared default would hedge it on almost every call)
+REPORT_HEDGE_DELAY_SECONDS = float(os.getenv("REPORT_HEDGE_DELAY_SECONDS", "45"))
+FORENSIC_HEDGE_DELAY_SECONDS = float(os.getenv("FORENSIC_HEDGE_DELAY_SECONDS", "45"))
+JSON_HEDGE_DELAY_SECONDS = float(os.getenv("JSON_HEDGE_DELAY_SECONDS", "150"))
+COMBINED_HEDGE_DELAY_SECONDS = float(os.getenv("COMBINED_HEDGE_DELAY_SECONDS", "180"))
+
+# Instagram endpoints (shared by the sync scraper and the async fetch engine)
+# Override INSTAGRAM_BASE_URL to point at a local stand-in (see benchmarks/mock_services.py)
+INSTAGRAM_BASE_URL = os.getenv("INSTAGRAM_BASE_URL", "https://www.instagram.com").rstrip("/")
+GRAPHQL_URL = f"{INSTAGRAM_BASE_URL}/graphql/query/"
+MEDIA_QUERY_HASH = "f2405b236d85e8296cf30347c9f08c2a"
+COMMENTS_QUERY_HASH = "bc3296d1ce80a24b1b6e40b1e72903f5"
+DEFAULT_POSTS_PER_PAGE = 12
+
+# Shared Instagram HTTP session settings (connection pool, retries, timeouts)
+INSTAGRAM_POOL_SIZE = int(os.getenv("INSTAGRAM_POOL_SIZE", "10"))
+INSTAGRAM_MAX_RETRIES = int(os.getenv("INSTAGRAM_MAX_RETRIES", "3"))
+INSTAGRAM_BACKOFF_FACTOR = float(os.getenv("INSTAGRAM_BACKOFF_FACTOR", "0.5"))
+INSTAGRAM_TIMEOUT_SECONDS = float(os.getenv("INSTAGRAM_TIMEOUT_SECONDS", "15"))
+
+# Shared cache for successful profile lookups (memory LRU + on-disk JSON)
+profile_cache = ProfileCache()
+# Persistent cache of LLM responses keyed by model/prompt/max_tokens/temperature
+llm_cache = LLMCache()
+# Indexed SQLite store of profiles, posts, tags, comments and analyses (replaces per-user JSON dumps)
+local_store = LocalStore()
+# Persistent network graph merged across every analyzed account
+graph_store = GraphStore()
+
+# --- Shared Instagram HTTP Session ---
+
+_instagram_session = None
+_paced_instagram_session = None
+_instagram_session_lock = threading.Lock()
+
+def _build_instagram_session(max_retries):
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=INSTAGRAM_POOL_SIZE, max_retries=max_retries)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    cookies = prepare_cookies()
+    default_headers = prepare_headers("", cookies)
+    default_headers["referer"] = "https://www.instagram.com/"
+    session.headers.update(default_headers)
+    session.cookies.update(cookies)
+    return session
+
+def get_instagram_session():
+    """Returns the process-wide keep-alive session used for every Instagram request.
+
+    The session pools connections, retries idempotent GETs on connection errors
+    and 5xx responses, and carries default headers/cookies from prepare_headers()
+    and prepare_cookies(). Per-request headers and cookies still take precedence.
+    """
+    global _instagram_session
+    if _instagram_session is not None:
+        return _instagram_session
+    with _instagram_session_lock:
+        if _instagram_session is None:
+            retry = Retry(
+                total=INSTAGRAM_MAX_RETRIES,
+                backoff_factor=INSTAGRAM_BACKOFF_FACTOR,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+                raise_on_status=False, # Let callers see the final response via raise_for_status()
+            )
+            _instagram_session = _build_instagram_session(retry)
+    return _instagram_session
+
+def get_paced_instagram_session():
+    """Like get_instagram_session(), but the adapter never retries.
+
+    For callers that pace requests through a rate limiter and retry themselves
+    (iter_post_pages): adapter retries, and their Retry-After sleeps, would
+    happen outside the limiter and multiply the requests made per page.
+    """
+    global _paced_instagram_session
+    if _paced_instagram_session is not None:
+        return _paced_instagram_session
+    with _instagram_session_lock:
+        if _paced_instagram_session is None:
+            _paced_instagram_session = _build_instagram_session(0)
+    return _paced_instagram_session
+
+def instagram_get(url, headers=None, cookies=None, timeout=INSTAGRAM_TIMEOUT_SECONDS, paced=False, **kwargs):
+    """GETs an Instagram URL through the shared session (the no-retry one if paced)."""
+    session = get_paced_instagram_session() if paced else get_instagram_session()
+    return session.get(url, headers=headers, cookies=cookies, timeout=timeout, **kwargs)
+
+def profile_url(username):
+    """URL of the web_profile_info endpoint for username."""
+    return f"{INSTAGRAM_BASE_URL}/api/v1/users/web_profile_info/?username={username}"
+
+def profile_http_error_message(status_code):
+    """Maps a web_profile_info HTTP status to the error message shown to users."""
+    if status_code == 404:
+        return "Profile not found (404 Error)"
+    elif status_code == 401 or status_code == 403:
+         return "Unauthorized or Forbidden (401/403 Error) - Check cookies/login"
+    elif status_code == 429:
+         return "Rate Limited (429 Error) - Wait before trying again"
+    return f"HTTP Error: {status_code}"
+
+def parse_profile_response(username, data):
+    """Extracts (user_id, basic_info, post_edges, error) from a decoded web_profile_info payload.
+
+    Successful results are stored in profile_cache.
+    """
+    # --- Added line to print the raw JSON response ---
+    # print("--- Raw JSON Response from web_profile_info ---:")
+    # print(json.dumps(data, indent=2)) # Temporarily commented out for cleaner logs
+    # print("-----------------------------------------------")
+    user_data = data.get('data', {}).get('user', {})
+    if not user_data:
+        print(f"Error: Could not find 'user' object in profile info for {username}")
+        return None, None, None, "User object not found in response"
+
+    user_id = user_data.get('id')
+    if not user_id:
+        print(f"Error: Could not extract user ID for {username}")
+        return None, None, None, "User ID not found in response"
+
+    basic_info = {
+        'full_name': user_data.get('full_name'),
+        'biography': user_data.get('biography'),
+        'followers_count': user_data.get('edge_followed_by', {}).get('count'),
+        'following_count': user_data.get('edge_follow', {}).get('count'),
+        'is_private': user_data.get('is_private'),
+        'is_verified': user_data.get('is_verified'),
+        # Add profile pic URL if needed
+        'profile_pic_url': user_data.get('profile_pic_url_hd') or user_data.get('profile_pic_url')
+    }
+
+    # --- Extract initial post edges --- 
+    post_edges = user_data.get('edge_owner_to_timeline_media', {}).get('edges', [])
+    post_count = user_data.get('edge_owner_to_timeline_media', {}).get('count', 0)
+    if post_edges:
+         print(f"Successfully fetched info for User ID: {user_id}. Found {len(post_edges)} initial post edges (out of {post_count}).")
+    else:
+         print(f"Successfully fetched info for User ID: {user_id}. No initial post edges found in this response (Total posts: {post_count}).")
+
+    # Only successful lookups are cached; errors are always retried
+    profile_cache.set(username, {"user_id": user_id, "basic_info": basic_info, "post_edges": post_edges})
+    if not LOCAL_STORE_DISABLED:
+        local_store.upsert_profile(username, user_id, basic_info)
+    return user_id, basic_info, post_edges, None # Return posts and None for error on success
+
+def get_cached_profile(username):
+    """Returns the cached (user_id, basic_info, post_edges, None) tuple, or None on a miss."""
+    cached = profile_cache.get(username)
+    if cached is None:
+        return None
+    print(f"Using cached profile info for {username}.")
+    PROFILE_LOOKUPS.inc(source="cache")
+    return cached["user_id"], cached["basic_info"], cached["post_edges"], None
+
+def get_user_info_and_id(username, cookies, headers, force_refresh=False):
+    """Fetches basic profile info, user ID, and initial post edges if available.
+
+    Successful lookups are served from profile_cache until they expire; pass
+    force_refresh=True to bypass the cache and fetch from Instagram.
+    """
+    if not force_refresh:
+        cached = get_cached_profile(username)
+        if cached is not None:
+            return cached
+
     # Reuse the existing function, ensure it returns None, None on specific errors
-    url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
+    url = profile_url(username)
     print(f"Fetching user info for {username}...") # Log start
+    PROFILE_LOOKUPS.inc(source="network")
     try:
-        response = requests.get(url, headers=headers, cookies=cookies, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        # --- Added line to print the raw JSON response ---
-        # print("--- Raw JSON Response from web_profile_info ---:")
-        # print(json.dumps(data, indent=2)) # Temporarily commented out for cleaner logs
-        # print("-----------------------------------------------")
-        user_data = data.get('data', {}).get('user', {})
-        if not user_data:
-            print(f"Error: Could not find 'user' object in profile info for {username}")
-            return None, None, None, "User object not found in response"
-
-        user_id = user_data.get('id')
-        if not user_id:
-            print(f"Error: Could not extract user ID for {username}")
-            return None, None, None, "User ID not found in response"
-
-        basic_info = {
-            'full_name': user_data.get('full_name'),
-            'biography': user_data.get('biography'),
-            'followers_count': user_data.get('edge_followed_by', {}).get('count'),
-            'following_count': user_data.get('edge_follow', {}).get('count'),
-            'is_private': user_data.get('is_private'),
-            'is_verified': user_data.get('is_verified'),
-            # Add profile pic URL if needed
-            'profile_pic_url': user_data.get('profile_pic_url_hd') or user_data.get('profile_pic_url')
-        }
-
-        # --- Extract initial post edges --- 
-        post_edges = user_data.get('edge_owner_to_timeline_media', {}).get('edges', [])
-        post_count = user_data.get('edge_owner_to_timeline_media', {}).get('count', 0)
-        if post_edges:
-             print(f"Successfully fetched info for User ID: {user_id}. Found {len(post_edges)} initial post edges (out of {post_count}).")
-        else:
-             print(f"Successfully fetched info for User ID: {user_id}. No initial post edges found in this response (Total posts: {post_count}).")
-
-        return user_id, basic_info, post_edges, None # Return posts and None for error on success
+        with timed("profile_fetch"):
+            response = instagram_get(url, headers=headers, cookies=cookies, timeout=15)
+            response.raise_for_status()
+            data = decode_profile_response(response.content) # Decodes only the fields and post edges we use
+        return parse_profile_response(username, data)
 
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error fetching initial profile info for {username}: {http_err}")
-        status_code = http_err.response.status_code
-        error_msg = f"HTTP Error: {status_code}"
-        if status_code == 404:
-            error_msg = "Profile not found (404 Error)"
-        elif status_code == 401 or status_code == 403:
-             error_msg = "Unauthorized or Forbidden (401/403 Error) - Check cookies/login"
-        elif status_code == 429:
-             error_msg = "Rate Limited (429 Error) - Wait before trying again"
+        error_msg = profile_http_error_message(http_err.response.status_code)
         # Optionally log response text for debugging other errors
         # print(f"Response text: {http_err.response.text[:500]}...")
         return None, None, None, error_msg # Return None for posts on error
@@ -86,40 +247,53 @@ def get_user_info_and_id(username, cookies, headers):
         return None, None, None, f"Unexpected Error: {e.__class__.__name__}" # Return None for posts on error
 
 # ----- NEW HELPER FUNCTION -----
-def _prepare_post_data_for_llm(post_edges, max_posts=5, max_caption_len=200):
-    """Extracts key info from post edges and formats it as a string for LLM prompts."""
+def _prepare_post_data_for_llm(post_edges, max_posts=5, max_caption_len=200, token_budget=None, stats=None):
+    """Extracts key info from post edges and formats it as a string for LLM prompts.
+
+    With token_budget, the most informative posts are chosen to fill that many
+    estimated tokens (see prompt_budget.build_post_summary) instead of taking the
+    first max_posts. If stats is a dict, it receives the selection statistics.
+    """
+    if token_budget and token_budget > 0:
+        summary, summary_stats = build_post_summary(post_edges, token_budget, max_caption_len)
+        if stats is not None:
+            stats.update(summary_stats)
+        return summary
+
     if not post_edges:
         return "No initial posts data provided."
 
-    post_summaries = []
     limited_edges = post_edges[:max_posts] # Limit number of posts
-
-    for i, edge in enumerate(limited_edges):
-        node = edge.get('node', {})
-        shortcode = node.get('shortcode', 'N/A')
-        typename = node.get('__typename', 'UnknownType')
-        timestamp = node.get('taken_at_timestamp')
-        dt_object = datetime.fromtimestamp(timestamp, tz=pytz.utc) if timestamp else None
-        formatted_time = dt_object.strftime('%Y-%m-%d %H:%M:%S %Z') if dt_object else "No Timestamp"
-
-        caption_node = node.get('edge_media_to_caption', {}).get('edges', [{}])[0].get('node', {})
-        caption_text = caption_node.get('text', '')
-        truncated_caption = (caption_text[:max_caption_len] + '...') if len(caption_text) > max_caption_len else caption_text
-
-        likes = node.get('edge_liked_by', {}).get('count', 0)
-        comments = node.get('edge_media_to_comment', {}).get('count', 0)
-        views = node.get('video_view_count') # None if not a video or not present
-
-        summary = f"  Post {i+1} ({shortcode}, {typename}, {formatted_time}):\n"
-        summary += f"    Likes: {likes}, Comments: {comments}"
-        if views is not None:
-            summary += f", Views: {views}"
-        summary += f"\n    Caption: \"{truncated_caption}\"\n"
-        post_summaries.append(summary)
+    post_summaries = [format_post_summary(i + 1, edge.get('node', {}), max_caption_len) for i, edge in enumerate(limited_edges)]
 
     header = f"Summary of the first {len(limited_edges)} posts (out of {len(post_edges)} initially retrieved):\n"
+    if stats is not None:
+        stats.update(token_budget=None, posts_available=len(post_edges), posts_included=len(limited_edges))
     return header + "\n".join(post_summaries)
 
+def _budgeted_post_summary(post_edges, token_budget, usage=None, max_caption_len=200):
+    """Post summary within token_budget; the selection stats go to usage["post_summary"]."""
+    stats = {}
+    summary = _prepare_post_data_for_llm(post_edges, max_caption_len=max_caption_len, token_budget=token_budget, stats=stats)
+    if usage is not None:
+        usage["post_summary"] = stats
+    return summary
+
+def _local_entities(biography_text, post_edges, task):
+    """Pattern-matched entity_extraction fields from the bio and all captions (None when disabled)."""
+    if LOCAL_ENTITY_EXTRACTION_DISABLED:
+        return None
+    with timed("entity_extraction", task):
+        return extract_entities(biography_text, post_edges)
+
+def _entity_context(entities):
+    """Prompt block listing the local entities compactly, so the LLM can still link them in the graph."""
+    if entities is None:
+        return ""
+    listed = {field: values[:ENTITY_PROMPT_LIMIT] for field, values in entities.items() if values}
+    return ("**Pre-extracted Entities (bio + all post captions; use them for graph nodes, do not repeat them in `entity_extraction`):**\n"
+            + (json.dumps(listed, ensure_ascii=False) if listed else "None found.") + "\n")
+
 # --- Original extract_graph_data_llm removed as JSON generation is handled by extract_json_data_llm ---
 
 # Helper to prepare headers (moved from old main)
@@ -162,128 +336,157 @@ def prepare_cookies():
         "csrftoken": csrf_token_val,
     } 
 
+class LLMCancelled(Exception):
+    """An LLM call was abandoned (deadline passed, lost a hedge race or the client went away)."""
+
+
 # Helper function to make a single LLM call
-def _call_llm(api_key, model, prompt, max_tokens, temperature):
-    """Makes a call to the OpenRouter API."""
+def _call_llm(api_key, model, prompt, max_tokens, temperature, use_cache=True, stream_callback=None, usage=None,
+              cancel=None, timeout=None):
+    """Makes a call to the OpenRouter API.
+
+    Identical calls are answered from llm_cache; pass use_cache=False (or set
+    LLM_CACHE_DISABLED) to always hit the API. Errors are never cached.
+    If stream_callback is given, the response is streamed and stream_callback(text)
+    is called with each chunk as it arrives (or once with a cached response).
+    If usage is a dict, it is filled with token counts and wall-clock time, and
+    with "error" if the call failed.
+    If cancel (a task_control.CancelToken) is given, the response is always
+    streamed so that cancelling closes the connection mid-generation; timeout
+    (seconds) caps each network wait, including the wait for the first token.
+    """
+    start_time = time.time()
+    if usage is not None:
+        usage.update({"model": model, "prompt_tokens": None, "completion_tokens": None,
+                      "total_tokens": None, "cached": False, "wall_seconds": None,
+                      "estimated_prompt_tokens": estimate_tokens(prompt), "max_tokens": max_tokens})
+    use_cache = use_cache and not LLM_CACHE_DISABLED
+    cache_key = make_cache_key(model, prompt, max_tokens, temperature) if use_cache else None
+    if use_cache:
+        cached_response = llm_cache.get(cache_key)
+        if cached_response is not None:
+            print(f"  Using cached LLM response ({model}, key {cache_key[:12]}).")
+            if stream_callback:
+                stream_callback(cached_response)
+            if usage is not None:
+                # Nothing was sent to the API, so no tokens were spent
+                usage.update({"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached": True,
+                              "wall_seconds": round(time.time() - start_time, 3)})
+            return cached_response
     try:
-        client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        response = completion.choices[0].message.content.strip()
+        if cancel is not None and cancel.cancelled:
+            raise LLMCancelled(cancel.reason)
+        client = get_llm_client(api_key) # Shared, pooled client
+        if timeout is not None:
+            client = client.with_options(timeout=timeout) # Shares the pooled HTTP client
+        if stream_callback or cancel is not None:
+            stream = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True} # Final chunk carries token usage
+            )
+            if cancel is not None:
+                # Closing the stream aborts a blocked read, so cancellation needn't wait for the next chunk
+                cancel.on_cancel(stream.close)
+            chunks = []
+            api_usage = None
+            for chunk in stream:
+                if cancel is not None and cancel.cancelled:
+                    raise LLMCancelled(cancel.reason)
+                if getattr(chunk, "usage", None):
+                    api_usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    if stream_callback:
+                        stream_callback(delta)
+            if cancel is not None and cancel.cancelled:
+                raise LLMCancelled(cancel.reason)
+            response = "".join(chunks).strip()
+        else:
+            completion = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            response = completion.choices[0].message.content.strip()
+            api_usage = completion.usage
+        if usage is not None:
+            if api_usage is not None:
+                usage.update({"prompt_tokens": api_usage.prompt_tokens,
+                              "completion_tokens": api_usage.completion_tokens,
+                              "total_tokens": api_usage.total_tokens})
+            usage["wall_seconds"] = round(time.time() - start_time, 3)
         # Basic cleaning (can be done per-function if needed)
         if response.startswith("```json"):
              response = response.strip("```json\n `")
         elif response.startswith("```"):
              response = response.strip("```\n `")
+        if use_cache:
+            llm_cache.set(cache_key, model, response)
         return response
     except Exception as e:
-        print(f"LLM call failed: {e}")
+        if cancel is not None and cancel.cancelled and not isinstance(e, LLMCancelled):
+            e = LLMCancelled(cancel.reason) # The read failed because the stream was closed under it
+        if isinstance(e, LLMCancelled):
+            print(f"LLM call cancelled ({model}): {e}")
+        else:
+            print(f"LLM call failed: {e}")
+        error = f"{e.__class__.__name__}: {str(e)}"
+        if usage is not None:
+            usage["wall_seconds"] = round(time.time() - start_time, 3)
+            usage["error"] = error
         # Return a clear error indicator string
-        return f"LLM_ERROR: {e.__class__.__name__}: {str(e)}"
+        return f"LLM_ERROR: {error}"
 
-# --- Specific Analysis Functions ---
+# --- Shared Prompt Sections ---
+# Used by both the per-task prompts and the combined single-call prompt
 
-def generate_report_llm(api_key, username, biography_text, post_edges): # Added post_edges
-    """Generates the narrative reconnaissance report, incorporating post data."""
-    model = DEFAULT_MODEL
-    max_tokens = 1500 # Increased tokens for post analysis
-    temperature = 0.5
-
-    # Prepare post data summary
-    post_summary = _prepare_post_data_for_llm(post_edges)
-
-    report_prompt = f"""**Task:** Generate an "Initial Profile Reconnaissance" report based on the provided Instagram username, biography text, AND summary of recent posts. Output ONLY plain text.
-
-**Username Context:** {username}
-**Biography Text:** "{biography_text}"
-
-**Recent Post Summary:**
-{post_summary}
-
-**Report Structure (Use Plain Text Headings/Lists):**
-1.  Profile Overview: Briefly mention the username ({username}).
+def _report_sections(username):
+    """Numbered section list for the narrative reconnaissance report."""
+    return f"""1.  Profile Overview: Briefly mention the username ({username}).
 2.  Biography Summary: Summarize the key themes, stated purpose, or activities mentioned in the biography text (2-4 sentences). If empty or nonsensical, state that.
 3.  Recent Activity Analysis: Based *only* on the 'Recent Post Summary' provided above, summarize the apparent themes, topics, or types of content from the recent posts (2-4 sentences). Mention any notable patterns (e.g., frequent video posts, specific topics in captions). If no posts provided, state that.
 4.  Sentiment Analysis: State the inferred overall sentiment considering *both* the biography text *and* the tone of recent post captions (Positive, Negative, Neutral, Mixed, or Not Applicable).
 5.  Key Information Extraction: List any explicitly mentioned key entities (locations, organizations, projects, skills, @mentions, #hashtags) identified *in the bio text OR in the provided post captions*. If none, state "No specific entities mentioned in bio or recent posts." Use simple list format.
 6.  Potential Interests (Inferred): Briefly mention 1-3 potential high-level interests that *might* be inferred *speculatively* from the bio, username, *or recent post content*, clearly labeling them as speculative (e.g., "Potential interest in [topic] based on post captions about X."). If none inferred, state "No specific interests could be reasonably inferred."
-7.  Concluding Remark: Add a brief concluding sentence (e.g., "Analysis based on provided bio and summary of recent posts.").
+7.  Concluding Remark: Add a brief concluding sentence (e.g., "Analysis based on provided bio and summary of recent posts.")."""
 
-**Output:** Generate ONLY the plain text report. **Do NOT use any markdown formatting (no asterisks, no hashes, no markdown lists).** Use simple line breaks for structure. Address all sections.
-"""
-    print("Generating narrative report (with post data)...")
-    report_text = _call_llm(api_key, model, report_prompt, max_tokens, temperature)
-    if report_text.startswith("LLM_ERROR"):
-         print(f"  Report generation failed: {report_text}")
-         return f"Failed to generate report: {report_text}"
-    print("  Report generation successful.")
-    return report_text
-
-def generate_forensic_analysis_llm(api_key, username, biography_text, post_edges): # Added post_edges
-    """Generates text notes highlighting potential forensic points of interest from bio and posts."""
-    model = DEFAULT_MODEL
-    max_tokens = 1500 # Increased tokens for post analysis
-    temperature = 0.4
-
-    # Prepare post data summary
-    post_summary = _prepare_post_data_for_llm(post_edges)
-
-    forensic_prompt = f"""**Task:** Analyze the provided Instagram biography text AND recent post summary *strictly* for potential digital forensic points of interest. Focus *only* on patterns and explicit mentions within the text provided. **Do not make assumptions beyond the text.** Output ONLY plain text.
-
-**Biography Text:** "{biography_text}"
-
-**Recent Post Summary:**
-{post_summary}
-
-**Analysis Points (Use Plain Text Headings/Lists):**
-1.  Potential PII Indicators: Identify any patterns that *might resemble* PII (e.g., email format, phone patterns, specific location names) mentioned explicitly *in the bio OR the provided post captions*. Note the *presence* of the pattern/mention. If none, state "No direct PII pattern indicators identified in bio or recent post captions."
+FORENSIC_ANALYSIS_POINTS = """1.  Potential PII Indicators: Identify any patterns that *might resemble* PII (e.g., email format, phone patterns, specific location names) mentioned explicitly *in the bio OR the provided post captions*. Note the *presence* of the pattern/mention. If none, state "No direct PII pattern indicators identified in bio or recent post captions."
 2.  Explicitly Mentioned Locations: List any specific cities, states, countries, landmarks, or geotagged locations mentioned *in the bio OR post captions/data*. If none, state "No locations mentioned." Use simple list format.
 3.  Explicit Mentions/Connections: List any other usernames (@mentions), specific websites (URLs), or #hashtags found directly *in the bio or post captions*. If none, state "No external usernames, URLs, or hashtags mentioned." Use simple list format.
 4.  Keywords/Themes of Interest: List 3-5 key terms, concepts, or topics directly present *in the bio or post captions* that might be relevant for further investigation (e.g., specific tech, projects, orgs, events, sentiments). If none, state "No specific keywords/themes identified." Use simple list format.
 5.  Posting Activity Notes: Briefly comment on the posting times or frequency *if discernible from the provided timestamps* (e.g., "Posts mainly during UTC evenings", "Apparent gap in posting"). If timestamps are unavailable or insufficient, state "Posting activity patterns not analyzed."
-6.  Language/Tone Notes: Briefly comment if the language used *in the bio or posts* seems unusual, coded, highly technical, or noteworthy in tone (optional, only if prominent).
+6.  Language/Tone Notes: Briefly comment if the language used *in the bio or posts* seems unusual, coded, highly technical, or noteworthy in tone (optional, only if prominent)."""
 
-**Output:** Generate ONLY the analysis notes as plain text. Use simple headings (e.g., "1. Potential PII Indicators:") and simple lists (e.g., "- Item"). **Do NOT use any markdown formatting.** State clearly if no relevant information was found for a point. Emphasize that findings are based solely on the provided text and post summary.
+_LLM_ENTITY_FIELDS = """    "mentions": ["list", "of", "strings"],
+    "hashtags": ["list", "of", "strings"],
+    "urls": ["list", "of", "strings"],
+    "emails": ["list", "of", "strings"],
+    "phone_numbers": ["list", "of", "strings"],
 """
-    print("Generating forensic notes (with post data)...")
-    forensic_text = _call_llm(api_key, model, forensic_prompt, max_tokens, temperature)
-    if forensic_text.startswith("LLM_ERROR"):
-         print(f"  Forensic note generation failed: {forensic_text}")
-         return f"Failed to generate forensic notes: {forensic_text}"
-    print("  Forensic note generation successful.")
-    return forensic_text
-
-
-def extract_json_data_llm(api_key, username, biography_text, post_edges): # Added post_edges
-    """Generates the structured forensic JSON data, incorporating post analysis."""
-    model = DEFAULT_MODEL
-    max_tokens = 7000 # INCREASED tokens significantly for post details + analysis
-    temperature = 0.5
-
-    timestamp = datetime.now(pytz.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-    escaped_bio = json.dumps(biography_text) # Escape bio text for safe JSON embedding
 
-    # --- Prepare detailed post data for JSON output ---
-    # (This is done by the LLM based on instructions below, but we need the prompt structure)
-    # We also pass the summary to the LLM for context
-    post_summary_for_prompt = _prepare_post_data_for_llm(post_edges, max_posts=5, max_caption_len=150) # Shorter summary for prompt context
-
-    # Revised JSON prompt with post analysis integration
-    json_prompt = f"""**Task:** Perform a detailed forensic analysis of the provided Instagram username, biography, AND recent post summary. Extract structured data relevant for Social Media Analysis Toolkit (SMAT) investigations. Generate ONLY a single, valid JSON object adhering strictly to the specified structure. Be exhaustive and inventive, incorporating information from BOTH bio and posts.
-
-**Username:** "{username}"
-**Biography Text:** {escaped_bio} // Biography text is pre-escaped for JSON
-**Recent Post Summary (Context for LLM):**
-{post_summary_for_prompt} // This is a summary; use it AND your general knowledge to interpret potential post content.
-
-**JSON Output Structure:**
-{{
+def _forensic_json_structure(username, escaped_bio, model, local_entities=False):
+    """JSON skeleton the LLM must fill in for the structured forensic analysis.
+
+    With local_entities, the pattern-matched entity_extraction fields are left out
+    of the skeleton; entity_extractor fills them in after parsing.
+    """
+    if local_entities:
+        entity_comment = "// Infer from bio AND post captions (mentions, hashtags, URLs, emails, phones are filled in by the tool - do not output them)"
+        entity_fields = ""
+    else:
+        entity_comment = "// Extract from bio AND post captions"
+        entity_fields = _LLM_ENTITY_FIELDS
+    return f"""{{
   "analysis_metadata": {{
-    "timestamp_utc": "{timestamp}",
+    "timestamp_utc": "string (leave empty, filled in by the tool)",
     "model_used": "{model}"
   }},
   "profile_context": {{
@@ -316,13 +519,8 @@ def extract_json_data_llm(api_key, username, biography_text, post_edges): # Adde
     "topics": ["list", "of", "strings (from bio AND posts)"],
     "writing_style_notes": "string (Consider bio and posts)"
   }},
-  "entity_extraction": {{ // Extract from bio AND post captions
-    "mentions": ["list", "of", "strings"],
-    "hashtags": ["list", "of", "strings"],
-    "urls": ["list", "of", "strings"],
-    "emails": ["list", "of", "strings"],
-    "phone_numbers": ["list", "of", "strings"],
-    "locations": ["list", "of", "strings"],
+  "entity_extraction": {{ {entity_comment}
+{entity_fields}    "locations": ["list", "of", "strings"],
     "organizations": ["list", "of", "strings"],
     "persons": ["list", "of", "strings"],
     "technologies_tools": ["list", "of", "strings"],
@@ -359,20 +557,64 @@ def extract_json_data_llm(api_key, username, biography_text, post_edges): # Adde
     "relevant_hashtags_suggested": [ {{ "suggestion": "string", "reasoning": "string" }} ],
     "topics_to_monitor": ["list", "of", "strings"]
   }}
-}}
-
-**Instructions & Constraints:**
-1.  **Analyze BOTH Bio and Post Summary:** Integrate information from both sources throughout the JSON structure.
-2.  **Populate `initial_posts_summary`:** Accurately reflect the provided post summary, extracting key fields and performing LLM analysis (entity/topic detection) *per post*.
-3.  **Enhance Other Sections:** Use post information (captions, timestamps, types) to enrich `linguistic_analysis`, `entity_extraction`, `network_connections_explicit`, `inferred_analysis`, and `threat_indicators_potential`.
-4.  **Inventive Explicit Graph:** Include nodes/edges derived from post content (mentions, topics, activities described in captions) in `network_connections_explicit`. Connect them logically to `profile_owner` or other entities.
-5.  **Populate All Fields:** Use empty lists `[]` or `null`/`"Not Applicable"`.
-6.  **VALID JSON ONLY:** Output MUST be a single, valid JSON object. No extra text.
-
-"""
-    print("Generating structured forensic JSON data (with post analysis)...")
-    json_string = _call_llm(api_key, model, json_prompt, max_tokens, temperature)
-
+}}"""
+
+# --- Forensic JSON Post-Processing ---
+
+FORENSIC_JSON_REQUIRED_KEYS = ["analysis_metadata", "profile_context", "initial_posts_summary", # Added new key check
+                               "linguistic_analysis", "entity_extraction", "network_connections_explicit",
+                               "inferred_analysis", "threat_indicators_potential",
+                               "cross_platform_links_potential", "suggestions_for_investigation"]
+
+def _extract_json_block(text):
+    """Returns the most likely JSON object substring from an LLM response."""
+    # Attempt to find JSON block even if there's surrounding text
+    json_match = None
+    if '```json' in text:
+        json_match = text.split('```json', 1)[1].rsplit('```', 1)[0]
+    elif '{' in text and '}' in text:
+         # Basic heuristic: find first { and last }
+         start = text.find('{')
+         end = text.rfind('}')
+         if start != -1 and end != -1 and end > start:
+              json_match = text[start:end+1]
+
+    if not json_match:
+        # Fallback to trying the whole string if no clear block found
+        json_match = text
+    return json_match
+
+def _validate_forensic_json(analysis_data, username, timestamp, raw_response, entities=None):
+    """Checks required keys, stamps the timestamp and ensures the profile_owner node exists.
+
+    entities, when given, are the locally extracted entity_extraction fields to merge in.
+    """
+    # Basic validation (can be expanded significantly)
+    if not isinstance(analysis_data, dict):
+        return {"error": f"Forensic JSON is not an object ({type(analysis_data).__name__})", "raw_response": raw_response}
+    if entities is not None:
+         merge_entities(analysis_data, entities)
+    if all(key in analysis_data for key in FORENSIC_JSON_REQUIRED_KEYS):
+         if isinstance(analysis_data.get("analysis_metadata"), dict):
+             analysis_data["analysis_metadata"]["timestamp_utc"] = timestamp
+         # Ensure profile_owner node exists
+         graph_data = analysis_data.get("network_connections_explicit", {})
+         nodes = graph_data.get("nodes", [])
+         if not any(node.get("id") == "profile_owner" for node in nodes):
+             print("  Warning: LLM JSON response missing 'profile_owner' node. Adding default.")
+             # Ensure nodes list exists before inserting
+             if analysis_data["network_connections_explicit"].get("nodes") is None:
+                  analysis_data["network_connections_explicit"]["nodes"] = []
+             analysis_data["network_connections_explicit"]["nodes"].insert(0, {"id": "profile_owner", "label": username, "type": "ProfileOwner"})
+
+         return analysis_data
+    missing_keys = [key for key in FORENSIC_JSON_REQUIRED_KEYS if key not in analysis_data]
+    print(f"  Warning: Parsed JSON missing some top-level forensic keys: {missing_keys}")
+    return {"error": f"Parsed JSON missing required forensic keys: {missing_keys}",
+            "raw_response": raw_response} # Include raw response for debugging
+
+def _parse_forensic_json(json_string, username, timestamp, entities=None):
+    """Parses and validates the forensic JSON returned by the LLM, returning an error dict on failure."""
     # Default error structure for JSON
     error_json = {"error": "Unknown JSON processing error"}
 
@@ -382,46 +624,9 @@ def extract_json_data_llm(api_key, username, biography_text, post_edges): # Adde
         return error_json
 
     try:
-        # Attempt to find JSON block even if there's surrounding text
-        json_match = None
-        if '```json' in json_string:
-            json_match = json_string.split('```json', 1)[1].rsplit('```', 1)[0]
-        elif '{' in json_string and '}' in json_string:
-             # Basic heuristic: find first { and last }
-             start = json_string.find('{')
-             end = json_string.rfind('}')
-             if start != -1 and end != -1 and end > start:
-                  json_match = json_string[start:end+1]
-
-        if not json_match:
-            # Fallback to trying the whole string if no clear block found
-            json_match = json_string
-
-        analysis_data = json.loads(json_match)
+        analysis_data = json.loads(_extract_json_block(json_string))
         print("  Successfully parsed forensic JSON data.")
-        # Basic validation (can be expanded significantly)
-        required_keys = ["analysis_metadata", "profile_context", "initial_posts_summary", # Added new key check
-                         "linguistic_analysis", "entity_extraction", "network_connections_explicit",
-                         "inferred_analysis", "threat_indicators_potential",
-                         "cross_platform_links_potential", "suggestions_for_investigation"]
-        if all(key in analysis_data for key in required_keys):
-             # Ensure profile_owner node exists
-             graph_data = analysis_data.get("network_connections_explicit", {})
-             nodes = graph_data.get("nodes", [])
-             if not any(node.get("id") == "profile_owner" for node in nodes):
-                 print("  Warning: LLM JSON response missing 'profile_owner' node. Adding default.")
-                 # Ensure nodes list exists before inserting
-                 if analysis_data["network_connections_explicit"].get("nodes") is None:
-                      analysis_data["network_connections_explicit"]["nodes"] = []
-                 analysis_data["network_connections_explicit"]["nodes"].insert(0, {"id": "profile_owner", "label": username, "type": "ProfileOwner"})
-
-             return analysis_data
-        else:
-            missing_keys = [key for key in required_keys if key not in analysis_data]
-            print(f"  Warning: Parsed JSON missing some top-level forensic keys: {missing_keys}")
-            error_json["error"] = f"Parsed JSON missing required forensic keys: {missing_keys}"
-            error_json["raw_response"] = json_string # Include raw response for debugging
-            return error_json
+        return _validate_forensic_json(analysis_data, username, timestamp, json_string, entities)
 
     except json.JSONDecodeError as e:
         print(f"  Error: Failed to parse LLM response as JSON. {e}")
@@ -436,24 +641,199 @@ def extract_json_data_llm(api_key, username, biography_text, post_edges): # Adde
         return error_json
 
 
+# --- Specific Analysis Functions ---
+
+def generate_report_llm(api_key, username, biography_text, post_edges, stream_callback=None, usage=None,
+                        model=None, cancel=None, timeout=None): # Added post_edges
+    """Generates the narrative reconnaissance report, incorporating post data."""
+    model = model or DEFAULT_MODEL
+    max_tokens = REPORT_MAX_TOKENS
+    temperature = 0.5
+
+    # Prepare post data summary
+    post_summary = _budgeted_post_summary(post_edges, POST_SUMMARY_TOKEN_BUDGET, usage)
+
+    report_prompt = f"""**Task:** Generate an "Initial Profile Reconnaissance" report based on the provided Instagram username, biography text, AND summary of recent posts. Output ONLY plain text.
+
+**Username Context:** {username}
+**Biography Text:** "{biography_text}"
+
+**Recent Post Summary:**
+{post_summary}
+
+**Report Structure (Use Plain Text Headings/Lists):**
+{_report_sections(username)}
+
+**Output:** Generate ONLY the plain text report. **Do NOT use any markdown formatting (no asterisks, no hashes, no markdown lists).** Use simple line breaks for structure. Address all sections.
+"""
+    print("Generating narrative report (with post data)...")
+    report_text = _call_llm(api_key, model, report_prompt, max_tokens, temperature, stream_callback=stream_callback, usage=usage,
+                            cancel=cancel, timeout=timeout)
+    if report_text.startswith("LLM_ERROR"):
+         print(f"  Report generation failed: {report_text}")
+         return f"Failed to generate report: {report_text}"
+    print("  Report generation successful.")
+    return report_text
+
+def generate_forensic_analysis_llm(api_key, username, biography_text, post_edges, stream_callback=None, usage=None,
+                                   model=None, cancel=None, timeout=None): # Added post_edges
+    """Generates text notes highlighting potential forensic points of interest from bio and posts."""
+    model = model or DEFAULT_MODEL
+    max_tokens = FORENSIC_MAX_TOKENS
+    temperature = 0.4
+
+    # Prepare post data summary
+    post_summary = _budgeted_post_summary(post_edges, POST_SUMMARY_TOKEN_BUDGET, usage)
+
+    forensic_prompt = f"""**Task:** Analyze the provided Instagram biography text AND recent post summary *strictly* for potential digital forensic points of interest. Focus *only* on patterns and explicit mentions within the text provided. **Do not make assumptions beyond the text.** Output ONLY plain text.
+
+**Biography Text:** "{biography_text}"
+
+**Recent Post Summary:**
+{post_summary}
+
+**Analysis Points (Use Plain Text Headings/Lists):**
+{FORENSIC_ANALYSIS_POINTS}
+
+**Output:** Generate ONLY the analysis notes as plain text. Use simple headings (e.g., "1. Potential PII Indicators:") and simple lists (e.g., "- Item"). **Do NOT use any markdown formatting.** State clearly if no relevant information was found for a point. Emphasize that findings are based solely on the provided text and post summary.
+"""
+    print("Generating forensic notes (with post data)...")
+    forensic_text = _call_llm(api_key, model, forensic_prompt, max_tokens, temperature, stream_callback=stream_callback, usage=usage,
+                              cancel=cancel, timeout=timeout)
+    if forensic_text.startswith("LLM_ERROR"):
+         print(f"  Forensic note generation failed: {forensic_text}")
+         return f"Failed to generate forensic notes: {forensic_text}"
+    print("  Forensic note generation successful.")
+    return forensic_text
+
+
+def extract_json_data_llm(api_key, username, biography_text, post_edges, usage=None,
+                          model=None, cancel=None, timeout=None): # Added post_edges
+    """Generates the structured forensic JSON data, incorporating post analysis."""
+    model = model or DEFAULT_MODEL
+    max_tokens = JSON_MAX_TOKENS # Large: per-post details + full analysis structure
+    temperature = 0.5
+
+    # Timestamp is stamped onto the parsed result rather than embedded in the prompt,
+    # so identical inputs produce identical prompts and can be served from llm_cache
+    timestamp = datetime.now(pytz.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    escaped_bio = json.dumps(biography_text) # Escape bio text for safe JSON embedding
+
+    # --- Prepare detailed post data for JSON output ---
+    # (This is done by the LLM based on instructions below, but we need the prompt structure)
+    # We also pass the summary to the LLM for context
+    post_summary_for_prompt = _budgeted_post_summary(post_edges, JSON_POST_SUMMARY_TOKEN_BUDGET, usage, max_caption_len=150) # Shorter summary for prompt context
+    # Mentions, hashtags, URLs, emails and phones come from regexes over bio + all captions, not the LLM
+    entities = _local_entities(biography_text, post_edges, "json_data")
+
+    # Revised JSON prompt with post analysis integration
+    json_prompt = f"""**Task:** Perform a detailed forensic analysis of the provided Instagram username, biography, AND recent post summary. Extract structured data relevant for Social Media Analysis Toolkit (SMAT) investigations. Generate ONLY a single, valid JSON object adhering strictly to the specified structure. Be exhaustive and inventive, incorporating information from BOTH bio and posts.
+
+**Username:** "{username}"
+**Biography Text:** {escaped_bio} // Biography text is pre-escaped for JSON
+**Recent Post Summary (Context for LLM):**
+{post_summary_for_prompt} // This is a summary; use it AND your general knowledge to interpret potential post content.
+{_entity_context(entities)}
+**JSON Output Structure:**
+{_forensic_json_structure(username, escaped_bio, model, local_entities=entities is not None)}
+
+**Instructions & Constraints:**
+1.  **Analyze BOTH Bio and Post Summary:** Integrate information from both sources throughout the JSON structure.
+2.  **Populate `initial_posts_summary`:** Accurately reflect the provided post summary, extracting key fields and performing LLM analysis (entity/topic detection) *per post*.
+3.  **Enhance Other Sections:** Use post information (captions, timestamps, types) to enrich `linguistic_analysis`, `entity_extraction`, `network_connections_explicit`, `inferred_analysis`, and `threat_indicators_potential`.
+4.  **Inventive Explicit Graph:** Include nodes/edges derived from post content (mentions, topics, activities described in captions) in `network_connections_explicit`. Connect them logically to `profile_owner` or other entities.
+5.  **Populate All Fields:** Use empty lists `[]` or `null`/`"Not Applicable"`.
+6.  **VALID JSON ONLY:** Output MUST be a single, valid JSON object. No extra text.
+
+"""
+    print("Generating structured forensic JSON data (with post analysis)...")
+    json_string = _call_llm(api_key, model, json_prompt, max_tokens, temperature, usage=usage, cancel=cancel, timeout=timeout)
+
+    with timed("json_postprocess", "json_data"):
+        return _parse_forensic_json(json_string, username, timestamp, entities)
+
+
 # --- Main Function for Parallel Execution ---
 
-def run_all_analyses_parallel(username, biography_text, post_edges): # Added post_edges
-    """Runs the three LLM analysis functions in parallel, incorporating post data."""
+def _missing_api_key_results():
+    print("CRITICAL ERROR: OPENROUTER_API_KEY environment variable is not set.")
+    print("Please set it before running the script: ")
+    print("  export OPENROUTER_API_KEY='your-api-key'     # For Linux/macOS")
+    print("  set OPENROUTER_API_KEY=your-api-key          # For Windows cmd")
+    print("  $env:OPENROUTER_API_KEY='your-api-key'       # For Windows PowerShell")
+    return {
+        "report": "API Key Missing. Cannot run analysis. Please set the OPENROUTER_API_KEY environment variable.",
+        "forensic_notes": "API Key Missing. Please set the OPENROUTER_API_KEY environment variable.",
+        "json_data": {"error": "API Key Missing. Please set the OPENROUTER_API_KEY environment variable."}
+    }
+
+def _timed_task(task, func, *args):
+    # Runs one analysis task under the llm_task stage timer (LLM call plus post-processing)
+    with timed("llm_task", task):
+        return func(*args)
+
+def _store_analysis(username, results, mode):
+    """Records a finished analysis in local_store and merges its graph into graph_store (each unless disabled)."""
+    if not LOCAL_STORE_DISABLED:
+        local_store.save_analysis(username, results, mode)
+    json_data = results.get("json_data")
+    if not GRAPH_STORE_DISABLED and isinstance(json_data, dict) and not json_data.get("error"):
+        graph_store.merge_analysis(username, json_data)
+
+def _summarize_usage(mode, task_usage, wall_seconds):
+    """Aggregates per-call usage dicts into the metrics reported alongside results."""
+    def total(field):
+        values = [u.get(field) for u in task_usage.values()]
+        # None means the API didn't report usage for at least one call
+        return None if any(v is None for v in values) else sum(values)
+
+    return {
+        "mode": mode,
+        "llm_calls": sum(len(u.get("attempts") or [u]) for u in task_usage.values()), # Hedged tasks made two
+        "wall_seconds": round(wall_seconds, 3),
+        "prompt_tokens": total("prompt_tokens"),
+        "completion_tokens": total("completion_tokens"),
+        "total_tokens": total("total_tokens"),
+        "tasks": task_usage,
+    }
+
+def _incomplete_text(label):
+    """incomplete_result for the plain-text tasks: whatever streamed before the deadline, marked as partial."""
+    def build(partial, elapsed, reason):
+        if partial.strip():
+            return f"{partial.rstrip()}\n\n[{label} incomplete: {reason} after {elapsed:.0f}s; partial output shown.]"
+        return f"{label} did not complete: {reason} after {elapsed:.0f}s."
+    return build
+
+def _incomplete_json(partial, elapsed, reason):
+    # Half a JSON object is unusable, so a timed-out JSON task is reported as an error
+    return {"error": f"Task did not complete: {reason} after {elapsed:.0f}s", "incomplete": True}
+
+def _json_attempt(api_key, username, biography_text, post_edges):
+    def run(model, cancel, stream_callback, usage):
+        result = _timed_task("json_data", extract_json_data_llm, api_key, username, biography_text, post_edges,
+                             usage, model, cancel, JSON_DEADLINE_SECONDS)
+        if isinstance(result, dict) and result.get("error") and not usage.get("error"):
+            usage["error"] = result["error"] # Unparseable JSON is worth retrying on the hedge model too
+        return result
+    return run
+
+def run_all_analyses_parallel(username, biography_text, post_edges, on_delta=None, on_result=None, cancel=None): # Added post_edges
+    """Runs the three LLM analysis functions in parallel, incorporating post data.
+
+    Optional callbacks support progressive rendering: on_delta(identifier, text)
+    receives streamed text for the 'report' and 'forensic_notes' tasks, and
+    on_result(identifier, result) is called as soon as each task finishes.
+    Each task has a deadline (REPORT/FORENSIC/JSON_DEADLINE_SECONDS) and is
+    hedged with task_control.HEDGE_MODEL when slow or failed; a task that runs
+    out of time, or is cancelled through cancel (a CancelToken), resolves to its
+    partial output and is listed in results["incomplete"].
+    """
     
     # Check for API key in environment variable
     api_key = API_KEY
     if not api_key:
-         print("CRITICAL ERROR: OPENROUTER_API_KEY environment variable is not set.")
-         print("Please set it before running the script: ")
-         print("  export OPENROUTER_API_KEY='your-api-key'     # For Linux/macOS")
-         print("  set OPENROUTER_API_KEY=your-api-key          # For Windows cmd")
-         print("  $env:OPENROUTER_API_KEY='your-api-key'       # For Windows PowerShell")
-         return {
-             "report": "API Key Missing. Cannot run analysis. Please set the OPENROUTER_API_KEY environment variable.",
-             "forensic_notes": "API Key Missing. Please set the OPENROUTER_API_KEY environment variable.",
-             "json_data": {"error": "API Key Missing. Please set the OPENROUTER_API_KEY environment variable."}
-         }
+         return _missing_api_key_results()
 
     # Ensure biography_text is a string, handle None case
     biography_text = biography_text if biography_text is not None else ""
@@ -467,39 +847,46 @@ def run_all_analyses_parallel(username, biography_text, post_edges): # Added pos
     start_time = time.time()
     print(f"--- Starting parallel LLM analyses for {username} (with post data) ---")
 
-    # Use ThreadPoolExecutor for I/O-bound tasks (API calls)
-    # NOTE: Actual parallelism depends on the execution environment.
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        # Submit tasks, passing post_edges to each and using the secure api_key
-        future_report = executor.submit(generate_report_llm, api_key, username, biography_text, post_edges)
-        future_forensic = executor.submit(generate_forensic_analysis_llm, api_key, username, biography_text, post_edges)
-        future_json = executor.submit(extract_json_data_llm, api_key, username, biography_text, post_edges)
-
-        # Store futures with identifiers
-        futures = {
-            future_report: "report",
-            future_forensic: "forensic_notes",
-            future_json: "json_data"
-        }
-
-        # Process completed tasks as they finish
-        for future in as_completed(futures):
-            identifier = futures[future]
-            try:
-                # Get the result from the future
-                result = future.result()
-                results[identifier] = result
-                print(f"  Task '{identifier}' completed.")
-            except Exception as exc:
-                print(f"  Task '{identifier}' generated an exception: {exc}")
-                # Store the error message
-                if identifier == "json_data":
-                    results[identifier] = {"error": f"Task execution failed: {exc}"}
-                else:
-                    results[identifier] = f"Task execution failed: {exc}"
+    # Stream the plain-text tasks only when a caller is listening for deltas
+    # (attempts stream internally regardless, so they can be cancelled mid-generation)
+    specs = [
+        TaskSpec("report",
+                 lambda model, cancel, stream, usage: _timed_task(
+                     "report", generate_report_llm, api_key, username, biography_text, post_edges,
+                     stream, usage, model, cancel, REPORT_DEADLINE_SECONDS),
+                 REPORT_DEADLINE_SECONDS, _incomplete_text("Report"), lambda message: message,
+                 on_delta=(lambda text: on_delta("report", text)) if on_delta else None,
+                 hedge_delay=REPORT_HEDGE_DELAY_SECONDS),
+        TaskSpec("forensic_notes",
+                 lambda model, cancel, stream, usage: _timed_task(
+                     "forensic_notes", generate_forensic_analysis_llm, api_key, username, biography_text, post_edges,
+                     stream, usage, model, cancel, FORENSIC_DEADLINE_SECONDS),
+                 FORENSIC_DEADLINE_SECONDS, _incomplete_text("Forensic notes"), lambda message: message,
+                 on_delta=(lambda text: on_delta("forensic_notes", text)) if on_delta else None,
+                 hedge_delay=FORENSIC_HEDGE_DELAY_SECONDS),
+        TaskSpec("json_data", _json_attempt(api_key, username, biography_text, post_edges),
+                 JSON_DEADLINE_SECONDS, _incomplete_json, lambda message: {"error": message},
+                 hedge_delay=JSON_HEDGE_DELAY_SECONDS),
+    ]
+
+    def task_finished(identifier, result):
+        print(f"  Task '{identifier}' completed.")
+        if on_result:
+            on_result(identifier, result)
+
+    # Filled in by _call_llm with token counts and wall-clock time per task (winning attempt)
+    task_usage = {}
+    for identifier, (result, usage) in run_tasks(specs, DEFAULT_MODEL, cancel=cancel, on_result=task_finished).items():
+        results[identifier] = result
+        task_usage[identifier] = usage
+        record_llm_usage(identifier, usage)
+    results["incomplete"] = [identifier for identifier, usage in task_usage.items()
+                             if usage["outcome"] in (OUTCOME_TIMEOUT, OUTCOME_CANCELLED)]
 
     end_time = time.time()
     print(f"--- Parallel LLM analyses finished in {end_time - start_time:.2f} seconds ---")
+    results["metrics"] = _summarize_usage(ANALYSIS_MODE_PARALLEL, task_usage, end_time - start_time)
+    print(f"  Token usage (parallel): prompt={results['metrics']['prompt_tokens']}, completion={results['metrics']['completion_tokens']}")
 
     # Final check on JSON data for top-level error key
     if isinstance(results["json_data"], dict) and results["json_data"].get("error"):
@@ -508,5 +895,124 @@ def run_all_analyses_parallel(username, biography_text, post_edges): # Added pos
          print(f"  JSON data generation returned unexpected type: {type(results['json_data'])}")
          results["json_data"] = {"error": "Unexpected return type from JSON generation task."}
 
+    _store_analysis(username, results, ANALYSIS_MODE_PARALLEL)
+    return results
+
+
+# --- Single-Pass Combined Analysis ---
+
+def run_combined_analysis(username, biography_text, post_edges, on_result=None, cancel=None):
+    """Produces the report, forensic notes and forensic JSON with one structured LLM call.
+
+    The username, biography and post summary are sent once instead of three times.
+    The call is bounded by COMBINED_DEADLINE_SECONDS and hedged like the parallel tasks.
+    Returns the same dict shape as run_all_analyses_parallel, including "metrics".
+    """
+    api_key = API_KEY
+    if not api_key:
+         return _missing_api_key_results()
+
+    biography_text = biography_text if biography_text is not None else ""
+    model = DEFAULT_MODEL
+    max_tokens = REPORT_MAX_TOKENS + FORENSIC_MAX_TOKENS + JSON_MAX_TOKENS # All three outputs in one response
+    temperature = 0.5
+
+    timestamp = datetime.now(pytz.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    escaped_bio = json.dumps(biography_text)
+    usage = {}
+    post_summary = _budgeted_post_summary(post_edges, POST_SUMMARY_TOKEN_BUDGET, usage)
+    entities = _local_entities(biography_text, post_edges, "combined")
+
+    combined_prompt = f"""**Task:** Analyze the provided Instagram username, biography text, AND summary of recent posts, and produce three outputs in a single JSON object: a plain-text reconnaissance report, plain-text forensic notes, and a structured forensic analysis.
+
+**Username:** "{username}"
+**Biography Text:** {escaped_bio} // Biography text is pre-escaped for JSON
+**Recent Post Summary:**
+{post_summary}
+{_entity_context(entities)}
+**Output 1 - "report" (plain text, no markdown):** An "Initial Profile Reconnaissance" report with these sections:
+{_report_sections(username)}
+
+**Output 2 - "forensic_notes" (plain text, no markdown):** Notes *strictly* on digital forensic points of interest explicitly present in the bio and post captions. **Do not make assumptions beyond the text.** Cover:
+{FORENSIC_ANALYSIS_POINTS}
+
+**Output 3 - "analysis" (JSON object):** Be exhaustive and inventive, incorporating information from BOTH bio and posts, using this structure:
+{_forensic_json_structure(username, escaped_bio, model, local_entities=entities is not None)}
+
+**Final Output Format:**
+{{
+  "report": "string (Output 1, use \\n for line breaks)",
+  "forensic_notes": "string (Output 2, use \\n for line breaks)",
+  "analysis": {{ ... Output 3 ... }}
+}}
+
+**Constraints:** Populate all fields, using empty lists `[]` or `null`/`"Not Applicable"` where nothing applies. Output MUST be a single, valid JSON object. No extra text.
+"""
+    start_time = time.time()
+    print(f"--- Starting combined single-pass LLM analysis for {username} ---")
+    def combined_attempt(attempt_model, attempt_cancel, stream_callback, attempt_usage):
+        attempt_usage.update(usage) # Carries the post_summary stats into each attempt
+        with timed("llm_task", "combined"):
+            return _call_llm(api_key, attempt_model, combined_prompt, max_tokens, temperature, usage=attempt_usage,
+                             stream_callback=stream_callback, cancel=attempt_cancel, timeout=COMBINED_DEADLINE_SECONDS)
+
+    # Partial JSON is unusable, so an incomplete combined call is reported like a failed one
+    spec = TaskSpec("combined", combined_attempt, COMBINED_DEADLINE_SECONDS,
+                    lambda partial, elapsed, reason: f"LLM_ERROR: Incomplete: {reason} after {elapsed:.0f}s",
+                    lambda message: f"LLM_ERROR: {message}", hedge_delay=COMBINED_HEDGE_DELAY_SECONDS)
+    response, usage = run_tasks([spec], model, cancel=cancel)["combined"]
+    record_llm_usage("combined", usage)
+
+    results = {
+        "report": "Report generation failed or task did not complete.",
+        "forensic_notes": "Forensic note generation failed or task did not complete.",
+        "json_data": {"error": "Unknown JSON processing error"},
+        "incomplete": ["report", "forensic_notes", "json_data"]
+                      if usage["outcome"] in (OUTCOME_TIMEOUT, OUTCOME_CANCELLED) else [],
+    }
+    if response.startswith("LLM_ERROR"):
+        print(f"  Combined analysis call failed: {response}")
+        results["report"] = f"Failed to generate report: {response}"
+        results["forensic_notes"] = f"Failed to generate forensic notes: {response}"
+        results["json_data"] = {"error": f"LLM call failed: {response}"}
+    else:
+        with timed("json_postprocess", "combined"):
+            try:
+                combined = json.loads(_extract_json_block(response))
+                if not isinstance(combined, dict):
+                    raise ValueError(f"expected a JSON object, got {type(combined).__name__}")
+                results["report"] = combined.get("report") or "Report missing from combined response."
+                results["forensic_notes"] = combined.get("forensic_notes") or "Forensic notes missing from combined response."
+                results["json_data"] = _validate_forensic_json(combined.get("analysis"), username, timestamp, response, entities)
+                print("  Successfully parsed combined analysis response.")
+            except (json.JSONDecodeError, ValueError) as e:
+                print(f"  Error: Failed to parse combined LLM response as JSON. {e}")
+                results["json_data"] = {"error": "LLM response was not valid JSON", "raw_response": response}
+                results["report"] = "Failed to generate report: combined response was not valid JSON."
+                results["forensic_notes"] = "Failed to generate forensic notes: combined response was not valid JSON."
+
+    if on_result:
+        for identifier in ("report", "forensic_notes", "json_data"):
+            on_result(identifier, results[identifier])
+
+    wall_seconds = time.time() - start_time
+    results["metrics"] = _summarize_usage(ANALYSIS_MODE_COMBINED, {"combined": usage}, wall_seconds)
+    print(f"--- Combined LLM analysis finished in {wall_seconds:.2f} seconds "
+          f"(prompt={usage.get('prompt_tokens')}, completion={usage.get('completion_tokens')} tokens) ---")
+    _store_analysis(username, results, ANALYSIS_MODE_COMBINED)
+    return results
+
+
+def run_analyses(username, biography_text, post_edges, mode=None, on_delta=None, on_result=None, cancel=None):
+    """Runs the LLM analyses in the requested mode ('parallel' or 'combined').
+
+    cancel (a task_control.CancelToken) abandons the in-flight LLM calls when set.
+    """
+    mode = mode or DEFAULT_ANALYSIS_MODE
+    if mode == ANALYSIS_MODE_COMBINED:
+        return run_combined_analysis(username, biography_text, post_edges, on_result=on_result, cancel=cancel)
+    if mode != ANALYSIS_MODE_PARALLEL:
+        print(f"Warning: Unknown analysis mode '{mode}', using '{ANALYSIS_MODE_PARALLEL}'.")
+    return run_all_analyses_parallel(username, biography_text, post_edges, on_delta=on_delta, on_result=on_result,
+                                     cancel=cancel)
 
-    return results 
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+# --- Constants ---
+# Batches smaller than this are scored in-process; process start-up isn't worth it below
+SENTIMENT_PROCESS_THRESHOLD = int(os.getenv("SENTIMENT_PROCESS_THRESHOLD", "2000"))
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", str(os.cpu_count() or 1)))
+SENTIMENT_CHUNK_SIZE = int(os.getenv("SENTIMENT_CHUNK_SIZE", "500"))
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_analyzer():
+    """Returns the process-wide VADER analyzer, loading the lexicon only once."""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def score_text(text):
+    """Returns {'compound', 'pos', 'neg', 'neu'} for text, or None for empty text or on error."""
+    if not text:
+        return None
+    try:
+        return get_analyzer().polarity_scores(text)
+    except Exception as e:
+        print(f"Error during sentiment analysis: {e}")
+        return None
+
+
+def _score_chunk(items):
+    # Runs in worker processes; each worker loads the analyzer once and reuses it
+    return [(key, score_text(text)) for key, text in items]
+
+
+def _get_pool(workers):
+    """Returns the shared scoring pool, creating it on first use (or when workers grows).
+
+    Workers are spawned rather than forked: the callers are threaded (Flask,
+    the pipeline's producer thread), and forking a threaded process can copy
+    locks in a held state. The pool is kept for the life of the process so
+    start-up and lexicon loading are paid once.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or workers > _pool_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=get_analyzer)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Stops the shared scoring pool's worker processes (also run at interpreter exit)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool, _pool_workers = None, 0
+
+
+atexit.register(shutdown_pool)
+
+
+def score_batch(items, workers=SENTIMENT_WORKERS, chunk_size=SENTIMENT_CHUNK_SIZE,
+                process_threshold=SENTIMENT_PROCESS_THRESHOLD):
+    """Scores (key, text) pairs and returns {key: scores or None}, aligned to the given keys.
+
+    Large batches are split into chunks and spread across the shared process
+    pool; small ones are scored in-process with the shared analyzer.
+    """
+    items = list(items)
+    if len(items) < process_threshold or workers <= 1:
+        return dict(_score_chunk(items))
+
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results = {}
+    for chunk_result in _get_pool(workers).map(_score_chunk, chunks):
+        results.update(chunk_result)
+    return results
+
+
+def score_posts(posts, include_comments=True, **batch_kwargs):
+    """Scores captions (and comment previews) for parsed posts in one batch.
+
+    Returns one {"caption": scores or None, "comments": [scores or None, ...]}
+    per post, in the order given.
+    """
+    posts = list(posts)
+    items = []
+    for position, post in enumerate(posts):
+        # Keyed by position: ids can be missing or repeat across pages
+        items.append(((position, 'caption', 0), post.get('caption')))
+        if include_comments:
+            for index, comment in enumerate(post.get('comment_previews') or []):
+                items.append(((position, 'comment', index), comment))
+
+    scored = score_batch(items, **batch_kwargs)
+    return [{
+        "caption": scored.get((position, 'caption', 0)),
+        "comments": [scored.get((position, 'comment', i)) for i in range(len(post.get('comment_previews') or []))
+                     ] if include_comments else [],
+    } for position, post in enumerate(posts)]
@@ -0,0 +1,190 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; spans a cache hit up to a slow multi-minute LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+POST_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {} # label values tuple -> per-series state
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            lines.extend(line for key, state in series for line in self._render_series(key, state))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, key, value):
+        yield f"{self.name}_total{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of observed values, per label combination."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels):
+        """Returns {"count", "sum"} for one label combination."""
+        with self._lock:
+            state = self._series.get(self._key(labels))
+            return {"count": state[2], "sum": state[1]} if state else {"count": 0, "sum": 0.0}
+
+    def _render_series(self, key, state):
+        bucket_counts, total, count = state
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- Application metrics ---
+STAGE_SECONDS = registry.histogram(
+    "instagram_analysis_stage_seconds",
+    "Time spent in each pipeline stage (profile_fetch, pagination_page, llm_task, json_postprocess, "
+    "entity_extraction, prepare_graph_json, graph_layout, template_render).",
+    ("stage", "task"))
+STAGE_FAILURES = registry.counter(
+    "instagram_analysis_stage_failures",
+    "Stages that raised an exception.",
+    ("stage", "task"))
+PROFILE_LOOKUPS = registry.counter(
+    "instagram_profile_lookups",
+    "Profile lookups by where they were answered from (cache or network).",
+    ("source",))
+LLM_TOKENS = registry.counter(
+    "instagram_llm_tokens",
+    "Tokens reported by the LLM API, by analysis task and token type (prompt or completion).",
+    ("task", "type"))
+LLM_CALL_TOKENS = registry.histogram(
+    "instagram_llm_call_tokens",
+    "Tokens per LLM call, by analysis task and token type (prompt, completion or estimated_prompt).",
+    ("task", "type"), buckets=TOKEN_BUCKETS)
+PROMPT_POSTS_INCLUDED = registry.histogram(
+    "instagram_prompt_posts_included",
+    "Posts that fit in the prompt's post-summary token budget, by analysis task.",
+    ("task",), buckets=POST_COUNT_BUCKETS)
+LLM_CALLS = registry.counter(
+    "instagram_llm_calls",
+    "LLM calls by analysis task and whether they were answered from llm_cache.",
+    ("task", "cached"))
+TASK_OUTCOMES = registry.counter(
+    "instagram_llm_task_outcomes",
+    "Analysis tasks by how they resolved (primary, hedge, failed, timeout or cancelled).",
+    ("task", "outcome"))
+
+
+@contextmanager
+def timed(stage, task=""):
+    """Observes the block's duration in STAGE_SECONDS and counts exceptions in STAGE_FAILURES."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.inc(stage=stage, task=task)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, task=task)
+
+
+def record_llm_usage(task, usage):
+    """Counts one LLM call, its tokens and its post coverage from a usage dict filled in by scraper_utils."""
+    if not usage:
+        return
+    LLM_CALLS.inc(task=task, cached=str(bool(usage.get("cached"))).lower())
+    for token_type in ("prompt", "completion"):
+        tokens = usage.get(f"{token_type}_tokens")
+        if tokens:
+            LLM_TOKENS.inc(tokens, task=task, type=token_type)
+            LLM_CALL_TOKENS.observe(tokens, task=task, type=token_type)
+    if usage.get("estimated_prompt_tokens"):
+        LLM_CALL_TOKENS.observe(usage["estimated_prompt_tokens"], task=task, type="estimated_prompt")
+    post_summary = usage.get("post_summary")
+    if post_summary and post_summary.get("posts_included") is not None:
+        PROMPT_POSTS_INCLUDED.observe(post_summary["posts_included"], task=task)
@@ -0,0 +1,209 @@
+import os
+import json
+import queue
+import threading
+from scraper_utils import _prepare_post_data_for_llm, local_store, graph_store, POST_SUMMARY_TOKEN_BUDGET
+
+# --- Constants ---
+# Posts LlmSummarySink keeps as candidates for the token-budgeted prompt summary
+LLM_SUMMARY_CANDIDATE_POSTS = int(os.getenv("LLM_SUMMARY_CANDIDATE_POSTS", "50"))
+
+_ITEM, _DONE, _ERROR = "item", "done", "error"
+
+
+class _BufferedIterator:
+    """Consumer side of buffered(); close(), or garbage collection, stops the producer."""
+
+    def __init__(self, buffer, stop):
+        self._buffer = buffer
+        self._stop = stop
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        kind, value = self._buffer.get()
+        if kind == _DONE:
+            self.close()
+            raise StopIteration
+        if kind == _ERROR:
+            self.close()
+            raise value
+        return value
+
+    def close(self):
+        self._finished = True
+        self._stop.set()
+
+    def __del__(self):
+        self._stop.set()
+
+
+def buffered(iterable, maxsize=2):
+    """Runs iterable on a background thread, buffering at most maxsize items ahead of the consumer.
+
+    Lets a slow producer (network pagination) overlap with a slow consumer
+    (parsing, scoring, writing) while keeping memory bounded. Exceptions in the
+    producer are re-raised in the consumer. Closing the returned iterator (or
+    dropping it, even before the first item) stops the producer after its
+    current item.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(entry):
+        # Returns False once the consumer has gone away
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((_ITEM, item)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_ERROR, e))
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    # The thread only references the queue and the event, so the consumer can still be garbage collected
+    threading.Thread(target=produce, name="pipeline-producer", daemon=True).start()
+    return _BufferedIterator(buffer, stop)
+
+
+# --- Sinks ---
+# A sink receives consume(edges, posts) once per page and close() at the end of the stream.
+
+class JsonFileSink:
+    """Writes parsed posts to a JSON array file incrementally, one page at a time.
+
+    With append, posts are added to the end of an existing array (an
+    incremental crawl's new posts extend the dump of earlier ones) instead of
+    replacing the file.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.append = append
+        self.count = 0
+        self._has_items = False
+        if append and os.path.exists(path):
+            self._file = open(path, 'r+b')
+            self._reopen_array()
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(b"[\n")
+
+    def _reopen_array(self):
+        # Drops the closing ']' so more items can be written after the existing ones
+        start = max(0, self._file.seek(0, os.SEEK_END) - 4096)
+        self._file.seek(start)
+        tail = self._file.read().rstrip()
+        if not tail.endswith(b"]"):
+            backup = self.path + ".bak"
+            print(f"Warning: {self.path} is not a JSON array; moving it to {backup} and starting a new file.")
+            self._file.close()
+            os.replace(self.path, backup)
+            self._file = open(self.path, 'wb')
+            self._file.write(b"[\n")
+            return
+        self._has_items = not tail[:-1].rstrip().endswith(b"[")
+        self._file.seek(start + len(tail) - 1)
+        self._file.truncate()
+
+    def consume(self, edges, posts):
+        for post in posts:
+            if self._has_items:
+                self._file.write(b",\n")
+            self._file.write(json.dumps(post.to_dict(), ensure_ascii=False).encode('utf-8'))
+            self._has_items = True
+            self.count += 1
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write(b"\n]\n")
+        self._file.close()
+        print(f"{'Appended' if self.append else 'Wrote'} {self.count} posts to {self.path}")
+
+
+class StoreSink:
+    """Bulk-upserts each page of parsed posts into the local SQLite store."""
+
+    def __init__(self, username, store=None):
+        self.username = username
+        self.store = store or local_store
+        self.count = 0
+
+    def consume(self, edges, posts):
+        self.count += self.store.upsert_posts(self.username, posts)
+
+    def close(self):
+        print(f"Stored {self.count} posts for {self.username} in {self.store.path}")
+
+
+class GraphSink:
+    """Merges each page's tagged-user and @mention edges into the cross-profile graph store."""
+
+    def __init__(self, username, store=None):
+        self.username = username
+        self.store = store or graph_store
+        self.count = 0
+
+    def consume(self, edges, posts):
+        self.count += self.store.add_posts(self.username, posts)
+
+    def close(self):
+        print(f"Merged {self.count} graph edges for {self.username} into {self.store.path}")
+
+
+class LlmSummarySink:
+    """Keeps only what the LLM prompts need: the first candidate_posts edges plus running totals.
+
+    summary() fills token_budget from those candidates like the analysis prompts
+    do; with a token_budget of 0 it lists the first max_posts instead.
+    """
+
+    def __init__(self, max_posts=5, token_budget=POST_SUMMARY_TOKEN_BUDGET, candidate_posts=LLM_SUMMARY_CANDIDATE_POSTS):
+        self.max_posts = max_posts
+        self.token_budget = token_budget
+        self.candidate_posts = max(candidate_posts, max_posts)
+        self.stats = {}
+        self.post_edges = []
+        self.total_posts = 0
+        self._sentiment_sum = 0.0
+        self._sentiment_count = 0
+
+    def consume(self, edges, posts):
+        remaining = self.candidate_posts - len(self.post_edges)
+        if remaining > 0:
+            self.post_edges.extend(edges[:remaining])
+        self.total_posts += len(posts)
+        for post in posts:
+            score = post.caption_sentiment_compound
+            if score is not None:
+                self._sentiment_sum += score
+                self._sentiment_count += 1
+
+    @property
+    def average_sentiment(self):
+        return self._sentiment_sum / self._sentiment_count if self._sentiment_count else None
+
+    def summary(self):
+        """Post summary text in the same format the LLM prompts use; selection stats go to self.stats."""
+        return _prepare_post_data_for_llm(self.post_edges, max_posts=self.max_posts, token_budget=self.token_budget,
+                                          stats=self.stats)
+
+    def close(self):
+        pass
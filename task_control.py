@@ -0,0 +1,265 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from stage_metrics import TASK_OUTCOMES
+
+# --- Constants ---
+# Secondary model raced against a slow (or failed) primary call; empty disables hedging
+HEDGE_MODEL = os.getenv("HEDGE_MODEL", "google/gemini-2.0-flash-001")
+# Hedge once a task runs longer than this percentile of its recent latencies...
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+# ...once there are enough samples; until then, after the task's own warm-up delay
+# (TaskSpec.hedge_delay, or this fraction of its deadline)
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WARMUP_DEADLINE_FRACTION = float(os.getenv("HEDGE_WARMUP_DEADLINE_FRACTION", "0.5"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "5"))
+LATENCY_WINDOW = 200 # Recent primary call durations kept per task
+POLL_SECONDS = 1.0 # Upper bound on how late a deadline, hedge or cancellation is noticed
+
+OUTCOME_PRIMARY = "primary"
+OUTCOME_HEDGE = "hedge"
+OUTCOME_FAILED = "failed"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_CANCELLED = "cancelled"
+
+
+class CancelToken:
+    """Thread-safe cancellation flag that runs callbacks (e.g. closing a stream) when set.
+
+    A token created with a parent is cancelled along with it, so cancelling a
+    job cancels every LLM call made on its behalf.
+    """
+
+    def __init__(self, parent=None):
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent.on_cancel(lambda: self.cancel(parent.reason))
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e: # A failing callback mustn't stop the others
+                print(f"Warning: Cancel callback failed: {e}")
+
+    def on_cancel(self, callback):
+        """Registers callback to run on cancellation (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+
+class LatencyTracker:
+    """Rolling window of primary call durations per task, for choosing when to hedge.
+
+    Primaries that were superseded by a hedge or hit their deadline are
+    recorded with their elapsed time as a lower bound, so the slow tail stays
+    in the window instead of only the calls fast enough to win.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, task, seconds):
+        with self._lock:
+            self._samples[task].append(seconds)
+
+    def percentile(self, task, q):
+        """The q-quantile (0-1) of task's recent durations, or None with fewer than HEDGE_MIN_SAMPLES."""
+        with self._lock:
+            samples = sorted(self._samples[task])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self, task, deadline, default=None):
+        """Seconds after which task gets a hedged request: its latency percentile, within the deadline.
+
+        Until the task has HEDGE_MIN_SAMPLES samples, default is used (or
+        HEDGE_WARMUP_DEADLINE_FRACTION of the deadline without one).
+        """
+        delay = self.percentile(task, HEDGE_PERCENTILE)
+        if delay is None:
+            delay = default if default is not None else deadline * HEDGE_WARMUP_DEADLINE_FRACTION
+        return min(max(delay, HEDGE_MIN_DELAY_SECONDS), deadline * 0.75)
+
+
+latency_tracker = LatencyTracker()
+
+
+class TaskSpec:
+    """One deadline-bound task for run_tasks.
+
+    run(model, cancel, stream_callback, usage) performs one attempt and returns
+    its result; it should record failures as usage["error"] and stop promptly
+    once cancel is set. on_delta receives the primary attempt's streamed text.
+    incomplete_result(partial_text, elapsed, reason) builds the result for a
+    task that timed out or was cancelled, from whatever text had streamed;
+    error_result(message) the result for a task whose attempts all raised.
+    hedge_delay is the hedge delay to use until the task has enough latency
+    samples; set it near the task's typical duration.
+    """
+
+    def __init__(self, name, run, deadline, incomplete_result, error_result, on_delta=None, hedge_delay=None):
+        self.name = name
+        self.run = run
+        self.deadline = deadline
+        self.incomplete_result = incomplete_result
+        self.error_result = error_result
+        self.on_delta = on_delta
+        self.hedge_delay = hedge_delay
+
+
+class _Attempt:
+    def __init__(self, spec, model, hedge, parent_cancel):
+        self.spec = spec
+        self.model = model
+        self.hedge = hedge
+        self.cancel = CancelToken(parent_cancel)
+        self.usage = {}
+        self.chunks = []
+        self.started = time.monotonic()
+        self.finished = None # monotonic time the attempt returned or raised
+
+    def stream_callback(self, text):
+        self.chunks.append(text)
+        # Only the primary streams to the page; a winning hedge replaces it via on_result
+        if not self.hedge and self.spec.on_delta:
+            self.spec.on_delta(text)
+
+    def summary(self, outcome):
+        end = self.finished if self.finished is not None else time.monotonic()
+        return {"model": self.model, "hedge": self.hedge, "outcome": outcome,
+                "wall_seconds": round(end - self.started, 3), "error": self.usage.get("error")}
+
+
+def run_tasks(specs, primary_model, hedge_model=HEDGE_MODEL, cancel=None, on_result=None, tracker=latency_tracker):
+    """Runs each TaskSpec with a deadline, hedging slow or failed primaries with hedge_model.
+
+    A task still running past its tracker.hedge_delay() (or whose primary
+    attempt failed) gets a second attempt on hedge_model; the first success
+    wins and the other attempt is cancelled. At its deadline, or when cancel is
+    set, a task's attempts are cancelled and spec.incomplete_result() stands in.
+    Returns {name: (result, usage)}; usage is the winning attempt's usage dict
+    plus "outcome", "deadline_seconds" and an "attempts" summary.
+    on_result(name, result) is called as each task resolves.
+    """
+    specs = {spec.name: spec for spec in specs}
+    start = time.monotonic()
+    attempts = {name: [] for name in specs}
+    hedged = set()
+    futures = {}
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=2 * len(specs), thread_name_prefix="llm-task")
+
+    def launch(spec, model, hedge):
+        attempt = _Attempt(spec, model, hedge, cancel)
+        attempts[spec.name].append(attempt)
+        futures[executor.submit(spec.run, model, attempt.cancel, attempt.stream_callback, attempt.usage)] = attempt
+        if hedge:
+            hedged.add(spec.name)
+            print(f"  Task '{spec.name}': hedging with {model} after {time.monotonic() - start:.1f}s.")
+
+    def resolve(name, result, winner, outcome):
+        for attempt in attempts[name]:
+            if attempt.finished is None:
+                if not attempt.hedge and outcome in (OUTCOME_HEDGE, OUTCOME_TIMEOUT):
+                    # Superseded or out of time: it would have taken at least this long
+                    tracker.record(name, time.monotonic() - attempt.started)
+                attempt.cancel.cancel("superseded" if outcome in (OUTCOME_PRIMARY, OUTCOME_HEDGE) else outcome)
+        summaries = [attempt.summary(outcome if attempt is winner else
+                                     "error" if attempt.finished is not None else "abandoned")
+                     for attempt in attempts[name]]
+        results[name] = (result, dict(winner.usage, outcome=outcome, deadline_seconds=specs[name].deadline,
+                                      attempts=summaries))
+        TASK_OUTCOMES.inc(task=name, outcome=outcome)
+        if on_result:
+            on_result(name, result)
+
+    def resolve_incomplete(name, reason, outcome):
+        spec = specs[name]
+        elapsed = time.monotonic() - start
+        partial = max(("".join(attempt.chunks) for attempt in attempts[name]), key=len, default="")
+        print(f"  Task '{name}' {outcome} after {elapsed:.1f}s ({len(partial)} chars of partial output).")
+        resolve(name, spec.incomplete_result(partial, elapsed, reason), attempts[name][0], outcome)
+
+    for spec in specs.values():
+        launch(spec, primary_model, hedge=False)
+    try:
+        while len(results) < len(specs):
+            if cancel is not None and cancel.cancelled:
+                for name in specs:
+                    if name not in results:
+                        resolve_incomplete(name, cancel.reason, OUTCOME_CANCELLED)
+                break
+
+            now = time.monotonic()
+            wake_times = [start + specs[name].deadline for name in specs if name not in results]
+            if hedge_model:
+                wake_times += [start + tracker.hedge_delay(name, specs[name].deadline, specs[name].hedge_delay)
+                               for name in specs if name not in results and name not in hedged]
+            timeout = max(0.0, min([POLL_SECONDS] + [t - now for t in wake_times]))
+            pending = [future for future, attempt in futures.items() if attempt.spec.name not in results]
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                attempt = futures.pop(future)
+                attempt.finished = time.monotonic()
+                name = attempt.spec.name
+                if name in results:
+                    continue
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    print(f"  Task '{name}' ({attempt.model}) generated an exception: {exc}")
+                    result = attempt.spec.error_result(f"Task execution failed: {exc}")
+                    attempt.usage["error"] = f"{exc.__class__.__name__}: {exc}"
+                if not attempt.usage.get("error"):
+                    if not attempt.hedge and not attempt.usage.get("cached"):
+                        tracker.record(name, attempt.finished - attempt.started)
+                    resolve(name, result, attempt, OUTCOME_HEDGE if attempt.hedge else OUTCOME_PRIMARY)
+                    continue
+                if cancel is not None and cancel.cancelled:
+                    continue # Stopped by the caller, not failed: resolved with partial output below
+                if any(other.finished is None for other in attempts[name]):
+                    continue # The other attempt may still succeed
+                if hedge_model and name not in hedged:
+                    launch(specs[name], hedge_model, hedge=True) # Fall back to the secondary model at once
+                    continue
+                resolve(name, result, attempt, OUTCOME_FAILED)
+
+            now = time.monotonic()
+            for name, spec in specs.items():
+                if name in results:
+                    continue
+                elapsed = now - start
+                if elapsed >= spec.deadline:
+                    resolve_incomplete(name, "timed out", OUTCOME_TIMEOUT)
+                elif (hedge_model and name not in hedged
+                      and elapsed >= tracker.hedge_delay(name, spec.deadline, spec.hedge_delay)):
+                    launch(spec, hedge_model, hedge=True)
+    finally:
+        # Abandoned attempts were cancelled above; don't block the caller on their threads winding down
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
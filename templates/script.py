@@ -3,6 +3,11 @@ import time
 import json
 import os # Added for potential env var usage later
 import re # Added for parsing mentions
+import sys
+# Allow importing the shared helpers from the project root when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_utils import instagram_get
+from post_record import PostRecord
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import WebDriverException
@@ -54,8 +59,8 @@ def get_instagram_profile_info(username, cookies):
     }
 
     try:
-        # Pass the cookies dict directly to requests
-        response = requests.get(url, headers=headers, cookies=cookies, timeout=15) # Increased timeout slightly
+        # Pass the cookies dict directly to the shared session
+        response = instagram_get(url, headers=headers, cookies=cookies, timeout=15) # Shared keep-alive session
 
         response.raise_for_status()
         return response.json()
@@ -138,7 +143,7 @@ def main():
 
 
 def parse_profile_data(filename):
-    """Parses the saved JSON profile data to extract relevant post information."""
+    """Parses the saved JSON profile data to extract relevant post information as PostRecords."""
     try:
         with open(filename, 'r', encoding='utf-8') as f:
             profile_data = json.load(f)
@@ -190,22 +195,22 @@ def parse_profile_data(filename):
             tagged_users = re.findall(r'@(\w+)', caption)
 
         # --- Extract Other Details ---
-        post_info = {
-            'id': node.get('id'),
-            'shortcode': node.get('shortcode'),
-            'timestamp': node.get('taken_at_timestamp'),
-            'media_type': node.get('__typename'),
-            'display_url': node.get('display_url'),
-            'likes_count': node.get('edge_liked_by', {}).get('count'),
-            'comments_count': comment_count,
-            'caption': caption,
-            'comment_previews': comment_texts, # Store preview texts if found
-            'tagged_users_in_caption': tagged_users,
+        post_info = PostRecord(
+            id=node.get('id'),
+            shortcode=node.get('shortcode'),
+            timestamp=node.get('taken_at_timestamp'),
+            media_type=node.get('__typename'),
+            display_url=node.get('display_url'),
+            likes_count=node.get('edge_liked_by', {}).get('count'),
+            comments_count=comment_count,
+            caption=caption,
+            comment_previews=comment_texts, # Store preview texts if found
+            tagged_users_in_caption=tagged_users,
             # Placeholder for tags from 'usertags' if that field exists
-            # 'tagged_users_in_photo': [tag_edge.get('node',{}).get('user',{}).get('username')
-            #                           for tag_edge in node.get('usertags', {}).get('edges', [])
-            #                           if tag_edge.get('node',{}).get('user')]
-        }
+            # tagged_users_in_media=[tag_edge.get('node',{}).get('user',{}).get('username')
+            #                        for tag_edge in node.get('usertags', {}).get('edges', [])
+            #                        if tag_edge.get('node',{}).get('user')]
+        )
         extracted_posts.append(post_info)
 
     print(f"Successfully parsed {len(extracted_posts)} posts.")
@@ -290,7 +295,7 @@ if __name__ == "__main__":
             if parsed_data:
                 # Print details of the first post as an example
                 # Use json.dumps for cleaner dictionary printing
-                print(json.dumps(parsed_data[0], indent=2, ensure_ascii=False))
+                print(json.dumps(parsed_data[0].to_dict(), indent=2, ensure_ascii=False))
             else:
                 print("No posts were parsed.")
 
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for _module in ("requests", "httpx", "openai", "pytz"):
+    pytest.importorskip(_module)
+
+from async_fetch import AsyncFetchEngine
+
+
+class CannedEngine(AsyncFetchEngine):
+    """Engine whose GraphQL requests return a fixed payload instead of hitting Instagram."""
+
+    def __init__(self, payload):
+        super().__init__(cookies={"sessionid": "x"})
+        self.payload = payload
+        self.calls = 0
+
+    async def _get_json(self, url, username, decode=None, limiter=None):
+        self.calls += 1
+        return self.payload
+
+
+NULL_PAYLOADS = [
+    None,
+    {"data": None},
+    {"data": {"user": None}},
+    {"data": {"user": {"edge_owner_to_timeline_media": None}}},
+    {"data": {"shortcode_media": None}},
+    {"data": {"shortcode_media": {"edge_media_to_parent_comment": None}}},
+]
+
+
+@pytest.mark.parametrize("payload", NULL_PAYLOADS)
+def test_null_posts_payload_is_an_empty_page(payload):
+    engine = CannedEngine(payload)
+    assert asyncio.run(engine.fetch_posts_page("1", "ghost")) == {}
+    assert asyncio.run(engine.fetch_all_posts("1", "ghost")) == []
+    assert engine.calls == 2
+
+
+@pytest.mark.parametrize("payload", NULL_PAYLOADS)
+def test_null_comments_payload_is_no_comments(payload):
+    assert asyncio.run(CannedEngine(payload).fetch_comments("SC1", "ghost")) == []
+
+
+def test_null_edges_and_page_info_end_pagination():
+    payload = {"data": {"user": {"edge_owner_to_timeline_media": {"edges": None, "page_info": None}}}}
+    engine = CannedEngine(payload)
+    assert asyncio.run(engine.fetch_all_posts("1", "ghost", max_pages=5)) == []
+    assert engine.calls == 1
+
+
+def test_comment_edges_without_nodes_are_dropped():
+    payload = {"data": {"shortcode_media": {"edge_media_to_parent_comment": {
+        "edges": [{"node": None}, None, {"node": {"text": "hi"}}]}}}}
+    assert asyncio.run(CannedEngine(payload).fetch_comments("SC1", "ghost")) == [{"text": "hi"}]
@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawl_state import CrawlState, CrawlStateStore
+
+
+def make_edges(count, start=0):
+    # Newest first, like the profile lookup and GraphQL pages
+    return [{"node": {"id": str(i), "shortcode": f"SC{i}", "taken_at_timestamp": 1700000000 - i * 3600}}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    for module in ("requests", "httpx", "openai", "pytz", "nltk"):
+        pytest.importorskip(module)
+    import instagram_scraper
+    return instagram_scraper
+
+
+def serve_feed(monkeypatch, scraper, feed, page_size=12):
+    requested = []
+
+    def fake_pages(user_id, username, cookies, headers, start_cursor=None, on_page=None):
+        requested.append(start_cursor)
+        for offset in range(int(start_cursor or 0), len(feed), page_size):
+            if on_page:
+                on_page({"end_cursor": str(offset + page_size), "has_next_page": offset + page_size < len(feed)})
+            yield feed[offset:offset + page_size]
+
+    monkeypatch.setattr(scraper, "iter_post_pages", fake_pages)
+    return requested
+
+
+def test_uncrawled_posts_are_deduplicated_but_not_the_watermark(tmp_path):
+    store = CrawlStateStore(str(tmp_path))
+    state = store.load("bob")
+    state.mark_seen(make_edges(12), crawled=False)
+    store.save(state)
+
+    state = store.load("bob")
+    assert state.new_edges(make_edges(12)) == []
+    assert state.previously_seen == frozenset()
+    assert not state.reached_known(make_edges(12))
+
+    state.mark_seen(make_edges(12))
+    assert state.uncrawled_shortcodes == set()
+    assert state.newest_timestamp == 1700000000
+
+
+class RecordingSink:
+    def __init__(self, stored):
+        self.stored = stored
+
+    def consume(self, edges, posts):
+        self.stored.extend(post.shortcode for post in posts)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stored(scraper, monkeypatch):
+    stored = []
+    monkeypatch.setattr(scraper, "post_store_sinks", lambda username: [RecordingSink(stored)])
+    return stored
+
+
+def test_app_path_stores_first_page_once(scraper, stored, monkeypatch, tmp_path):
+    store = CrawlStateStore(str(tmp_path))
+    requested = serve_feed(monkeypatch, scraper, make_edges(30))
+
+    first = scraper.store_new_posts("1", "bob", {}, {}, make_edges(12), state_store=store)
+    second = scraper.store_new_posts("1", "bob", {}, {}, make_edges(12), state_store=store)
+
+    assert len(first) == 12
+    assert second == []
+    assert stored == [f"SC{i}" for i in range(12)]
+    assert requested == [] # No GraphQL requests on the app path
+
+
+def test_batch_analysis_stores_new_posts(scraper, stored, monkeypatch, tmp_path):
+    import batch_analysis
+    monkeypatch.setattr(scraper, "crawl_state_store", CrawlStateStore(str(tmp_path)))
+    monkeypatch.setattr(batch_analysis, "run_analyses", lambda *args, **kwargs: {})
+    profile = ("1", {"biography": ""}, make_edges(12), None)
+
+    first = batch_analysis.analyze_one("bob", profile=profile)
+    second = batch_analysis.analyze_one("bob", profile=profile)
+
+    assert (first["status"], first["new_post_count"]) == ("ok", 12)
+    assert (second["status"], second["new_post_count"]) == ("ok", 0)
+    assert stored == [f"SC{i}" for i in range(12)]
+
+
+def test_paginated_crawl_after_app_lookup_fetches_the_rest(scraper, monkeypatch, tmp_path):
+    store = CrawlStateStore(str(tmp_path))
+    serve_feed(monkeypatch, scraper, make_edges(30))
+    scraper.fetch_new_posts("1", "bob", {}, {}, initial_edges=make_edges(12), state_store=store, paginate=False)
+
+    crawled = scraper.fetch_new_posts("1", "bob", {}, {}, state_store=store)
+
+    assert [edge["node"]["shortcode"] for edge in crawled] == [f"SC{i}" for i in range(12, 30)]
+    state = store.load("bob")
+    assert len(state.previously_seen) == 30
+    assert state.uncrawled_shortcodes == set()
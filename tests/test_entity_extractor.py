@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_extractor import extract_entities_from_texts
+
+
+def phone_numbers(text):
+    return extract_entities_from_texts([text])['phone_numbers']
+
+
+@pytest.mark.parametrize("text", [
+    "Born 1984-05-14 in Ohio",
+    "Launch day: 2023.10.15!",
+    "Server at 192.168.10.100 is down",
+    "Best of 2024 2025",
+    "Locker combo 12-34-56-78",
+    "Followers: 1234567",
+])
+def test_rejects_numbers_that_are_not_phones(text):
+    assert phone_numbers(text) == []
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Call +1 650 555 1234 anytime", "+1 650 555 1234"),
+    ("UK office +44 20 7946 0958", "+44 20 7946 0958"),
+    ("Bookings (650) 555-1234", "(650) 555-1234"),
+    ("Text 650-555-1234.", "650-555-1234"),
+    ("Text 650.555.1234", "650.555.1234"),
+])
+def test_finds_phone_numbers(text, expected):
+    assert phone_numbers(text) == [expected]
+
+
+def test_other_entities_unaffected():
+    entities = extract_entities_from_texts(["Mail me@example.com or DM @someone #tbt on 1984-05-14"])
+    assert entities['emails'] == ["me@example.com"]
+    assert entities['mentions'] == ["@someone"]
+    assert entities['hashtags'] == ["#tbt"]
+    assert entities['phone_numbers'] == []
@@ -0,0 +1,102 @@
+import gc
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for _module in ("requests", "httpx", "openai", "pytz"):
+    pytest.importorskip(_module)
+
+from stream_pipeline import buffered, JsonFileSink
+from post_record import PostRecord
+
+
+class Source:
+    """Endless page source that records whether it was closed."""
+
+    def __init__(self):
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        try:
+            while True:
+                self.produced += 1
+                yield self.produced
+        finally:
+            self.closed.set()
+
+
+def producer_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "pipeline-producer"]
+
+
+def wait_for_producers_to_exit(timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while producer_threads() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not producer_threads()
+
+
+def test_consumes_in_order_and_reraises_producer_errors():
+    assert list(buffered(iter(range(5)))) == [0, 1, 2, 3, 4]
+
+    def failing():
+        yield 1
+        raise RuntimeError("page failed")
+
+    pages = buffered(failing())
+    assert next(pages) == 1
+    with pytest.raises(RuntimeError, match="page failed"):
+        next(pages)
+
+
+def test_close_before_first_item_stops_producer():
+    source = Source()
+    pages = buffered(iter(source))
+    pages.close()
+    assert source.closed.wait(2.0)
+    assert wait_for_producers_to_exit()
+    assert source.produced <= 4 # The buffer plus the item in hand, not an endless crawl
+
+
+def test_dropping_unconsumed_iterator_stops_producer():
+    source = Source()
+    pages = buffered(iter(source))
+    del pages
+    gc.collect()
+    assert source.closed.wait(2.0)
+    assert wait_for_producers_to_exit()
+
+
+def test_json_file_sink_appends_to_existing_array(tmp_path):
+    path = str(tmp_path / "posts.json")
+    sink = JsonFileSink(path)
+    sink.consume([], [PostRecord(id="1"), PostRecord(id="2")])
+    sink.close()
+
+    sink = JsonFileSink(path, append=True)
+    sink.consume([], [PostRecord(id="3")])
+    sink.close()
+    with open(path, encoding="utf-8") as f:
+        assert [post["id"] for post in json.load(f)] == ["1", "2", "3"]
+
+    sink = JsonFileSink(path, append=True) # A run with nothing new leaves the dump intact
+    sink.close()
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)) == 3
+
+
+def test_json_file_sink_appends_to_empty_array(tmp_path):
+    path = str(tmp_path / "posts.json")
+    JsonFileSink(path).close()
+    sink = JsonFileSink(path, append=True)
+    sink.consume([], [PostRecord(id="1")])
+    sink.close()
+    with open(path, encoding="utf-8") as f:
+        assert [post["id"] for post in json.load(f)] == ["1"]